@@ -0,0 +1,36 @@
+from django.contrib import admin
+from .models import SyncState, SyncRun, SyncRunPage, SyncJob
+
+
+@admin.register(SyncState)
+class SyncStateAdmin(admin.ModelAdmin):
+    list_display = ['stream', 'watermark', 'last_synced_at', 'updated_at']
+    search_fields = ['stream']
+    actions = ['reset_watermark']
+
+    @admin.action(description='清除水位（下次全量同步）')
+    def reset_watermark(self, request, queryset):
+        count = queryset.update(watermark=None)
+        self.message_user(request, f'已清除 {count} 个数据流的水位')
+
+
+class SyncRunPageInline(admin.TabularInline):
+    model = SyncRunPage
+    extra = 0
+    readonly_fields = ['page_no', 'rows', 'created_at']
+    can_delete = False
+
+
+@admin.register(SyncRun)
+class SyncRunAdmin(admin.ModelAdmin):
+    list_display = ['id', 'stream', 'status', 'pages_done', 'rows_written', 'rows_unchanged', 'attempts', 'started_at', 'finished_at']
+    list_filter = ['stream', 'status']
+    readonly_fields = ['params', 'pages_done', 'rows_written', 'rows_unchanged', 'attempts', 'error', 'started_at', 'finished_at']
+    inlines = [SyncRunPageInline]
+
+
+@admin.register(SyncJob)
+class SyncJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'created_by', 'created_at', 'started_at', 'finished_at']
+    list_filter = ['kind', 'status']
+    readonly_fields = ['params', 'active_key', 'message', 'created_by', 'created_at', 'started_at', 'finished_at']
@@ -0,0 +1,180 @@
+import time
+import json
+import random
+import hashlib
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+API_BASE_URL = "https://openapi.qizhishangke.com/api/openservices"
+APP_NAME = "mathmagic"
+APP_KEY = "82be0592545283da00744b489f758f99"
+SID = "mathmagic"
+
+# 各接口的 (连接超时, 读取超时)，单位秒
+DEFAULT_TIMEOUT = (5, 30)
+ENDPOINT_TIMEOUTS = {
+    'product/v1/getItemList': (5, 30),
+    'stockSpec/v1/getStockSpecList': (5, 30),
+    'trade/v1/getSalesTradeList': (5, 30),
+    'trade/v1/getSalesTradeOrderList': (5, 20),
+}
+
+# 需要重试的HTTP状态码
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# 接口限流时的业务错误码及提示关键字
+THROTTLE_CODES = {429}
+THROTTLE_KEYWORDS = ('频繁', '限流', '超过访问频率')
+
+
+class ERPError(Exception):
+    """ERP接口返回的业务错误"""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+    @property
+    def is_throttled(self):
+        return self.code in THROTTLE_CODES or any(k in str(self) for k in THROTTLE_KEYWORDS)
+
+
+class ERPClient:
+    """ERP开放接口客户端
+
+    所有同步模块共用一个连接池（keep-alive），统一处理签名、超时、
+    带抖动的指数退避重试，并记录请求次数与耗时。
+    """
+
+    def __init__(self, max_retries=3, backoff_base=1.0, backoff_max=30.0, pool_size=10):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def sign(self, body_str):
+        """生成API签名参数"""
+        timestamp = str(int(time.time()))
+        sign_str = f"{APP_KEY}appName{APP_NAME}body{body_str}sid{SID}timestamp{timestamp}{APP_KEY}"
+        return {
+            "appName": APP_NAME,
+            "sid": SID,
+            "sign": hashlib.md5(sign_str.encode()).hexdigest(),
+            "timestamp": timestamp,
+        }
+
+    def backoff(self, attempt):
+        """计算第 attempt 次重试前的等待时间（指数退避 + 抖动）"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(delay / 2, delay)
+
+    def post(self, endpoint, body, limiter=None):
+        """调用接口并返回响应中的 data 字段
+
+        传入 limiter（TokenBucket）时，每次请求前先取令牌，
+        遇到限流响应会通知限流器降速后再重试。
+        """
+        body_str = json.dumps(body, ensure_ascii=False, separators=(",", ":"))
+        url = f"{API_BASE_URL}/{endpoint}"
+        timeout = ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+
+        for attempt in range(self.max_retries + 1):
+            if limiter:
+                limiter.acquire()
+            # 签名包含时间戳，每次重试都要重新生成
+            params = self.sign(body_str)
+            started = time.monotonic()
+            try:
+                response = self.session.post(url, params=params, data=body_str.encode('utf-8'), timeout=timeout)
+            except requests.RequestException as e:
+                self._record(endpoint, time.monotonic() - started, failed=True)
+                if attempt >= self.max_retries:
+                    logger.error(f"请求 {endpoint} 失败，已重试 {attempt} 次: {str(e)}")
+                    raise
+                self._retry(endpoint, attempt, str(e))
+                continue
+
+            self._record(endpoint, time.monotonic() - started, failed=response.status_code != 200)
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                if response.status_code == 429 and limiter:
+                    limiter.penalize()
+                self._retry(endpoint, attempt, f"HTTP {response.status_code}")
+                continue
+
+            if response.status_code != 200:
+                raise ERPError(f"API请求失败: HTTP {response.status_code} {response.text[:200]}", code=response.status_code)
+
+            response_data = response.json()
+            if response_data.get('code') != 200:
+                error = ERPError(f"API返回错误: {response_data.get('message')}", code=response_data.get('code'))
+                if error.is_throttled and attempt < self.max_retries:
+                    if limiter:
+                        limiter.penalize()
+                    self._retry(endpoint, attempt, str(error))
+                    continue
+                raise error
+
+            if limiter:
+                limiter.reward()
+            return response_data['data']
+
+    def _retry(self, endpoint, attempt, reason):
+        delay = self.backoff(attempt)
+        logger.warning(f"请求 {endpoint} 失败 (尝试 {attempt + 1}): {reason}，{delay:.1f} 秒后重试")
+        self._record_retry(endpoint)
+        time.sleep(delay)
+
+    def _record(self, endpoint, elapsed, failed=False):
+        with self._lock:
+            stat = self.stats.setdefault(endpoint, {'requests': 0, 'failures': 0, 'retries': 0, 'total_time': 0.0})
+            stat['requests'] += 1
+            stat['total_time'] += elapsed
+            if failed:
+                stat['failures'] += 1
+
+    def _record_retry(self, endpoint):
+        with self._lock:
+            self.stats[endpoint]['retries'] += 1
+
+    def get_stats(self):
+        """返回各接口的请求统计（次数、失败、重试、平均耗时）"""
+        with self._lock:
+            result = {}
+            for endpoint, stat in self.stats.items():
+                result[endpoint] = dict(stat)
+                result[endpoint]['avg_time'] = stat['total_time'] / stat['requests'] if stat['requests'] else 0
+            return result
+
+    def log_stats(self):
+        for endpoint, stat in self.get_stats().items():
+            logger.info(
+                f"{endpoint}: 请求 {stat['requests']} 次, 失败 {stat['failures']} 次, "
+                f"重试 {stat['retries']} 次, 平均耗时 {stat['avg_time'] * 1000:.0f}ms"
+            )
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """获取进程内共享的ERP客户端"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ERPClient()
+    return _client
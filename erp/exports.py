@@ -0,0 +1,214 @@
+import csv
+import codecs
+import logging
+from django.utils.module_loading import import_string
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+logger = logging.getLogger(__name__)
+
+# 可导出的数据集，值为各应用 exports 模块中 Dataset 实例的路径
+DATASETS = {
+    'orders': 'trade.exports.ORDERS',
+    'carts': 'trade.exports.CARTS',
+    'skus': 'gallery.exports.SKUS',
+    'stock': 'storage.exports.STOCK',
+}
+
+# 单个 Excel 工作表最多 1048576 行，超出时续写到新工作表
+XLSX_MAX_ROWS = 1048575
+
+
+class Column:
+    """导出列：表头、values_list 字段名，以及可选的取值转换函数"""
+
+    def __init__(self, header, field, convert=None, width=15):
+        self.header = header
+        self.field = field
+        self.convert = convert
+        self.width = width
+
+
+def choice_display(choices):
+    """把 choices 的存储值转换为显示文字"""
+    labels = {value: str(label) for value, label in choices}
+    return lambda value: labels.get(value, value)
+
+
+class Dataset:
+    """一个可导出的数据集
+
+    filter(params) 返回按列表页筛选条件过滤后的查询集，filters 为它接受的参数名。
+    数据按主键分段读取，每段用 values_list 只取导出列，不构造模型实例。
+    """
+
+    def __init__(self, name, title, model, columns, filter, filters=(), list_url=None):
+        self.name = name
+        self.title = title
+        self.model = model
+        self.columns = columns
+        self.filter = filter
+        self.filters = filters
+        self.list_url = list_url
+
+    @property
+    def headers(self):
+        return [column.header for column in self.columns]
+
+    def params(self, query):
+        """从请求参数中取出本数据集的筛选条件，去掉空值"""
+        return {key: query.get(key) for key in self.filters if query.get(key)}
+
+    def queryset(self, params):
+        return self.filter(params)
+
+    def chunks(self, params, chunk_size=5000):
+        """按主键顺序分段产出数据行列表，见 keyset_chunks"""
+        fields = [column.field for column in self.columns]
+        converters = [(i, column.convert) for i, column in enumerate(self.columns) if column.convert]
+        queryset = self.queryset(params).values_list('pk', *fields)
+        for rows in keyset_chunks(queryset, chunk_size, key=lambda row: row[0]):
+            chunk = []
+            for row in rows:
+                values = list(row[1:])
+                for i, convert in converters:
+                    values[i] = convert(values[i])
+                chunk.append(values)
+            yield chunk
+
+
+def keyset_chunks(queryset, chunk_size=5000, key=lambda obj: obj.pk):
+    """按主键顺序分段查询，逐段产出结果列表，每次只取 chunk_size 行
+
+    MySQL 驱动不支持流式游标，iterator() 仍会把整个结果集读入客户端，
+    大结果集应使用本函数。key 从一行结果中取出主键，values_list 查询需要指定。
+    """
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(page[:chunk_size])
+        if not rows:
+            return
+        last_pk = key(rows[-1])
+        yield rows
+        if len(rows) < chunk_size:
+            return
+
+
+def get_dataset(name):
+    if name not in DATASETS:
+        raise KeyError(f'未知的导出数据集: {name}')
+    return import_string(DATASETS[name])
+
+
+class _Echo:
+    """csv.writer 的写入目标，直接返回写入内容，供流式响应逐行产出"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(dataset, chunks):
+    """逐段产出 UTF-8 编码的 CSV 内容，开头带 BOM 以便 Excel 正确识别中文"""
+    writer = csv.writer(_Echo())
+    yield codecs.BOM_UTF8 + writer.writerow(dataset.headers).encode('utf-8')
+    for chunk in chunks:
+        yield ''.join(writer.writerow(row) for row in chunk).encode('utf-8')
+
+
+def write_csv(dataset, chunks, output):
+    """把数据写入二进制文件对象 output，返回写入行数"""
+    count = 0
+    writer = csv.writer(_Echo())
+    output.write(codecs.BOM_UTF8 + writer.writerow(dataset.headers).encode('utf-8'))
+    for chunk in chunks:
+        output.write(''.join(writer.writerow(row) for row in chunk).encode('utf-8'))
+        count += len(chunk)
+    return count
+
+
+def write_xlsx(dataset, chunks, output):
+    """以只写模式写入 Excel，行数超过单表上限时自动分表，返回写入行数"""
+    wb = Workbook(write_only=True)
+    font = Font(bold=True)
+    count = 0
+    ws = None
+    ws_rows = 0
+    for chunk in chunks:
+        for row in chunk:
+            if ws is None or ws_rows >= XLSX_MAX_ROWS:
+                ws = wb.create_sheet(dataset.title if ws is None else f'{dataset.title}{len(wb.worksheets) + 1}')
+                for col, column in enumerate(dataset.columns, 1):
+                    ws.column_dimensions[get_column_letter(col)].width = column.width
+                header = []
+                for title in dataset.headers:
+                    cell = WriteOnlyCell(ws, value=title)
+                    cell.font = font
+                    header.append(cell)
+                ws.append(header)
+                ws_rows = 0
+            # 备注等文本可能含有 Excel 不允许的控制字符
+            ws.append([ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value for value in row])
+            ws_rows += 1
+        count += len(chunk)
+    if ws is None:
+        ws = wb.create_sheet(dataset.title)
+        ws.append(dataset.headers)
+    wb.save(output)
+    return count
+
+
+def _arrow_type(pa, dataset, column):
+    """按模型字段类型确定 Parquet 列类型；带转换函数的列按文本处理"""
+    if column.convert:
+        return pa.string()
+    model = dataset.model
+    for name in column.field.split('__'):
+        field = model._meta.get_field(name)
+        model = field.related_model
+    if field.is_relation:
+        field = field.target_field
+    internal = field.get_internal_type()
+    if internal == 'DecimalField':
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if internal == 'DateTimeField':
+        return pa.timestamp('us')
+    if internal == 'DateField':
+        return pa.date32()
+    if internal == 'BooleanField':
+        return pa.bool_()
+    if internal == 'FloatField':
+        return pa.float64()
+    if internal.endswith('IntegerField') or internal.endswith('AutoField'):
+        return pa.int64()
+    return pa.string()
+
+
+def write_parquet(dataset, chunks, output):
+    """每段数据写成一个 Parquet 行组，返回写入行数（需要安装 pyarrow）"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(column.header, _arrow_type(pa, dataset, column)) for column in dataset.columns])
+    count = 0
+    with pq.ParquetWriter(output, schema) as writer:
+        for chunk in chunks:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            count += len(chunk)
+    return count
+
+
+# 页面导出菜单中的格式选项
+EXPORT_FORMATS = [('csv', 'CSV'), ('xlsx', 'Excel'), ('parquet', 'Parquet')]
+
+# 导出格式：(写入函数, Content-Type, 扩展名)
+FORMATS = {
+    'csv': (write_csv, 'text/csv; charset=utf-8', 'csv'),
+    'xlsx': (write_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'parquet': (write_parquet, 'application/vnd.apache.parquet', 'parquet'),
+}
@@ -0,0 +1,47 @@
+import json
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(payload):
+    """计算接口记录的内容指纹
+
+    键排序、紧凑分隔符后序列化再取 sha1，字段顺序不同但内容相同的记录指纹一致。
+    """
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class ChangeFilter:
+    """按内容指纹过滤未变化的记录
+
+    转换阶段把每条记录的指纹与数据库中保存的指纹比较，相同的记录直接丢弃，
+    不进入写入阶段。force=True 时不做比较，所有记录都写入（全量同步）。
+    """
+
+    def __init__(self, name, force=False):
+        self.name = name
+        self.force = force
+        self.changed = 0
+        self.unchanged = 0
+        self._lock = threading.Lock()
+
+    def changed_rows(self, rows, stored, key='key'):
+        """返回指纹与 stored（{键: 指纹}）不同的行，每行需包含 key 与 sync_hash
+
+        sync_hash 为 None 的行（数据不完整、无法计算指纹）总是保留。
+        """
+        if self.force:
+            kept = list(rows)
+        else:
+            kept = [row for row in rows if row['sync_hash'] is None or stored.get(row[key]) != row['sync_hash']]
+        with self._lock:
+            self.changed += len(kept)
+            self.unchanged += len(rows) - len(kept)
+        return kept
+
+    def log_summary(self):
+        logger.info(f"{self.name}: 有变化 {self.changed} 条，未变化跳过 {self.unchanged} 条")
@@ -0,0 +1,106 @@
+import uuid
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection
+from .models import SyncJob
+
+logger = logging.getLogger(__name__)
+
+
+def sync_products(full=False):
+    from gallery.sync import ProductSync
+    sync = ProductSync()
+    count = sync.sync_products(full=full)
+    sync.client.log_stats()
+    return f'成功同步 {count} 条产品数据'
+
+
+def sync_trades(full=False):
+    from trade.sync import sync_all_trade
+    success, message = sync_all_trade(full=full)
+    if not success:
+        raise RuntimeError(message)
+    return message
+
+
+def sync_stock(full=False):
+    from storage.sync import sync_all_stock
+    sync_all_stock(full=full)
+    return '库存数据同步成功'
+
+
+def _save_export(prefix, extension, write):
+    """调用 write(文件对象) 生成导出文件并保存到存储，返回 (写入行数, 文件路径)"""
+    # 文件名带随机串，不能通过 /media/ 猜到；下载走需要登录的任务下载接口
+    name = f"exports/{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}.{extension}"
+    with tempfile.TemporaryFile() as output:
+        count = write(output)
+        output.seek(0)
+        path = default_storage.save(name, File(output))
+    return count, path
+
+
+def export_stock(**params):
+    """按库存列表的筛选条件导出 Excel，返回 (结果信息, 文件路径)"""
+    from storage.exports import stock_queryset, write_stock_workbook
+    count, path = _save_export('stock_list', 'xlsx', lambda output: write_stock_workbook(stock_queryset(params), output))
+    return f'导出 {count} 条库存数据', path
+
+
+def export_dataset(dataset, format='csv', filters=None):
+    """导出通用数据集（订单、订单明细、SKU、库存），返回 (结果信息, 文件路径)"""
+    from .exports import FORMATS, get_dataset
+    spec = get_dataset(dataset)
+    write, _, extension = FORMATS[format]
+    chunks = spec.chunks(filters or {})
+    count, path = _save_export(spec.name, extension, lambda output: write(spec, chunks, output))
+    return f'导出 {count} 条{spec.title}数据', path
+
+
+HANDLERS = {
+    SyncJob.Kind.PRODUCTS: sync_products,
+    SyncJob.Kind.TRADES: sync_trades,
+    SyncJob.Kind.STOCK: sync_stock,
+    SyncJob.Kind.STOCK_EXPORT: export_stock,
+    SyncJob.Kind.EXPORT: export_dataset,
+}
+
+
+def _keep_alive(job, stop):
+    """任务执行期间定期更新心跳，其他工作进程启动时据此判断任务是否仍在执行"""
+    interval = getattr(settings, 'ERP_JOB_HEARTBEAT_SECONDS', 60)
+    try:
+        while not stop.wait(interval):
+            try:
+                job.heartbeat()
+            except Exception as e:
+                logger.warning(f"更新任务 {job} 心跳失败: {str(e)}")
+    finally:
+        connection.close()
+
+
+def run_job(job):
+    """执行一个已领取的任务，并记录结果"""
+    logger.info(f"开始执行同步任务 {job}")
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_keep_alive, args=(job, stop), daemon=True)
+    heartbeat.start()
+    try:
+        result = HANDLERS[job.kind](**job.params)
+    except Exception as e:
+        logger.error(f"同步任务 {job} 失败: {str(e)}")
+        job.fail(e)
+        return False
+    finally:
+        stop.set()
+        heartbeat.join()
+    # 导出类任务返回 (结果信息, 文件路径)
+    message, output = result if isinstance(result, tuple) else (result, '')
+    job.succeed(message, output)
+    logger.info(f"同步任务 {job} 完成: {message}")
+    return True
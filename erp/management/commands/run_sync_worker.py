@@ -0,0 +1,49 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from erp.jobs import run_job
+from erp.models import SyncJob
+from gallery.cleanup import collect_orphan_images
+
+
+class Command(BaseCommand):
+    help = '后台同步任务工作进程：轮询并依次执行页面提交的同步任务'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=5, help='没有任务时的轮询间隔（秒）')
+        parser.add_argument('--once', action='store_true', help='执行完当前排队的任务后退出')
+        parser.add_argument('--gc-hours', type=float, default=24, help='空闲时清理孤立图片的间隔（小时），0 表示不清理')
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        recovered = SyncJob.recover()
+        if recovered:
+            self.stdout.write(self.style.WARNING(f'{recovered} 个中断的任务已标记为失败'))
+        self.stdout.write('同步任务工作进程已启动')
+        gc_interval = options['gc_hours'] * 3600
+        last_gc = None
+
+        while True:
+            # 长时间空闲后数据库连接可能已被服务端断开
+            close_old_connections()
+            job = SyncJob.claim_next()
+            if job is None:
+                if gc_interval and (last_gc is None or time.monotonic() - last_gc >= gc_interval):
+                    self._collect_images()
+                    last_gc = time.monotonic()
+                if options['once']:
+                    break
+                time.sleep(interval)
+                continue
+            if run_job(job):
+                self.stdout.write(self.style.SUCCESS(f'{job}: {job.message}'))
+            else:
+                self.stdout.write(self.style.ERROR(f'{job}: {job.message}'))
+
+    def _collect_images(self):
+        try:
+            stats = collect_orphan_images()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'清理孤立图片失败: {str(e)}'))
+            return
+        self.stdout.write(f"清理孤立图片: 扫描 {stats['scanned']} 个文件，删除 {stats['deleted']} 个")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = '从ERP同步产品、订单或库存数据（默认按同步水位增量同步）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('stream', choices=['products', 'trades', 'stock'], help='要同步的数据')
+        parser.add_argument('--full', action='store_true', help='忽略同步水位，全量同步')
+
+    def handle(self, *args, **options):
+        stream = options['stream']
+        full = options['full']
+
+        if stream == 'products':
+            from gallery.sync import ProductSync
+            count = ProductSync().sync_products(full=full)
+            self.stdout.write(self.style.SUCCESS(f'成功同步 {count} 条产品数据'))
+        elif stream == 'trades':
+            from trade.sync import sync_all_trade
+            success, message = sync_all_trade(full=full)
+            if not success:
+                raise CommandError(message)
+            self.stdout.write(self.style.SUCCESS(message))
+        else:
+            from storage.sync import sync_all_stock
+            sync_all_stock(full=full)
+            self.stdout.write(self.style.SUCCESS('库存数据同步成功'))
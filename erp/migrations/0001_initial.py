@@ -0,0 +1,31 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stream', models.CharField(max_length=50, unique=True, verbose_name='数据流')),
+                ('watermark', models.DateTimeField(blank=True, null=True, verbose_name='同步水位')),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True, verbose_name='上次成功同步时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '同步水位',
+                'verbose_name_plural': '同步水位',
+                'db_table': 'erp_sync_state',
+                'ordering': ['stream'],
+            },
+        ),
+    ]
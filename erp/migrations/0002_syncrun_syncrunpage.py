@@ -0,0 +1,53 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stream', models.CharField(db_index=True, max_length=50, verbose_name='数据流')),
+                ('status', models.CharField(choices=[('running', '运行中'), ('succeeded', '成功'), ('failed', '失败'), ('abandoned', '已放弃')], default='running', max_length=20, verbose_name='状态')),
+                ('params', models.JSONField(default=dict, verbose_name='运行参数')),
+                ('pages_done', models.IntegerField(default=0, verbose_name='已完成页数')),
+                ('rows_written', models.IntegerField(default=0, verbose_name='已写入条数')),
+                ('attempts', models.IntegerField(default=1, verbose_name='尝试次数')),
+                ('error', models.TextField(blank=True, default='', verbose_name='错误信息')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='结束时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '同步运行',
+                'verbose_name_plural': '同步运行',
+                'db_table': 'erp_sync_run',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SyncRunPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_no', models.IntegerField(verbose_name='页码')),
+                ('rows', models.IntegerField(default=0, verbose_name='写入条数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='完成时间')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='erp.syncrun', verbose_name='同步运行')),
+            ],
+            options={
+                'verbose_name': '同步页面日志',
+                'verbose_name_plural': '同步页面日志',
+                'db_table': 'erp_sync_run_page',
+                'ordering': ['run', 'page_no'],
+                'unique_together': {('run', 'page_no')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('erp', '0002_syncrun_syncrunpage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('products', '产品'), ('trades', '订单'), ('stock', '库存')], max_length=20, verbose_name='任务类型')),
+                ('params', models.JSONField(default=dict, verbose_name='任务参数')),
+                ('status', models.CharField(choices=[('queued', '排队中'), ('running', '运行中'), ('succeeded', '成功'), ('failed', '失败')], db_index=True, default='queued', max_length=20, verbose_name='状态')),
+                ('active_key', models.CharField(blank=True, max_length=200, null=True, unique=True, verbose_name='去重键')),
+                ('message', models.TextField(blank=True, default='', verbose_name='结果信息')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='提交时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='结束时间')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='提交人')),
+            ],
+            options={
+                'verbose_name': '同步任务',
+                'verbose_name_plural': '同步任务',
+                'db_table': 'erp_sync_job',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
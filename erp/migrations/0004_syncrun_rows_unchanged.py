@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0003_syncjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncrun',
+            name='rows_unchanged',
+            field=models.IntegerField(default=0, verbose_name='未变化条数'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0004_syncrun_rows_unchanged'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncjob',
+            name='output',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='结果文件'),
+        ),
+        migrations.AlterField(
+            model_name='syncjob',
+            name='kind',
+            field=models.CharField(choices=[('products', '产品'), ('trades', '订单'), ('stock', '库存'), ('stock_export', '库存导出')], max_length=20, verbose_name='任务类型'),
+        ),
+    ]
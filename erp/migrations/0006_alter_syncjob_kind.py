@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0005_syncjob_output_alter_syncjob_kind'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='syncjob',
+            name='kind',
+            field=models.CharField(choices=[('products', '产品'), ('trades', '订单'), ('stock', '库存'), ('stock_export', '库存导出'), ('export', '数据导出')], max_length=20, verbose_name='任务类型'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0006_alter_syncjob_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='心跳时间'),
+        ),
+    ]
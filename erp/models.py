@@ -0,0 +1,364 @@
+import json
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
+from django.urls import reverse
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class SyncRunActive(Exception):
+    """同一数据流已有正在运行的同步"""
+
+
+class SyncState(models.Model):
+    """同步水位
+
+    每个数据流（产品、订单、各仓库库存）记录上次成功同步的结束时间，
+    下次同步只拉取 [水位 - 重叠时间, 当前时间] 区间内的数据。
+    """
+    stream = models.CharField('数据流', max_length=50, unique=True)
+    watermark = models.DateTimeField('同步水位', null=True, blank=True)
+    last_synced_at = models.DateTimeField('上次成功同步时间', null=True, blank=True)
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+
+    class Meta:
+        db_table = 'erp_sync_state'
+        verbose_name = '同步水位'
+        verbose_name_plural = '同步水位'
+        ordering = ['stream']
+
+    def __str__(self):
+        return f"{self.stream} @ {self.watermark or '未同步'}"
+
+    @classmethod
+    def window(cls, stream, default_days=None, full=False, rescan_days=None):
+        """返回本次同步的 (开始时间, 结束时间)
+
+        没有水位或要求全量同步时，回溯 default_days 天；
+        default_days 为 None 时开始时间为 None，表示不限开始时间。
+        指定 rescan_days 时开始时间至少回溯这么多天：接口只能按创建时间筛选的数据流，
+        创建后仍会变化的记录靠每次重新扫描最近一段时间来发现。
+        """
+        end = datetime.now()
+        state = cls.objects.filter(stream=stream).first()
+        if full or state is None or state.watermark is None:
+            if default_days is None:
+                return None, end
+            return end - timedelta(days=default_days), end
+        overlap = timedelta(minutes=getattr(settings, 'ERP_SYNC_OVERLAP_MINUTES', 10))
+        start = state.watermark - overlap
+        if rescan_days is not None:
+            start = min(start, end - timedelta(days=rescan_days))
+        return start, end
+
+    @classmethod
+    def advance(cls, stream, end):
+        """同步成功后将水位推进到本次的结束时间"""
+        cls.objects.update_or_create(
+            stream=stream,
+            defaults={'watermark': end, 'last_synced_at': datetime.now()},
+        )
+
+    @classmethod
+    def reset(cls, stream):
+        """清除水位，下次同步为全量同步"""
+        cls.objects.filter(stream=stream).update(watermark=None)
+
+
+class SyncRun(models.Model):
+    """一次同步运行
+
+    记录同步的时间窗口和已完成页面的日志。运行中断后再次同步同一数据流时，
+    会沿用原来的时间窗口，水位不会越过未同步完的数据。续跑时从第 1 页重新抓取：
+    中断期间窗口内的记录可能增减，后面的记录随之移到已完成的页码上，按页码跳过会漏掉它们；
+    已写入且未变化的记录由内容指纹跳过，只多花抓取的时间。同一数据流同时只有一个运行在进行。
+    """
+
+    class Status(models.TextChoices):
+        RUNNING = 'running', '运行中'
+        SUCCEEDED = 'succeeded', '成功'
+        FAILED = 'failed', '失败'
+        ABANDONED = 'abandoned', '已放弃'
+
+    stream = models.CharField('数据流', max_length=50, db_index=True)
+    status = models.CharField('状态', max_length=20, choices=Status.choices, default=Status.RUNNING)
+    params = models.JSONField('运行参数', default=dict)
+    pages_done = models.IntegerField('已完成页数', default=0)
+    rows_written = models.IntegerField('已写入条数', default=0)
+    rows_unchanged = models.IntegerField('未变化条数', default=0)
+    attempts = models.IntegerField('尝试次数', default=1)
+    error = models.TextField('错误信息', blank=True, default='')
+    started_at = models.DateTimeField('开始时间', auto_now_add=True)
+    finished_at = models.DateTimeField('结束时间', null=True, blank=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+
+    class Meta:
+        db_table = 'erp_sync_run'
+        verbose_name = '同步运行'
+        verbose_name_plural = '同步运行'
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"{self.stream} #{self.pk} ({self.get_status_display()})"
+
+    @classmethod
+    def begin(cls, stream, params, resume=True):
+        """开始一次同步运行
+
+        失败的运行，以及超过 ERP_SYNC_STALE_MINUTES 没有进展（updated_at 每完成一页更新一次，
+        进程已退出）的运行视为中断：resume=True 时继续最近的中断运行（沿用其 params），
+        resume=False 时放弃中断的运行，按 params 新建。
+        仍在进行的运行不会被接管或放弃，抛出 SyncRunActive。
+        """
+        stale_before = datetime.now() - timedelta(minutes=getattr(settings, 'ERP_SYNC_STALE_MINUTES', 30))
+        with transaction.atomic():
+            # 锁定该数据流的水位记录，同时开始的两次同步在此排队，不会都认为没有运行中的同步
+            SyncState.objects.get_or_create(stream=stream)
+            SyncState.objects.select_for_update().get(stream=stream)
+            unfinished = list(cls.objects.filter(
+                stream=stream, status__in=[cls.Status.RUNNING, cls.Status.FAILED]
+            ).order_by('-started_at'))
+            for run in unfinished:
+                if run.status == cls.Status.RUNNING and run.updated_at >= stale_before:
+                    raise SyncRunActive(f"{stream} 已有正在运行的同步 #{run.pk}")
+            if unfinished and resume:
+                run = unfinished[0]
+                run.status = cls.Status.RUNNING
+                run.attempts += 1
+                run.error = ''
+                run.save(update_fields=['status', 'attempts', 'error', 'updated_at'])
+                return run
+            if unfinished:
+                cls.objects.filter(pk__in=[run.pk for run in unfinished]).update(
+                    status=cls.Status.ABANDONED, finished_at=datetime.now(),
+                )
+            return cls.objects.create(stream=stream, params=params)
+
+    @classmethod
+    def begin_incremental(cls, stream, default_days=None, full=False, rescan_days=None):
+        """按同步水位确定时间窗口并开始一次运行
+
+        存在未完成的运行时继续该运行，沿用其时间窗口；full=True 时重新开始。
+        rescan_days 见 SyncState.window。
+        """
+        start, end = SyncState.window(stream, default_days, full, rescan_days)
+        params = {
+            'start_time': start.strftime(TIME_FORMAT) if start else None,
+            'end_time': end.strftime(TIME_FORMAT),
+        }
+        return cls.begin(stream, params, resume=not full)
+
+    @property
+    def start_time(self):
+        return self.params.get('start_time')
+
+    @property
+    def end_time(self):
+        return self.params.get('end_time')
+
+    def checkpoint(self, page_no, rows):
+        """记录已完成的页面，与该页数据在同一事务中提交"""
+        _, created = SyncRunPage.objects.get_or_create(run=self, page_no=page_no, defaults={'rows': rows or 0})
+        if created:
+            SyncRun.objects.filter(pk=self.pk).update(
+                pages_done=models.F('pages_done') + 1,
+                rows_written=models.F('rows_written') + (rows or 0),
+                updated_at=datetime.now(),
+            )
+
+    def finish(self, unchanged=0):
+        """运行成功，推进该数据流的同步水位
+
+        unchanged 为本次因内容指纹未变化而跳过写入的条数。
+        """
+        self.status = self.Status.SUCCEEDED
+        self.finished_at = datetime.now()
+        self.rows_unchanged += unchanged
+        self.save(update_fields=['status', 'finished_at', 'rows_unchanged', 'updated_at'])
+        SyncState.advance(self.stream, datetime.strptime(self.end_time, TIME_FORMAT))
+
+    def fail(self, error):
+        self.status = self.Status.FAILED
+        self.error = str(error)
+        self.save(update_fields=['status', 'error', 'updated_at'])
+
+
+class SyncRunPage(models.Model):
+    """同步运行中已完成的页面"""
+    run = models.ForeignKey(SyncRun, on_delete=models.CASCADE, related_name='pages', verbose_name='同步运行')
+    page_no = models.IntegerField('页码')
+    rows = models.IntegerField('写入条数', default=0)
+    created_at = models.DateTimeField('完成时间', auto_now_add=True)
+
+    class Meta:
+        db_table = 'erp_sync_run_page'
+        verbose_name = '同步页面日志'
+        verbose_name_plural = '同步页面日志'
+        ordering = ['run', 'page_no']
+        unique_together = ['run', 'page_no']
+
+    def __str__(self):
+        return f"{self.run} 第 {self.page_no} 页"
+
+
+class SyncJob(models.Model):
+    """页面触发的后台同步任务
+
+    视图只负责入队，由 run_sync_worker 命令在独立进程中依次执行。
+    排队或运行中的任务占用 active_key（唯一），相同任务重复提交时
+    直接返回已有任务，避免多次点击启动并行同步；任务结束后释放 active_key。
+    """
+
+    class Kind(models.TextChoices):
+        PRODUCTS = 'products', '产品'
+        TRADES = 'trades', '订单'
+        STOCK = 'stock', '库存'
+        STOCK_EXPORT = 'stock_export', '库存导出'
+        EXPORT = 'export', '数据导出'
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', '排队中'
+        RUNNING = 'running', '运行中'
+        SUCCEEDED = 'succeeded', '成功'
+        FAILED = 'failed', '失败'
+
+    # 各任务对应的 SyncRun 数据流，用于查询进度；库存的数据流见 stream 属性
+    STREAMS = {
+        Kind.PRODUCTS: 'products',
+        Kind.TRADES: 'trades',
+    }
+
+    kind = models.CharField('任务类型', max_length=20, choices=Kind.choices)
+    params = models.JSONField('任务参数', default=dict)
+    status = models.CharField('状态', max_length=20, choices=Status.choices, default=Status.QUEUED, db_index=True)
+    active_key = models.CharField('去重键', max_length=200, unique=True, null=True, blank=True)
+    message = models.TextField('结果信息', blank=True, default='')
+    output = models.CharField('结果文件', max_length=255, blank=True, default='')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='提交人')
+    created_at = models.DateTimeField('提交时间', auto_now_add=True)
+    started_at = models.DateTimeField('开始时间', null=True, blank=True)
+    heartbeat_at = models.DateTimeField('心跳时间', null=True, blank=True)
+    finished_at = models.DateTimeField('结束时间', null=True, blank=True)
+
+    class Meta:
+        db_table = 'erp_sync_job'
+        verbose_name = '同步任务'
+        verbose_name_plural = '同步任务'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.get_status_display()})"
+
+    @classmethod
+    def enqueue(cls, kind, params=None, user=None):
+        """提交任务，返回 (任务, 是否新建)
+
+        已有相同的排队中或运行中任务时返回该任务。
+        """
+        params = params or {}
+        key = f"{kind}:{json.dumps(params, sort_keys=True)}"
+        for _ in range(3):
+            try:
+                with transaction.atomic():
+                    return cls.objects.create(kind=kind, params=params, active_key=key, created_by=user), True
+            except IntegrityError:
+                existing = cls.objects.filter(active_key=key).first()
+                if existing:
+                    return existing, False
+                # 已有任务恰好在此期间结束，重新提交
+        raise IntegrityError(f"提交同步任务失败: {key}")
+
+    @classmethod
+    def claim_next(cls):
+        """领取最早的排队任务，多个工作进程同时领取时只有一个能成功"""
+        for job in cls.objects.filter(status=cls.Status.QUEUED).order_by('created_at')[:5]:
+            now = datetime.now()
+            claimed = cls.objects.filter(pk=job.pk, status=cls.Status.QUEUED).update(
+                status=cls.Status.RUNNING, started_at=now, heartbeat_at=now,
+            )
+            if claimed:
+                job.status = cls.Status.RUNNING
+                job.started_at = job.heartbeat_at = now
+                return job
+        return None
+
+    @classmethod
+    def recover(cls):
+        """工作进程启动时，将已中断的运行中任务标记为失败
+
+        执行中的任务由工作进程定期更新心跳时间；超过 ERP_SYNC_STALE_MINUTES 没有心跳的任务
+        视为所在进程已退出。其他工作进程正在执行的任务心跳是新的，不受影响。
+        """
+        stale_before = datetime.now() - timedelta(minutes=getattr(settings, 'ERP_SYNC_STALE_MINUTES', 30))
+        stale = models.Q(heartbeat_at__lt=stale_before) | models.Q(heartbeat_at__isnull=True, started_at__lt=stale_before)
+        return cls.objects.filter(stale, status=cls.Status.RUNNING).update(
+            status=cls.Status.FAILED, message='工作进程中断', active_key=None, finished_at=datetime.now(),
+        )
+
+    def heartbeat(self):
+        """执行中的任务定期调用，表明工作进程仍在运行"""
+        self.heartbeat_at = datetime.now()
+        SyncJob.objects.filter(pk=self.pk, status=self.Status.RUNNING).update(heartbeat_at=self.heartbeat_at)
+
+    @property
+    def stream(self):
+        if self.kind == self.Kind.STOCK:
+            # 库存数据流按仓库区分，与库存同步使用同一个仓库编号
+            from storage.sync import STOCK_STREAM
+            return STOCK_STREAM
+        return self.STREAMS.get(self.kind)
+
+    @property
+    def is_active(self):
+        return self.status in (self.Status.QUEUED, self.Status.RUNNING)
+
+    def succeed(self, message='', output=''):
+        self.output = output
+        self._finish(self.Status.SUCCEEDED, message)
+
+    def fail(self, error):
+        self._finish(self.Status.FAILED, str(error))
+
+    def _finish(self, status, message):
+        self.status = status
+        self.message = message
+        self.active_key = None
+        self.finished_at = datetime.now()
+        self.save(update_fields=['status', 'message', 'output', 'active_key', 'finished_at'])
+
+    def current_run(self):
+        """本任务开始后对应数据流最近更新的同步运行"""
+        if not self.started_at:
+            return None
+        return SyncRun.objects.filter(
+            stream=self.stream, updated_at__gte=self.started_at
+        ).order_by('-updated_at').first()
+
+    def progress(self):
+        """任务状态及同步进度（已完成页数、已写入条数、错误信息）"""
+        data = {
+            'id': self.pk,
+            'kind': self.kind,
+            'status': self.status,
+            'status_display': self.get_status_display(),
+            'message': self.message,
+            'created_at': self.created_at.strftime(TIME_FORMAT),
+            'started_at': self.started_at.strftime(TIME_FORMAT) if self.started_at else None,
+            'finished_at': self.finished_at.strftime(TIME_FORMAT) if self.finished_at else None,
+            'download_url': reverse('erp:job_download', args=[self.pk]) if self.output else None,
+            'pages_done': 0,
+            'rows_written': 0,
+            'rows_unchanged': 0,
+            'error': '',
+        }
+        run = self.current_run()
+        if run:
+            data.update(
+                pages_done=run.pages_done,
+                rows_written=run.rows_written,
+                rows_unchanged=run.rows_unchanged,
+                error=run.error,
+            )
+        return data
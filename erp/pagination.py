@@ -0,0 +1,67 @@
+import math
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from .client import get_client
+from .ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class PageFetcher:
+    """分页接口抓取器
+
+    先请求第一页得到总页数，之后用有限的线程并发预取剩余页面，
+    所有请求共用一个令牌桶限流器。页面按页码顺序产出，
+    同时在途的页面不超过 workers * 2 个，内存占用与总页数无关。
+
+    build_body(page_no, page_size) 负责拼装各接口的请求体。
+    """
+
+    def __init__(self, endpoint, build_body, page_size=100, workers=None, qps=None, client=None):
+        self.endpoint = endpoint
+        self.build_body = build_body
+        self.page_size = page_size
+        self.workers = workers or getattr(settings, 'ERP_FETCH_WORKERS', 4)
+        self.limiter = TokenBucket(qps or getattr(settings, 'ERP_QPS', 5))
+        self.client = client or get_client()
+        self.max_page = None
+        self.total = None
+
+    def fetch_page(self, page_no):
+        return self.client.post(self.endpoint, self.build_body(page_no, self.page_size), limiter=self.limiter)
+
+    def pages(self, start_page=1):
+        """按页码顺序产出 (page_no, data)，data 为接口返回的 data 字段"""
+        first = self.fetch_page(start_page)
+        self.total = first['total']
+        self.max_page = math.ceil(first['total'] / first['pageSize']) if first['pageSize'] else 0
+        logger.info(f"{self.endpoint}: 共 {self.total} 条，{self.max_page} 页")
+        yield start_page, first
+
+        remaining = iter(range(start_page + 1, self.max_page + 1))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            for page_no in remaining:
+                pending.append((page_no, executor.submit(self.fetch_page, page_no)))
+                if len(pending) >= self.workers * 2:
+                    break
+            while pending:
+                page_no, future = pending.popleft()
+                try:
+                    data = future.result()
+                except Exception:
+                    for _, other in pending:
+                        other.cancel()
+                    raise
+                next_page = next(remaining, None)
+                if next_page is not None:
+                    pending.append((next_page, executor.submit(self.fetch_page, next_page)))
+                yield page_no, data
+
+    def records(self, start_page=1):
+        """按页产出 (页码, 记录列表)，供 Pipeline 作为数据源"""
+        for page_no, data in self.pages(start_page):
+            logger.info(f"{self.endpoint}: 已获取第 {page_no}/{self.max_page} 页")
+            yield page_no, data['data']
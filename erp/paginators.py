@@ -0,0 +1,285 @@
+import json
+import base64
+import hashlib
+import binascii
+from collections.abc import Sequence
+from decimal import Decimal
+from functools import cached_property
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+
+# 游标方向：下一页、上一页、末页；按页码分页时记录页码
+NEXT, PREVIOUS, LAST, OFFSET = 'n', 'p', 'l', 'o'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(data):
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if not isinstance(data, dict):
+        raise InvalidCursor(cursor)
+    return data
+
+
+def _dump(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def table_row_estimate(queryset):
+    """数据库统计信息中的表行数估计值，不需要扫描表；不支持的数据库返回 None"""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class CursorPage(Sequence):
+    """一页数据及前后页的游标，接口与 Django 的 Page 相近"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = next_cursor if has_next else None
+        self.previous_cursor = previous_cursor if has_previous else None
+
+    def __repr__(self):
+        return f'<CursorPage ({len(self.object_list)} 条)>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def last_cursor(self):
+        return self.paginator.last_cursor if self._has_next else None
+
+
+class CursorPaginator:
+    """按 (排序字段, id) 的键集分页，翻到第 N 页与第 1 页的查询代价相同
+
+    ordering 为排序字段列表，如 ('-created_at', '-id')，最后一个字段必须唯一。
+    游标记录当前页首条或末条记录的排序字段值，下一页查询 "排在它之后" 的
+    per_page 条记录，不使用 OFFSET。
+    ordering 为 None 时（查询集已按相关度等自定义顺序排序）退回按页码分页，
+    页码同样编码在游标中。
+
+    总数 count 只在模板使用时才查询，超过 LIST_EXACT_COUNT_MAX 时不做精确统计：
+    无筛选条件时取数据库的表行数统计值；有筛选条件时最多数到上限，
+    结果按查询语句缓存 LIST_COUNT_CACHE_TIMEOUT 秒。count_estimated 为真时
+    count 是估计值，count_truncated 为真时只知道总数超过 count。
+    exact_count 为真时精确统计并更新缓存。
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id'), exact_count=False):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering) if ordering else None
+        self.exact_count = exact_count
+
+    @property
+    def count(self):
+        return self._count[0]
+
+    @property
+    def count_estimated(self):
+        return self._count[1]
+
+    @property
+    def count_truncated(self):
+        return self._count[2]
+
+    def _count_cache_key(self):
+        sql, params = self.queryset.order_by().query.sql_with_params()
+        digest = hashlib.sha1(f'{sql}{params!r}'.encode()).hexdigest()
+        return f'paginator:count:{self.queryset.model._meta.label_lower}:{digest}'
+
+    @cached_property
+    def _count(self):
+        """(总数, 是否估计值, 是否只是下限)"""
+        threshold = getattr(settings, 'LIST_EXACT_COUNT_MAX', 10000)
+        timeout = getattr(settings, 'LIST_COUNT_CACHE_TIMEOUT', 60)
+        key = self._count_cache_key()
+        if self.exact_count:
+            value = self.queryset.count()
+            cache.set(key, (value, False), timeout)
+            return value, False, False
+
+        if not self.queryset.query.where:
+            estimate = table_row_estimate(self.queryset)
+            if estimate is not None and estimate > threshold:
+                return estimate, True, False
+
+        cached = cache.get(key)
+        if cached is None:
+            # 只数到上限 +1 条，超过上限的大结果集不做全量统计
+            value = self.queryset.order_by()[:threshold + 1].count()
+            cached = (min(value, threshold), value > threshold)
+            cache.set(key, cached, timeout)
+        value, truncated = cached
+        # 缓存中超过上限的值来自此前的精确统计，可能已过时
+        return value, value > threshold, truncated
+
+    @property
+    def last_cursor(self):
+        return encode_cursor({'d': LAST}) if self.ordering else None
+
+    def _reversed_ordering(self):
+        return [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+
+    def _keys(self, obj):
+        return [_dump(getattr(obj, field.lstrip('-'))) for field in self.ordering]
+
+    def _parse_keys(self, values):
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor(values)
+        keys = []
+        for field, value in zip(self.ordering, values):
+            model_field = self.queryset.model._meta.get_field(field.lstrip('-'))
+            try:
+                keys.append(model_field.to_python(value))
+            except Exception:
+                raise InvalidCursor(values)
+        return keys
+
+    def _after(self, keys, ordering):
+        """排在 keys 之后的记录：(a, b) 之后即 a 更靠后，或 a 相等且 b 更靠后"""
+        condition = Q()
+        equal = {}
+        for field, key in zip(ordering, keys):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': key})
+            equal[name] = key
+        return condition
+
+    def page(self, cursor=None):
+        """返回游标对应的一页；游标无效时抛出 InvalidCursor"""
+        data = decode_cursor(cursor) if cursor else {}
+        if self.ordering is None:
+            number = data.get('p', 1)
+            if not isinstance(number, int) or number < 1:
+                raise InvalidCursor(cursor)
+            return self._offset_page(number)
+
+        direction = data.get('d')
+        if direction in (None, OFFSET):
+            # 切换到键集分页时（如清空搜索词）页码游标按第一页处理
+            rows = list(self.queryset.order_by(*self.ordering)[:self.per_page + 1])
+            return self._page(rows, has_next=len(rows) > self.per_page, has_previous=False)
+        if direction == LAST:
+            rows = list(self.queryset.order_by(*self._reversed_ordering())[:self.per_page + 1])
+            return self._page(rows[:self.per_page][::-1], has_next=False, has_previous=len(rows) > self.per_page)
+
+        keys = self._parse_keys(data.get('k'))
+        if direction == NEXT:
+            rows = list(self.queryset.filter(self._after(keys, self.ordering)).order_by(*self.ordering)[:self.per_page + 1])
+            return self._page(rows, has_next=len(rows) > self.per_page, has_previous=True)
+        if direction == PREVIOUS:
+            reverse = self._reversed_ordering()
+            rows = list(self.queryset.filter(self._after(keys, reverse)).order_by(*reverse)[:self.per_page + 1])
+            if len(rows) <= self.per_page:
+                # 前面不足一页时已回到开头，直接返回第一页（从末页倒翻时与下一页可能有重叠）
+                return self.page()
+            return self._page(rows[:self.per_page][::-1], has_next=True, has_previous=True)
+        raise InvalidCursor(cursor)
+
+    def _page(self, rows, has_next, has_previous):
+        rows = rows[:self.per_page]
+        next_cursor = previous_cursor = None
+        if rows:
+            next_cursor = encode_cursor({'d': NEXT, 'k': self._keys(rows[-1])})
+            previous_cursor = encode_cursor({'d': PREVIOUS, 'k': self._keys(rows[0])})
+        return CursorPage(rows, self, has_next, has_previous, next_cursor, previous_cursor)
+
+    def _offset_page(self, number):
+        offset = (number - 1) * self.per_page
+        rows = list(self.queryset[offset:offset + self.per_page + 1])
+        # 第一页不带游标，与键集分页的首页链接一致
+        previous_cursor = encode_cursor({'d': OFFSET, 'p': number - 1}) if number > 2 else ''
+        return CursorPage(
+            rows[:self.per_page], self,
+            has_next=len(rows) > self.per_page, has_previous=number > 1,
+            next_cursor=encode_cursor({'d': OFFSET, 'p': number + 1}), previous_cursor=previous_cursor,
+        )
+
+
+class CursorPaginationMixin:
+    """ListView 的游标分页，请求参数 cursor 为上一页返回的不透明游标
+
+    模板中用 page_obj.next_cursor / previous_cursor / last_cursor 生成链接，
+    pagination_query 为去掉分页参数后的其余查询参数。
+    请求参数 exact_count=1 时精确统计总数。
+    """
+    paginator_class = CursorPaginator
+    cursor_kwarg = 'cursor'
+    exact_count_kwarg = 'exact_count'
+    keyset_ordering = ('-created_at', '-id')
+
+    def get_keyset_ordering(self, queryset):
+        # 查询集已显式排序（如搜索按相关度）时无法按键集分页
+        if queryset.query.order_by:
+            return None
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.paginator_class(
+            queryset, page_size, self.get_keyset_ordering(queryset),
+            exact_count=bool(self.request.GET.get(self.exact_count_kwarg)),
+        )
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('无效的分页参数')
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        for key in (self.cursor_kwarg, self.page_kwarg, self.exact_count_kwarg):
+            params.pop(key, None)
+        context['pagination_query'] = urlencode([(k, v) for k, values in params.lists() for v in values if v])
+        return context
@@ -0,0 +1,173 @@
+import time
+import queue
+import logging
+import threading
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class StageStats:
+    """单个阶段的处理统计"""
+
+    def __init__(self, name):
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self.seconds = 0.0
+
+    @property
+    def throughput(self):
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'seconds': round(self.seconds, 3),
+            'throughput': round(self.throughput, 1),
+        }
+
+
+class Pipeline:
+    """抓取 → 转换 → 批量写入 的流式同步管道
+
+    source 逐页产出 (页码, 接口记录列表)；transform(records) 把一页记录转换为
+    待写入的数据行；write(rows) 在事务中写入一批数据并返回写入条数。
+    传入 checkpoint(页码, 写入条数) 时，它与该页数据在同一事务中调用，
+    用于记录已完成的页面。
+    三个阶段分别运行在抓取线程、转换线程和调用线程上，阶段之间用
+    有界队列连接：网络请求与数据库写入可以重叠进行，而同一时刻
+    驻留内存的页面数不超过队列容量。
+    """
+
+    def __init__(self, name, source, transform, write, queue_size=4, checkpoint=None):
+        self.name = name
+        self.source = source
+        self.transform = transform
+        self.write = write
+        self.checkpoint = checkpoint
+        self.queue_size = queue_size
+        self.stats = {stage: StageStats(stage) for stage in ('fetch', 'transform', 'write')}
+        self.written = 0
+        self._stop = threading.Event()
+        self._error = None
+
+    def _put(self, q, item):
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, error):
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def _fetch(self, out_q):
+        stat = self.stats['fetch']
+        iterator = iter(self.source)
+        try:
+            while True:
+                started = time.monotonic()
+                batch = next(iterator, _DONE)
+                stat.seconds += time.monotonic() - started
+                if batch is _DONE:
+                    break
+                stat.batches += 1
+                stat.items += len(batch[1])
+                if not self._put(out_q, batch):
+                    return
+            self._put(out_q, _DONE)
+        except Exception as e:
+            logger.error(f"{self.name} 抓取阶段失败: {str(e)}")
+            self._fail(e)
+        finally:
+            if hasattr(iterator, 'close'):
+                iterator.close()
+
+    def _transform(self, in_q, out_q):
+        stat = self.stats['transform']
+        try:
+            while True:
+                batch = self._get(in_q)
+                if batch is _DONE:
+                    break
+                key, records = batch
+                started = time.monotonic()
+                rows = self.transform(records)
+                stat.seconds += time.monotonic() - started
+                stat.batches += 1
+                stat.items += len(rows)
+                if not self._put(out_q, (key, rows)):
+                    return
+            self._put(out_q, _DONE)
+        except Exception as e:
+            logger.error(f"{self.name} 转换阶段失败: {str(e)}")
+            self._fail(e)
+        finally:
+            # 转换阶段可能查询数据库，关闭本线程打开的连接
+            connections.close_all()
+
+    def run(self):
+        """运行管道，返回写入总条数；任一阶段出错时停止并抛出该异常"""
+        fetched = queue.Queue(maxsize=self.queue_size)
+        transformed = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            threading.Thread(target=self._fetch, args=(fetched,), name=f'{self.name}-fetch', daemon=True),
+            threading.Thread(target=self._transform, args=(fetched, transformed), name=f'{self.name}-transform', daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        stat = self.stats['write']
+        try:
+            while True:
+                batch = self._get(transformed)
+                if batch is _DONE:
+                    break
+                key, rows = batch
+                started = time.monotonic()
+                with transaction.atomic():
+                    written = self.write(rows)
+                    if self.checkpoint:
+                        self.checkpoint(key, written)
+                stat.seconds += time.monotonic() - started
+                stat.batches += 1
+                stat.items += len(rows)
+                self.written += written or 0
+        except Exception as e:
+            logger.error(f"{self.name} 写入阶段失败: {str(e)}")
+            self._fail(e)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        self.log_stats()
+        if self._error is not None:
+            raise self._error
+        return self.written
+
+    def get_stats(self):
+        return {name: stat.as_dict() for name, stat in self.stats.items()}
+
+    def log_stats(self):
+        for name, stat in self.stats.items():
+            logger.info(
+                f"{self.name} [{name}]: {stat.batches} 批, {stat.items} 条, "
+                f"耗时 {stat.seconds:.1f}s, {stat.throughput:.1f} 条/秒"
+            )
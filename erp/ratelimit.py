@@ -0,0 +1,54 @@
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """令牌桶限流器
+
+    按 rate（每秒令牌数）匀速补充令牌，最多积攒 capacity 个。
+    遇到接口限流时调用 penalize() 将速率减半，之后每次成功请求
+    调用 reward() 缓慢恢复，直到回到初始速率（AIMD）。
+    """
+
+    def __init__(self, rate, capacity=None, min_rate=0.5, recover_step=0.1):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.recover_step = recover_step
+        self.capacity = float(capacity) if capacity else max(1.0, self.max_rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """阻塞直到拿到一个令牌"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self):
+        """接口返回限流时降低速率并清空令牌"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0
+            self.updated = time.monotonic()
+        logger.warning(f"触发接口限流，请求速率降至 {self.rate:.2f} 次/秒")
+
+    def reward(self):
+        """请求成功后逐步恢复速率"""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.recover_step)
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+from django.http import Http404
+from django.test import RequestFactory, TestCase
+from django.views.generic import ListView
+from gallery.models import SPU
+from .paginators import (
+    InvalidCursor, CursorPaginator, CursorPaginationMixin, decode_cursor, encode_cursor, NEXT, PREVIOUS,
+)
+from .ratelimit import TokenBucket
+
+
+class CursorTests(TestCase):
+
+    def test_round_trip(self):
+        data = {'d': NEXT, 'k': ['2024-05-01T08:30:00.123456', 42, '1.50', None, '中文']}
+        cursor = encode_cursor(data)
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor), data)
+
+    def test_invalid_cursor(self):
+        for cursor in ('!!!', 'abc', encode_cursor([1, 2]), encode_cursor('n'), 'gA'):
+            with self.assertRaises(InvalidCursor, msg=cursor):
+                decode_cursor(cursor)
+
+
+class CursorPaginatorTests(TestCase):
+    """20 条记录，每 3 条共用一个 created_at，检验同一时间的记录在分页边界上不重复也不遗漏"""
+
+    @classmethod
+    def setUpTestData(cls):
+        SPU.objects.bulk_create([
+            SPU(spu_code=f'SPU{i:06d}', spu_name=f'商品{i}', product_type='ready_made') for i in range(20)
+        ])
+        start = datetime(2024, 1, 1)
+        for index, pk in enumerate(SPU.objects.order_by('id').values_list('id', flat=True)):
+            SPU.objects.filter(pk=pk).update(created_at=start + timedelta(hours=index // 3))
+        cls.expected = list(SPU.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def paginator(self, per_page=4):
+        return CursorPaginator(SPU.objects.all(), per_page)
+
+    def test_forward_walk(self):
+        for per_page in (1, 3, 4, 7, 20, 25):
+            paginator = self.paginator(per_page)
+            page = paginator.page()
+            self.assertFalse(page.has_previous())
+            ids = [obj.id for obj in page]
+            while page.has_next():
+                page = paginator.page(page.next_cursor)
+                self.assertTrue(page.has_previous())
+                ids += [obj.id for obj in page]
+            self.assertEqual(ids, self.expected, per_page)
+
+    def test_backward_walk(self):
+        for per_page in (1, 3, 4, 7, 20, 25):
+            paginator = self.paginator(per_page)
+            page = paginator.page(paginator.last_cursor)
+            self.assertFalse(page.has_next())
+            pages = [[obj.id for obj in page]]
+            while page.has_previous():
+                page = paginator.page(page.previous_cursor)
+                pages.insert(0, [obj.id for obj in page])
+            self.assertEqual(pages[0], self.expected[:per_page], per_page)
+            # 从末页倒翻到开头时，第一页与第二页可能有重叠；其余各页首尾相接
+            ids = pages[0] + [pk for page_ids in pages[1:] for pk in page_ids if pk not in pages[0]]
+            self.assertEqual(ids, self.expected, per_page)
+
+    def test_next_then_previous(self):
+        paginator = self.paginator()
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+        self.assertEqual(list(paginator.page(third.previous_cursor)), list(second))
+        self.assertEqual(list(paginator.page(second.previous_cursor)), list(first))
+
+    def test_invalid_cursor(self):
+        paginator = self.paginator()
+        for data in (
+            {'d': 'x'},
+            {'d': NEXT},
+            {'d': NEXT, 'k': ['2024-01-01T00:00:00']},
+            {'d': NEXT, 'k': ['not a date', 1]},
+            {'d': PREVIOUS, 'k': 'abc'},
+        ):
+            with self.assertRaises(InvalidCursor, msg=data):
+                paginator.page(encode_cursor(data))
+        with self.assertRaises(InvalidCursor):
+            CursorPaginator(SPU.objects.order_by('spu_code'), 4, ordering=None).page(encode_cursor({'p': 0}))
+
+    def test_invalid_cursor_is_404(self):
+        class SPUListView(CursorPaginationMixin, ListView):
+            model = SPU
+            paginate_by = 4
+
+        request = RequestFactory().get('/', {'cursor': 'not-a-cursor'})
+        with self.assertRaises(Http404):
+            SPUListView.as_view()(request)
+
+
+class TokenBucketTests(TestCase):
+
+    def test_penalize_and_reward(self):
+        bucket = TokenBucket(rate=4, min_rate=1, recover_step=1)
+        with self.assertLogs('erp.ratelimit', 'WARNING'):
+            bucket.penalize()
+            self.assertEqual(bucket.rate, 2)
+            self.assertEqual(bucket.tokens, 0)
+            bucket.penalize()
+            bucket.penalize()
+        self.assertEqual(bucket.rate, 1)
+        for _ in range(5):
+            bucket.reward()
+        self.assertEqual(bucket.rate, 4)
+
+    def test_acquire_uses_capacity(self):
+        bucket = TokenBucket(rate=1, capacity=3)
+        for _ in range(3):
+            bucket.acquire()
+        self.assertLess(bucket.tokens, 1)
@@ -0,0 +1,11 @@
+from django.urls import path
+from . import views
+
+app_name = 'erp'
+
+urlpatterns = [
+    path('jobs/', views.SyncJobListView.as_view(), name='job_list'),
+    path('jobs/<int:pk>/', views.SyncJobProgressView.as_view(), name='job_progress'),
+    path('jobs/<int:pk>/download/', views.SyncJobDownloadView.as_view(), name='job_download'),
+    path('exports/<str:dataset>/', views.ExportView.as_view(), name='export'),
+]
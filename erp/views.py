@@ -0,0 +1,85 @@
+import os
+import tempfile
+from datetime import datetime
+from urllib.parse import urlencode
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
+from django.views.generic import View
+from .exports import FORMATS, get_dataset, iter_csv
+from .models import SyncJob
+
+
+class SyncJobProgressView(LoginRequiredMixin, View):
+    """单个同步任务的状态和进度"""
+
+    def get(self, request, pk):
+        job = get_object_or_404(SyncJob, pk=pk)
+        return JsonResponse(job.progress())
+
+
+class SyncJobListView(LoginRequiredMixin, View):
+    """最近的同步任务，可按 kind 筛选；页面轮询此接口显示同步进度"""
+
+    def get(self, request):
+        jobs = SyncJob.objects.all()
+        kind = request.GET.get('kind')
+        if kind:
+            jobs = jobs.filter(kind=kind)
+        return JsonResponse({'jobs': [job.progress() for job in jobs[:5]]})
+
+
+class SyncJobDownloadView(LoginRequiredMixin, View):
+    """下载导出任务生成的文件"""
+
+    def get(self, request, pk):
+        job = get_object_or_404(SyncJob, pk=pk, status=SyncJob.Status.SUCCEEDED)
+        if not job.output or not default_storage.exists(job.output):
+            raise Http404('导出文件不存在')
+        return FileResponse(default_storage.open(job.output, 'rb'), as_attachment=True, filename=os.path.basename(job.output))
+
+
+class ExportView(LoginRequiredMixin, View):
+    """按列表页的筛选条件导出数据：/erp/exports/<数据集>/?format=csv|xlsx|parquet&筛选参数
+
+    行数不超过 EXPORT_SYNC_MAX_ROWS 时直接返回文件（CSV 边查询边输出），
+    否则提交后台导出任务，完成后在列表页下载。
+    """
+
+    def get(self, request, dataset):
+        try:
+            spec = get_dataset(dataset)
+        except KeyError:
+            raise Http404('导出数据集不存在')
+        format = request.GET.get('format', 'csv')
+        if format not in FORMATS:
+            raise Http404('不支持的导出格式')
+        params = spec.params(request.GET)
+
+        if spec.queryset(params).count() > getattr(settings, 'EXPORT_SYNC_MAX_ROWS', 50000):
+            job, created = SyncJob.enqueue(
+                SyncJob.Kind.EXPORT, {'dataset': spec.name, 'format': format, 'filters': params}, user=request.user,
+            )
+            if created:
+                messages.success(request, f'导出数据较多，已提交后台导出任务 #{job.pk}，完成后可在本页下载')
+            else:
+                messages.info(request, f'导出任务 #{job.pk} {job.get_status_display()}，请勿重复提交')
+            url = reverse(spec.list_url)
+            return redirect(f'{url}?{urlencode(params)}' if params else url)
+
+        write, content_type, extension = FORMATS[format]
+        filename = f"{spec.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+        if format == 'csv':
+            response = StreamingHttpResponse(iter_csv(spec, spec.chunks(params)), content_type=content_type)
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+
+        # Excel 和 Parquet 需要完整文件，先写入临时文件，关闭响应时自动删除
+        output = tempfile.TemporaryFile()
+        write(spec, spec.chunks(params), output)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=filename, content_type=content_type)
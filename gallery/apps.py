@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GalleryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gallery'
+
+    def ready(self):
+        from . import signals  # noqa: F401  注册删除时调整图片引用数的信号
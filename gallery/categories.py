@@ -0,0 +1,125 @@
+import time
+import threading
+from django.db.models import Q
+from .models import CacheVersion, Category
+
+# 各进程缓存整棵类目树，类目变化时递增数据库中的版本号（与类目修改在同一事务中提交），
+# 其他进程最多 VERSION_CHECK_INTERVAL 秒后发现版本变化并重新加载
+VERSION_KEY = 'categories'
+VERSION_CHECK_INTERVAL = 1.0
+
+_lock = threading.Lock()
+_state = {'tree': None, 'version': None, 'checked': 0.0}
+
+
+class CategoryNode:
+    """类目树中的一个节点，只含列表、下拉框和面包屑需要的字段"""
+
+    def __init__(self, id, parent_id, name_zh, name_en, level, rank_id, status, path):
+        self.id = id
+        self.parent_id = parent_id
+        self.category_name_zh = name_zh
+        self.category_name_en = name_en
+        self.level = level
+        self.rank_id = rank_id
+        self.status = status
+        self.path = path
+        self.children = []
+        self.depth = 0
+        self.full_name = ''
+
+
+class CategoryTree:
+    """一次查询加载的完整类目树，祖先路径、全名和子树均在内存中计算"""
+
+    def __init__(self, rows):
+        self.nodes = {row[0]: CategoryNode(*row) for row in rows}
+        self.roots = []
+        for node in self.nodes.values():
+            parent = self.nodes.get(node.parent_id)
+            (parent.children if parent else self.roots).append(node)
+        for siblings in [self.roots] + [node.children for node in self.nodes.values()]:
+            siblings.sort(key=lambda node: (node.rank_id, node.id))
+        for node in self.walk():
+            parent = self.nodes.get(node.parent_id)
+            node.depth = parent.depth + 1 if parent else 0
+            node.full_name = f'{parent.full_name} > {node.category_name_zh}' if parent else node.category_name_zh
+
+    @classmethod
+    def load(cls):
+        return cls(Category.objects.values_list(
+            'id', 'parent_id', 'category_name_zh', 'category_name_en', 'level', 'rank_id', 'status', 'path',
+        ))
+
+    def get(self, category_id):
+        return self.nodes.get(category_id)
+
+    def walk(self, nodes=None):
+        """按树的先序（同级按排序ID）遍历节点"""
+        stack = list(reversed(self.roots if nodes is None else nodes))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def ancestors(self, category_id):
+        """从一级类目到该类目本身的节点列表，供面包屑使用"""
+        node = self.nodes.get(category_id)
+        if node is None:
+            return []
+        return [self.nodes[int(pk)] for pk in node.path.split('/') if pk and int(pk) in self.nodes]
+
+    def subtree_ids(self, category_id):
+        """该类目及其所有下级类目的ID"""
+        node = self.nodes.get(category_id)
+        return [item.id for item in self.walk([node])] if node else []
+
+    def rollup(self, counts):
+        """把各类目自身的数量 {类目ID: 数量} 汇总为包含下级类目的数量"""
+        totals = {}
+        for node in reversed(list(self.walk())):
+            totals[node.id] = counts.get(node.id, 0) + sum(totals[child.id] for child in node.children)
+        return totals
+
+    def options(self, active_only=True):
+        """按树形顺序排列的节点，供下拉框使用"""
+        return [node for node in self.walk() if node.status or not active_only]
+
+
+def category_tree():
+    """返回当前进程缓存的类目树，版本变化时重新加载"""
+    now = time.monotonic()
+    tree = _state['tree']
+    if tree is not None and now - _state['checked'] < VERSION_CHECK_INTERVAL:
+        return tree
+    version = CacheVersion.current(VERSION_KEY)
+    with _lock:
+        if _state['tree'] is None or _state['version'] != version:
+            _state['tree'] = CategoryTree.load()
+            _state['version'] = version
+        _state['checked'] = now
+        return _state['tree']
+
+
+def invalidate_category_tree():
+    """类目增删改后调用：清空本进程的缓存，并通知其他进程重新加载"""
+    CacheVersion.bump(VERSION_KEY)
+    with _lock:
+        _state['tree'] = None
+
+
+def category_full_name(category_id):
+    """类目全名，如 "饰品 > 耳饰 > 耳钉"；类目不存在时返回空字符串"""
+    node = category_tree().get(category_id)
+    return node.full_name if node else ''
+
+
+def subtree_q(category_id, prefix=''):
+    """类目及其所有下级类目的筛选条件，prefix 为到类目外键的关联路径，如 'spu__category__'
+
+    类目路径取自类目树缓存，按物化路径前缀匹配，筛选在一条查询中完成。
+    """
+    node = category_tree().get(category_id)
+    if node is None:
+        return Q(**{f'{prefix}pk__in': []})
+    return Q(**{f'{prefix}path__startswith': node.path})
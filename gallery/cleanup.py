@@ -0,0 +1,117 @@
+import os
+import time
+from collections import Counter
+from django.core.files.storage import default_storage
+from django.db.models import Count
+from .media import BLOB_DIR
+from .thumbnails import delete_thumbnails
+from .models import SKU, Category, ImageBlob
+
+# 需要清理的图片目录：旧的按编码命名的目录和内容寻址存储目录
+IMAGE_DIRS = ('skus', 'categories', BLOB_DIR)
+
+
+def scan_files(directory):
+    """单次遍历目录（含子目录），产出 (相对路径, 修改时间)"""
+    root = default_storage.path(directory)
+    if not os.path.isdir(root):
+        return
+    stack = [(root, directory)]
+    while stack:
+        path, relative = stack.pop()
+        with os.scandir(path) as entries:
+            for entry in entries:
+                name = f"{relative}/{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, name))
+                elif entry.is_file(follow_symlinks=False):
+                    yield name, entry.stat().st_mtime
+
+
+def referenced_images():
+    """SKU 和分类正在使用的全部图片路径，各一次查询"""
+    paths = set(SKU.objects.exclude(img_url__isnull=True).exclude(img_url='').values_list('img_url', flat=True))
+    paths.update(Category.objects.exclude(image__isnull=True).exclude(image='').values_list('image', flat=True))
+    return paths
+
+
+def recount_blob_refs(dry_run=False):
+    """按实际引用重新计算图片的引用次数，返回修正的记录数
+
+    先读取各记录的引用次数再统计实际引用，写回时只更新引用次数仍为读取值的记录：
+    统计期间被 add_refs 调整过的记录跳过，留待下次修正，不覆盖并发的调整。
+    """
+    stored = dict(ImageBlob.objects.values_list('sha256', 'ref_count'))
+    counts = Counter()
+    for row in SKU.objects.filter(img_url__startswith=f'{BLOB_DIR}/').values('img_hash').annotate(n=Count('id')):
+        counts[row['img_hash']] += row['n']
+    for row in Category.objects.filter(image__startswith=f'{BLOB_DIR}/').values('image_hash').annotate(n=Count('id')):
+        counts[row['image_hash']] += row['n']
+
+    fixed = 0
+    for sha256, ref_count in stored.items():
+        if ref_count == counts[sha256]:
+            continue
+        if dry_run:
+            fixed += 1
+        else:
+            fixed += ImageBlob.objects.filter(sha256=sha256, ref_count=ref_count).update(ref_count=counts[sha256])
+    return fixed
+
+
+def collect_orphan_images(days=30, dry_run=False, batch_size=500):
+    """删除未被任何 SKU 或分类引用、且超过 days 天未修改的图片文件
+
+    引用路径一次性加载为集合，目录用 os.scandir 单次遍历，孤立文件即两者之差；
+    按 batch_size 分批删除文件及对应的图片记录，每批删除前重新核对引用和修改时间。
+    dry_run=True 时只统计不删除。
+    返回统计信息。
+    """
+    stats = {'scanned': 0, 'orphans': 0, 'deleted': 0, 'refs_fixed': 0}
+    stats['refs_fixed'] = recount_blob_refs(dry_run)
+    # 先加载引用再遍历目录；遍历期间新写入的文件在保留期内，不会被误删
+    referenced = referenced_images()
+    cutoff = time.time() - days * 86400
+
+    batch = []
+    for directory in IMAGE_DIRS:
+        for name, modified in scan_files(directory):
+            stats['scanned'] += 1
+            if name in referenced or modified >= cutoff:
+                continue
+            stats['orphans'] += 1
+            batch.append(name)
+            if len(batch) >= batch_size:
+                stats['deleted'] += _delete_batch(batch, cutoff, dry_run)
+                batch = []
+    if batch:
+        stats['deleted'] += _delete_batch(batch, cutoff, dry_run)
+    return stats
+
+
+def _delete_batch(names, cutoff, dry_run):
+    if dry_run:
+        return 0
+    # 遍历目录耗时较长，期间可能有 SKU 或分类引用了这些文件，或文件被 write_blob 复用（刷新修改时间），
+    # 删除前按本批路径重新核对
+    in_use = set(SKU.objects.filter(img_url__in=names).values_list('img_url', flat=True))
+    in_use.update(Category.objects.filter(image__in=names).values_list('image', flat=True))
+    deleted = []
+    for name in names:
+        if name in in_use:
+            continue
+        path = default_storage.path(name)
+        try:
+            if os.stat(path).st_mtime >= cutoff:
+                continue
+            os.remove(path)
+            deleted.append(name)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            print(f"删除图片失败: {name}, {str(e)}")
+    blobs = ImageBlob.objects.filter(path__in=deleted)
+    for sha256 in blobs.values_list('sha256', flat=True):
+        delete_thumbnails(sha256)
+    blobs.delete()
+    return len(deleted)
@@ -0,0 +1,72 @@
+from django.db.models import Q
+from erp.exports import Column, Dataset, choice_display
+from .categories import category_full_name, subtree_q
+from .models import SPU, SKU, SearchToken
+from .search import ranked, search_candidates, search_ids
+
+SKU_FILTERS = ('search', 'category', 'color', 'material', 'plating', 'product_type')
+
+
+def sku_queryset(params, rank=False):
+    """按 SKU 列表页的筛选参数过滤 SKU
+
+    搜索索引只用于缩小候选范围，不截断结果（索引无法缩小范围时只按原条件查询），
+    导出和筛选项统计得到全部匹配的 SKU；
+    rank=True 时（列表页）再按相关度排序。
+    """
+    queryset = SKU.objects.all()
+    search_query = params.get('search')
+    category_id = params.get('category')
+
+    if search_query:
+        condition = (
+            Q(sku_name__icontains=search_query) |
+            Q(sku_code__icontains=search_query) |
+            Q(spu__spu_code__icontains=search_query) |
+            Q(spu__spu_name__icontains=search_query)
+        )
+        # 先用搜索索引缩小候选范围，再在候选中核对原条件
+        candidates = search_candidates(SearchToken.Kind.SKU, search_query)
+        if candidates is not None:
+            queryset = queryset.filter(pk__in=candidates)
+            if rank:
+                queryset = ranked(queryset, search_ids(SearchToken.Kind.SKU, search_query, candidates=candidates))
+        queryset = queryset.filter(condition)
+    if category_id and category_id.isdigit():
+        # 选中上级类目时包含其所有下级类目
+        queryset = queryset.filter(subtree_q(int(category_id), 'spu__category__'))
+    if params.get('color'):
+        queryset = queryset.filter(color=params['color'])
+    if params.get('material'):
+        queryset = queryset.filter(material=params['material'])
+    if params.get('plating'):
+        queryset = queryset.filter(plating_process=params['plating'])
+    if params.get('product_type'):
+        queryset = queryset.filter(spu__product_type=params['product_type'])
+    return queryset
+
+
+SKUS = Dataset(
+    'skus', 'SKU', SKU,
+    columns=[
+        Column('SKU编码', 'sku_code', width=20),
+        Column('SKU名称', 'sku_name', width=40),
+        Column('SPU编码', 'spu__spu_code', width=20),
+        Column('SPU名称', 'spu__spu_name', width=30),
+        Column('产品类型', 'spu__product_type', choice_display(SPU.PRODUCT_TYPE_CHOICES)),
+        Column('类目', 'spu__category_id', category_full_name, width=30),
+        Column('材质', 'material'),
+        Column('颜色', 'color', width=10),
+        Column('电镀工艺', 'plating_process', choice_display(SKU.PLATING_PROCESS_CHOICES), width=10),
+        Column('重量(g)', 'weight', width=10),
+        Column('长(mm)', 'length', width=8),
+        Column('宽(mm)', 'width', width=8),
+        Column('高(mm)', 'height', width=8),
+        Column('状态', 'status', width=8),
+        Column('创建时间', 'created_at', width=20),
+        Column('更新时间', 'updated_at', width=20),
+    ],
+    filter=sku_queryset,
+    filters=SKU_FILTERS,
+    list_url='gallery:sku_list',
+)
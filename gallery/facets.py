@@ -0,0 +1,85 @@
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from .exports import SKU_FILTERS, sku_queryset
+from .models import CacheVersion, SPU, SKU
+
+# 所有分面缓存共用一个版本号，数据变化时递增版本号使旧缓存全部失效。
+# 统计结果缓存在各进程中，版本号存放在数据库，任一进程（包括同步任务）递增后所有进程可见
+VERSION_KEY = 'facets'
+
+
+def facet_version():
+    return CacheVersion.current(VERSION_KEY)
+
+
+def invalidate_facets():
+    """SKU、SPU 或库存数据变化后调用，使所有列表筛选项的缓存失效"""
+    CacheVersion.bump(VERSION_KEY)
+
+
+class Facet:
+    """一个筛选维度：请求参数名、分组字段，以及可选的 choices（用于显示名称和排序）
+
+    text 为真时空字符串也视为未填写，外键等非文本字段应设为 False。
+    """
+
+    def __init__(self, param, field, choices=None, text=True):
+        self.param = param
+        self.field = field
+        self.choices = choices
+        self.text = text
+
+
+class FacetEngine:
+    """列表页筛选项及其数量
+
+    每个维度用一条分组查询统计取值和数量，数量按除本维度以外的当前筛选条件计算，
+    选中某个颜色后仍能看到其他颜色的数量。结果按筛选条件缓存。
+    queryset(params) 为列表页使用的过滤函数，filters 为它接受的参数名。
+    """
+
+    def __init__(self, name, queryset, facets, filters):
+        self.name = name
+        self.queryset = queryset
+        self.facets = facets
+        self.filters = filters
+
+    def cache_key(self, params):
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        return f'facets:{self.name}:{facet_version()}:{digest}'
+
+    def counts(self, query):
+        """返回 {参数名: [{'value', 'label', 'count'}, ...]}"""
+        params = {key: query.get(key) for key in self.filters if query.get(key)}
+        key = self.cache_key(params)
+        result = cache.get(key)
+        if result is None:
+            result = {facet.param: self._count(facet, params) for facet in self.facets}
+            cache.set(key, result, getattr(settings, 'FACET_CACHE_TIMEOUT', 300))
+        return result
+
+    def _count(self, facet, params):
+        others = {key: value for key, value in params.items() if key != facet.param}
+        empty = Q(**{f'{facet.field}__isnull': True})
+        if facet.text:
+            empty |= Q(**{facet.field: ''})
+        rows = self.queryset(others).exclude(empty).values(facet.field).annotate(count=Count('pk')).order_by(facet.field)
+        counts = {row[facet.field]: row['count'] for row in rows}
+        if facet.choices is None:
+            return [{'value': value, 'label': value, 'count': count} for value, count in counts.items()]
+        return [
+            {'value': value, 'label': str(label), 'count': counts[value]}
+            for value, label in facet.choices if value in counts
+        ]
+
+
+SKU_FACETS = FacetEngine('skus', sku_queryset, [
+    Facet('color', 'color'),
+    Facet('material', 'material'),
+    Facet('plating', 'plating_process', SKU.PLATING_PROCESS_CHOICES),
+    Facet('product_type', 'spu__product_type', SPU.PRODUCT_TYPE_CHOICES),
+    Facet('category', 'spu__category_id', text=False),
+], SKU_FILTERS)
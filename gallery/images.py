@@ -0,0 +1,171 @@
+import time
+import random
+import threading
+import requests
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.files.storage import default_storage
+from .models import SKU, ImageBlob
+from .media import blob_ref, write_blob, register_blobs
+from .thumbnails import build_all
+
+# 下载图片的 (连接超时, 读取超时)，单位秒
+IMAGE_TIMEOUT = (5, 15)
+# 需要重试的HTTP状态码
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# 下载成功后更新的SKU字段
+IMAGE_FIELDS = ('img_url', 'img_source_url', 'img_etag', 'img_last_modified', 'img_hash', 'sync_hash')
+
+
+class ImageFetcher:
+    """SKU图片下载器
+
+    产品数据写入后提交下载任务，在有限的线程池中并发下载。
+    每个SKU记录图片来源地址、ETag、Last-Modified 和内容哈希：
+    来源地址未变时发送条件请求，304 时不处理内容。图片按内容寻址保存
+    （见 media.py），多个SKU的相同图片只保存一份。
+    超时、连接错误和 5xx 等临时失败按指数退避单独重试，不影响产品数据的写入。
+    """
+
+    def __init__(self, workers=None, max_retries=2, backoff_base=1.0):
+        self.workers = workers or getattr(settings, 'ERP_IMAGE_WORKERS', 8)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(HEADERS)
+
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='sku-image')
+        self.futures = []
+        self._lock = threading.Lock()
+        self.stats = {'downloaded': 0, 'not_modified': 0, 'unchanged': 0, 'failed': 0}
+
+    def submit(self, tasks):
+        """提交一批下载任务
+
+        每个任务为 dict：sku_code、url、sync_hash（下载成功后写回的产品指纹），
+        以及该SKU当前的 img_url、img_source_url、img_etag、img_last_modified、img_hash。
+        """
+        for task in tasks:
+            self.futures.append(self.executor.submit(self.fetch, task))
+
+    def fetch(self, task):
+        """下载单个SKU的图片，返回需要更新到SKU的字段，失败时返回 None"""
+        headers = {}
+        # 来源地址未变且本地文件仍在时才发送条件请求
+        same_source = task['img_source_url'] == task['url'] and task['img_url'] and default_storage.exists(task['img_url'])
+        if same_source:
+            if task['img_etag']:
+                headers['If-None-Match'] = task['img_etag']
+            if task['img_last_modified']:
+                headers['If-Modified-Since'] = task['img_last_modified']
+
+        response = self._get(task['url'], headers)
+        if response is None:
+            self._count('failed')
+            return None
+
+        fields = {
+            'sku_code': task['sku_code'],
+            'img_url': task['img_url'],
+            'img_source_url': task['url'],
+            'img_etag': response.headers.get('ETag', task['img_etag'] if same_source else None),
+            'img_last_modified': response.headers.get('Last-Modified', task['img_last_modified'] if same_source else None),
+            'img_hash': task['img_hash'],
+            'sync_hash': task['sync_hash'],
+        }
+        if response.status_code == 304:
+            self._count('not_modified')
+            return fields
+
+        content_type = response.headers.get('content-type', '')
+        if not content_type.startswith('image/'):
+            print(f"非图片内容类型: {content_type}, SKU: {task['sku_code']}")
+            self._count('failed')
+            return None
+
+        try:
+            sha256, path, size = write_blob(response.content)
+        except Exception as e:
+            print(f"保存图片失败: {str(e)}, SKU: {task['sku_code']}")
+            self._count('failed')
+            return None
+        self._count('unchanged' if sha256 == task['img_hash'] and path == task['img_url'] else 'downloaded')
+        fields.update(img_url=path, img_hash=sha256, blob=(sha256, path, size))
+        return fields
+
+    def _get(self, url, headers):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.get(url, headers=headers, timeout=IMAGE_TIMEOUT)
+            except requests.RequestException as e:
+                reason = str(e)
+            else:
+                if response.status_code in (200, 304):
+                    return response
+                if response.status_code not in RETRY_STATUS_CODES:
+                    print(f"下载图片失败: HTTP {response.status_code}, {url}")
+                    return None
+                reason = f"HTTP {response.status_code}"
+
+            if attempt >= self.max_retries:
+                print(f"下载图片失败，已重试 {attempt} 次: {reason}, {url}")
+                return None
+            delay = self.backoff_base * (2 ** attempt)
+            time.sleep(random.uniform(delay / 2, delay))
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def finish(self, batch_size=200):
+        """等待全部下载完成，批量更新SKU的图片字段，返回成功更新的SKU数"""
+        results = {}
+        try:
+            for future in self.futures:
+                try:
+                    fields = future.result()
+                except Exception as e:
+                    print(f"下载图片异常: {str(e)}")
+                    self._count('failed')
+                    continue
+                if fields is not None:
+                    results[fields.pop('sku_code')] = fields
+        finally:
+            self.executor.shutdown(wait=True)
+            self.futures = []
+
+        blobs = {fields['blob'] for fields in results.values() if fields.get('blob')}
+        register_blobs(blobs)
+        skus = []
+        refs = Counter()
+        rows = SKU.objects.filter(sku_code__in=results).values_list('sku_code', 'id', 'img_url', 'img_hash')
+        for code, sku_id, old_url, old_hash in rows:
+            fields = results[code]
+            fields.pop('blob', None)
+            old_ref = blob_ref(old_url, old_hash)
+            new_ref = blob_ref(fields['img_url'], fields['img_hash'])
+            if old_ref != new_ref:
+                refs[old_ref] -= 1
+                refs[new_ref] += 1
+            skus.append(SKU(id=sku_id, **fields))
+        SKU.objects.bulk_update(skus, IMAGE_FIELDS, batch_size=batch_size)
+        ImageBlob.add_refs(refs)
+        # 每张图片按内容只生成一次缩略图，已存在的直接跳过
+        built, failed = build_all({(sha256, path) for sha256, path, _ in blobs}, self.workers)
+        if built or failed:
+            print(f"缩略图生成 {built} 张，失败 {failed} 张")
+        print(
+            f"图片下载完成: 下载 {self.stats['downloaded']} 张，未修改 {self.stats['not_modified']} 张，"
+            f"内容相同 {self.stats['unchanged']} 张，失败 {self.stats['failed']} 张"
+        )
+        return len(skus)
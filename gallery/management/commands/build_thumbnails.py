@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from gallery.models import ImageBlob
+from gallery.thumbnails import build_all
+
+
+class Command(BaseCommand):
+    help = '为内容寻址存储中的图片补齐缩略图（已生成的跳过）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='并发数，默认 ERP_IMAGE_WORKERS')
+
+    def handle(self, *args, **options):
+        blobs = ImageBlob.objects.filter(ref_count__gt=0).values_list('sha256', 'path')
+        built, failed = build_all(list(blobs), options['workers'])
+        self.stdout.write(self.style.SUCCESS(f'生成缩略图 {built} 张，失败 {failed} 张'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from gallery.cleanup import collect_orphan_images
+
+
+class Command(BaseCommand):
+    help = '清理未被 SKU 或分类引用的旧图片文件（可由定时任务或 run_sync_worker 定期执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='只清理超过指定天数未修改的文件')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批删除的文件数')
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不删除')
+
+    def handle(self, *args, **options):
+        stats = collect_orphan_images(
+            days=options['days'],
+            dry_run=options['dry_run'],
+            batch_size=options['batch_size'],
+        )
+        prefix = '[试运行] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}扫描 {stats['scanned']} 个文件，孤立文件 {stats['orphans']} 个，"
+            f"已删除 {stats['deleted']} 个，修正引用次数 {stats['refs_fixed']} 条"
+        ))
@@ -0,0 +1,50 @@
+from collections import Counter
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from gallery.media import BLOB_DIR, store_image
+from gallery.models import SKU, Category, ImageBlob
+
+
+class Command(BaseCommand):
+    help = '将旧的SKU图片和分类图片导入内容寻址存储，相同内容只保留一份引用'
+
+    def handle(self, *args, **options):
+        refs = Counter()
+        imported = missing = 0
+
+        skus = SKU.objects.exclude(img_url__isnull=True).exclude(img_url='').exclude(img_url__startswith=f'{BLOB_DIR}/')
+        for sku in skus.only('id', 'img_url', 'img_hash').iterator():
+            sha256 = self._import(sku.img_url)
+            if sha256 is None:
+                missing += 1
+                continue
+            path = ImageBlob.objects.get(sha256=sha256).path
+            SKU.objects.filter(pk=sku.pk).update(img_url=path, img_hash=sha256)
+            refs[sha256] += 1
+            imported += 1
+
+        categories = Category.objects.exclude(image='').exclude(image__isnull=True).exclude(image__startswith=f'{BLOB_DIR}/')
+        for category in categories.only('id', 'image', 'image_hash').iterator():
+            sha256 = self._import(category.image.name)
+            if sha256 is None:
+                missing += 1
+                continue
+            path = ImageBlob.objects.get(sha256=sha256).path
+            # 直接更新字段，不触发 Category.save 中的上传处理
+            Category.objects.filter(pk=category.pk).update(image=path, image_hash=sha256)
+            refs[sha256] += 1
+            imported += 1
+
+        # 旧文件不在内容寻址存储中，从未计入引用，只需增加新引用
+        ImageBlob.add_refs(refs)
+        self.stdout.write(self.style.SUCCESS(f'导入 {imported} 张图片，文件缺失 {missing} 张'))
+        if imported:
+            self.stdout.write('旧文件未删除，确认无误后可清理 skus/ 与 categories/ 目录')
+
+    def _import(self, name):
+        if not default_storage.exists(name):
+            self.stdout.write(self.style.WARNING(f'文件不存在: {name}'))
+            return None
+        with default_storage.open(name, 'rb') as f:
+            sha256, _ = store_image(f.read())
+        return sha256
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from gallery.models import SearchToken
+from gallery.search import MODELS, index_objects
+
+
+class Command(BaseCommand):
+    help = '重建 SKU / SPU 搜索索引（首次部署或索引不一致时执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='每批处理的对象数')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for kind, model in MODELS.items():
+            # 先清理已删除对象残留的词元
+            ids = set(model.objects.values_list('id', flat=True))
+            stale = set(SearchToken.objects.filter(kind=kind).values_list('object_id', flat=True).distinct()) - ids
+            SearchToken.objects.filter(kind=kind, object_id__in=stale).delete()
+
+            ids = sorted(ids)
+            tokens = 0
+            for start in range(0, len(ids), batch_size):
+                tokens += index_objects(kind, ids[start:start + batch_size])
+            self.stdout.write(self.style.SUCCESS(
+                f'{SearchToken.Kind(kind).label}: 索引 {len(ids)} 个对象，{tokens} 个词元，清理 {len(stale)} 个已删除对象'
+            ))
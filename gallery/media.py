@@ -0,0 +1,69 @@
+import os
+import hashlib
+import threading
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from .models import ImageBlob
+
+# 内容寻址图片的存储目录：blobs/<哈希前两位>/<哈希>.<扩展名>
+BLOB_DIR = 'blobs'
+
+_write_lock = threading.Lock()
+
+
+def guess_extension(content):
+    """按文件头判断图片格式，同一内容总是得到同一个扩展名"""
+    if content[:3] == b'\xff\xd8\xff':
+        return 'jpg'
+    if content[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    if content[:4] == b'GIF8':
+        return 'gif'
+    if content[:4] == b'RIFF' and content[8:12] == b'WEBP':
+        return 'webp'
+    return 'jpg'
+
+
+def blob_path(sha256, ext):
+    return f"{BLOB_DIR}/{sha256[:2]}/{sha256}.{ext}"
+
+
+def blob_ref(path, sha256):
+    """路径位于内容寻址存储中时返回其哈希，否则返回 None（旧文件不计引用）"""
+    if path and sha256 and str(path).startswith(f'{BLOB_DIR}/'):
+        return sha256
+    return None
+
+
+def write_blob(content):
+    """写入图片文件（不访问数据库），返回 (sha256, 路径, 大小)
+
+    相同内容的文件已存在时不再写入，只刷新其修改时间：清理任务不删除近期修改过的文件，
+    刚被复用、尚未保存引用的文件不会被当作孤立文件删除。
+    """
+    sha256 = hashlib.sha256(content).hexdigest()
+    path = blob_path(sha256, guess_extension(content))
+    with _write_lock:
+        try:
+            os.utime(default_storage.path(path))
+        except FileNotFoundError:
+            saved = default_storage.save(path, ContentFile(content))
+            if saved != path:
+                # 其他进程刚写入了相同内容，存储自动重命名了本次写入的文件
+                default_storage.delete(saved)
+    return sha256, path, len(content)
+
+
+def register_blobs(blobs):
+    """为 [(sha256, 路径, 大小), ...] 建立图片记录，已存在的跳过"""
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(sha256=sha256, path=path, size=size) for sha256, path, size in blobs],
+        ignore_conflicts=True,
+    )
+
+
+def store_image(content):
+    """保存图片并建立记录，返回 (sha256, 路径)；引用次数由调用方调整"""
+    sha256, path, size = write_blob(content)
+    register_blobs([(sha256, path, size)])
+    return sha256, path
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0006_brand_alter_sku_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sku',
+            name='sync_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True, verbose_name='同步指纹'),
+        ),
+        migrations.AddField(
+            model_name='spu',
+            name='sync_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True, verbose_name='同步指纹'),
+        ),
+    ]
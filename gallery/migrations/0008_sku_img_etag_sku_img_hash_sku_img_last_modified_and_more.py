@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0007_sku_sync_hash_spu_sync_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sku',
+            name='img_etag',
+            field=models.CharField(blank=True, editable=False, max_length=200, null=True, verbose_name='图片ETag'),
+        ),
+        migrations.AddField(
+            model_name='sku',
+            name='img_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, verbose_name='图片内容哈希'),
+        ),
+        migrations.AddField(
+            model_name='sku',
+            name='img_last_modified',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, verbose_name='图片Last-Modified'),
+        ),
+        migrations.AddField(
+            model_name='sku',
+            name='img_source_url',
+            field=models.CharField(blank=True, editable=False, max_length=500, null=True, verbose_name='图片来源地址'),
+        ),
+    ]
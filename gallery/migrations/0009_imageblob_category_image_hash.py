@@ -0,0 +1,35 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0008_sku_img_etag_sku_img_hash_sku_img_last_modified_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='内容哈希')),
+                ('path', models.CharField(max_length=255, verbose_name='存储路径')),
+                ('size', models.IntegerField(default=0, verbose_name='文件大小')),
+                ('ref_count', models.IntegerField(default=0, verbose_name='引用次数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '图片文件',
+                'verbose_name_plural': '图片文件',
+                'db_table': 'gallery_image_blob',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='image_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, verbose_name='图片内容哈希'),
+        ),
+    ]
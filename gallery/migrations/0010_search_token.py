@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0009_imageblob_category_image_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'SKU'), (2, 'SPU')], verbose_name='类型')),
+                ('object_id', models.IntegerField(verbose_name='对象ID')),
+                ('token', models.CharField(max_length=8, verbose_name='词元')),
+                ('weight', models.PositiveSmallIntegerField(default=1, verbose_name='权重')),
+            ],
+            options={
+                'verbose_name': '搜索索引',
+                'verbose_name_plural': '搜索索引',
+                'db_table': 'gallery_search_token',
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='gallery_search_object_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchtoken',
+            constraint=models.UniqueConstraint(fields=('kind', 'token', 'object_id'), name='gallery_search_token_uniq'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0010_search_token'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sku',
+            index=models.Index(fields=['created_at', 'id'], name='gallery_sku_created_idx'),
+        ),
+    ]
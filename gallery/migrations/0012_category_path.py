@@ -0,0 +1,42 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_category_paths(apps, schema_editor):
+    Category = apps.get_model('gallery', 'Category')
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def path_of(category_id, seen=()):
+        if category_id not in paths:
+            parent_id = parents.get(category_id)
+            # 父类目不存在或出现环时从该类目重新开始
+            prefix = path_of(parent_id, seen + (category_id,)) if parent_id in parents and parent_id not in seen else ''
+            paths[category_id] = f'{prefix}{category_id}/'
+        return paths[category_id]
+
+    batch = [Category(id=category_id, path=path_of(category_id)) for category_id in parents]
+    Category.objects.bulk_update(batch, ['path'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0011_list_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255, verbose_name='类目路径'),
+        ),
+        migrations.RunPython(fill_category_paths, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='spu',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='spus', to='gallery.category', verbose_name='所属类目'),
+        ),
+    ]
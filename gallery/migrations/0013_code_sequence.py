@@ -0,0 +1,40 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:20
+
+from django.db import migrations, models
+
+
+def create_sequences(apps, schema_editor):
+    """按已有编码初始化序列，避免与旧方式（ID+1）生成的编码重复"""
+    CodeSequence = apps.get_model('gallery', 'CodeSequence')
+    for name, model_name, field in (('sku', 'SKU', 'sku_code'), ('spu', 'SPU', 'spu_code')):
+        model = apps.get_model('gallery', model_name)
+        prefix = name.upper()
+        codes = model.objects.filter(**{f'{field}__regex': rf'^{prefix}[0-9]+$'}).values_list(field, flat=True)
+        largest = max((int(code[len(prefix):]) for code in codes), default=0)
+        last_id = model.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        CodeSequence.objects.update_or_create(name=name, defaults={'next_value': max(largest, last_id) + 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0012_category_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=20, unique=True, verbose_name='序列名称')),
+                ('next_value', models.BigIntegerField(default=1, verbose_name='下一个序号')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '编码序列',
+                'verbose_name_plural': '编码序列',
+                'db_table': 'gallery_code_sequence',
+            },
+        ),
+        migrations.RunPython(create_sequences, migrations.RunPython.noop),
+    ]
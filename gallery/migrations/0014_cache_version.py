@@ -0,0 +1,27 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0013_code_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='缓存名称')),
+                ('version', models.BigIntegerField(default=0, verbose_name='版本号')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '缓存版本',
+                'verbose_name_plural': '缓存版本',
+                'db_table': 'gallery_cache_version',
+            },
+        ),
+    ]
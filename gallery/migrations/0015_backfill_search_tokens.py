@@ -0,0 +1,59 @@
+import unicodedata
+from django.db import migrations
+
+# 与 gallery.search 中的切分规则一致；迁移中保留一份副本，不随之后的代码修改而变化
+NGRAM_SIZE = 2
+BATCH_SIZE = 1000
+
+SKU, SPU = 1, 2
+INDEX_FIELDS = {
+    SKU: ('SKU', (('sku_code', 4), ('spu__spu_code', 3), ('sku_name', 2), ('spu__spu_name', 1))),
+    SPU: ('SPU', (('spu_code', 4), ('spu_name', 2))),
+}
+
+
+def ngrams(text):
+    text = ''.join(unicodedata.normalize('NFKC', str(text or '')).lower().split())
+    if len(text) < NGRAM_SIZE:
+        return {text} if text else set()
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+def build_search_tokens(apps, schema_editor):
+    """为已有的 SKU 和 SPU 建立搜索索引，之后由模型保存和同步任务维护"""
+    SearchToken = apps.get_model('gallery', 'SearchToken')
+    for kind, (model_name, fields) in INDEX_FIELDS.items():
+        model = apps.get_model('gallery', model_name)
+        last_id = 0
+        while True:
+            rows = list(
+                model.objects.filter(pk__gt=last_id).order_by('pk')
+                .values_list('pk', *[field for field, _ in fields])[:BATCH_SIZE]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            ids = [row[0] for row in rows]
+            tokens = []
+            for row in rows:
+                weights = {}
+                for value, (_, weight) in zip(row[1:], fields):
+                    for token in ngrams(value):
+                        weights[token] = max(weights.get(token, 0), weight)
+                tokens.extend(
+                    SearchToken(kind=kind, object_id=row[0], token=token, weight=weight)
+                    for token, weight in weights.items()
+                )
+            SearchToken.objects.filter(kind=kind, object_id__in=ids).delete()
+            SearchToken.objects.bulk_create(tokens, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0014_cache_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_search_tokens, migrations.RunPython.noop),
+    ]
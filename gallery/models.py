@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.core.exceptions import ValidationError
 from django.conf import settings
 import uuid
@@ -13,6 +15,109 @@ def category_image_path(instance, filename):
         new_filename = f"category_{uuid.uuid4().hex[:8]}_{instance.category_name_en}.{ext}"
     return os.path.join('categories', new_filename)
 
+class ImageBlob(models.Model):
+    """按内容寻址存储的图片
+
+    文件以 SHA-256 命名，内容相同的图片只保存一份；SKU 的 img_hash、
+    分类的 image_hash 引用该哈希，ref_count 记录引用次数。
+    """
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name='内容哈希')
+    path = models.CharField(max_length=255, verbose_name='存储路径')
+    size = models.IntegerField(default=0, verbose_name='文件大小')
+    ref_count = models.IntegerField(default=0, verbose_name='引用次数')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    class Meta:
+        db_table = 'gallery_image_blob'
+        verbose_name = '图片文件'
+        verbose_name_plural = '图片文件'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.path} ({self.ref_count})"
+
+    @classmethod
+    def add_refs(cls, deltas):
+        """按 {哈希: 增减数} 调整引用次数，忽略空哈希"""
+        for sha256, delta in deltas.items():
+            if sha256 and delta:
+                cls.objects.filter(sha256=sha256).update(ref_count=models.F('ref_count') + delta)
+
+class SearchToken(models.Model):
+    """商品搜索索引
+
+    SKU、SPU 的编码和名称切分为 n-gram 后逐个保存，搜索时按词元等值查找，
+    不再对大表做 LIKE '%...%' 全表扫描。weight 为该词元出现字段的权重，用于排序。
+    """
+    class Kind(models.IntegerChoices):
+        SKU = 1, 'SKU'
+        SPU = 2, 'SPU'
+
+    kind = models.PositiveSmallIntegerField(choices=Kind.choices, verbose_name='类型')
+    object_id = models.IntegerField(verbose_name='对象ID')
+    token = models.CharField(max_length=8, verbose_name='词元')
+    weight = models.PositiveSmallIntegerField(default=1, verbose_name='权重')
+
+    class Meta:
+        db_table = 'gallery_search_token'
+        verbose_name = '搜索索引'
+        verbose_name_plural = '搜索索引'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'token', 'object_id'], name='gallery_search_token_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'object_id'], name='gallery_search_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id}: {self.token}"
+
+class CodeSequence(models.Model):
+    """SKU/SPU 编码序列，next_value 为下一个未分配的序号，由 sequences 模块按块分配"""
+    name = models.CharField(max_length=20, unique=True, verbose_name='序列名称')
+    next_value = models.BigIntegerField(default=1, verbose_name='下一个序号')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'gallery_code_sequence'
+        verbose_name = '编码序列'
+        verbose_name_plural = '编码序列'
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+class CacheVersion(models.Model):
+    """进程内缓存的版本号，数据变化时递增，各进程发现版本变化后重新加载
+
+    版本号存放在数据库中，所有进程看到同一个值；在事务中递增时随数据一同提交。
+    """
+    name = models.CharField(max_length=50, unique=True, verbose_name='缓存名称')
+    version = models.BigIntegerField(default=0, verbose_name='版本号')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'gallery_cache_version'
+        verbose_name = '缓存版本'
+        verbose_name_plural = '缓存版本'
+
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+    @classmethod
+    def current(cls, name):
+        return cls.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, name):
+        if cls.objects.filter(name=name).update(version=F('version') + 1):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(name=name, version=1)
+        except IntegrityError:
+            # 其他进程已经创建
+            cls.objects.filter(name=name).update(version=F('version') + 1)
+
 class Brand(models.Model):
     name = models.CharField(max_length=100, verbose_name='品牌名称')
     description = models.TextField(blank=True, null=True, verbose_name='品牌描述')
@@ -71,6 +176,9 @@ class Category(models.Model):
         default=False, 
         verbose_name='是否最后一级'
     )
+    image_hash = models.CharField(max_length=64, null=True, blank=True, editable=False, verbose_name='图片内容哈希')
+    # 物化路径：从一级类目到本类目的ID，如 "1/5/12/"，按前缀匹配即可筛选整棵子树
+    path = models.CharField(max_length=255, default='', db_index=True, editable=False, verbose_name='类目路径')
     status = models.IntegerField(
         choices=STATUS_CHOICES,
         default=1,
@@ -88,38 +196,64 @@ class Category(models.Model):
     def __str__(self):
         return f"{self.category_name_zh} ({self.category_name_en})"
 
+    def _parent_node(self):
+        # 父类目的层级和路径从数据库读取：类目树缓存可能还没反映其他进程刚做的修改，
+        # 按过期的路径保存会让整棵子树的路径出错
+        if not self.parent_id:
+            return None
+        return Category.objects.filter(pk=self.parent_id).only('level', 'path').first()
+
     def clean(self):
-        if self.parent:
-            if self.level <= self.parent.level:
+        self._check_parent(self._parent_node())
+
+    def _check_parent(self, parent):
+        if parent:
+            if self.level <= parent.level:
                 raise ValidationError('子类目的层级必须大于父类目的层级')
+            if self.pk and str(self.pk) in parent.path.split('/'):
+                raise ValidationError('不能把类目移动到它自己或其下级类目之下')
         elif self.level != 1:
             raise ValidationError('没有父类目时，必须是一级分类')
 
     def save(self, *args, **kwargs):
-        self.clean()
+        from .categories import invalidate_category_tree
+        parent = self._parent_node()
+        self._check_parent(parent)
+        old = Category.objects.filter(pk=self.pk).values_list('path', 'level').first() if self.pk else None
+        old_hash = self.image_hash
+        if self.image and not self.image._committed:
+            # 新上传的图片存入内容寻址存储，相同内容只保存一份
+            from .media import store_image
+            self.image_hash, self.image = store_image(self.image.read())
+        elif not self.image:
+            self.image_hash = None
         super().save(*args, **kwargs)
-        
-        if self.image and not self.image.name.startswith(f'categories/category_{self.pk}_'):
-            old_path = self.image.path
-            filename = os.path.basename(self.image.name)
-            ext = filename.split('.')[-1]
-            
-            new_filename = f"category_{self.pk}_{self.category_name_en}.{ext}"
-            new_path = os.path.join('categories', new_filename)
-            
-            self.image.name = new_path
-            super().save(update_fields=['image'])
-            
-            if os.path.exists(old_path):
-                new_full_path = os.path.join(settings.MEDIA_ROOT, new_path)
-                os.makedirs(os.path.dirname(new_full_path), exist_ok=True)
-                os.rename(old_path, new_full_path)
+        if old_hash != self.image_hash:
+            ImageBlob.add_refs({old_hash: -1, self.image_hash: 1})
+
+        path = f"{parent.path if parent else ''}{self.pk}/"
+        if old is None or old[0] != path:
+            Category.objects.filter(pk=self.pk).update(path=path)
+        if old and old[0] and (old[0] != path or old[1] != self.level):
+            # 更换父类目或调整层级时，下级类目的路径前缀和层级随之更新
+            Category.objects.filter(path__startswith=old[0]).exclude(pk=self.pk).update(
+                path=Concat(Value(path), Substr('path', len(old[0]) + 1)),
+                level=F('level') + (self.level - old[1]),
+            )
+        self.path = path
+        invalidate_category_tree()
+
+    def delete(self, *args, **kwargs):
+        from .categories import invalidate_category_tree
+        # 图片引用数由 signals 中的 post_delete 处理，级联删除的下级类目同样适用
+        result = super().delete(*args, **kwargs)
+        invalidate_category_tree()
+        return result
 
     @property
     def full_name(self):
-        if self.parent:
-            return f"{self.parent.full_name} > {self.category_name_zh}"
-        return self.category_name_zh
+        from .categories import category_full_name
+        return category_full_name(self.pk) or self.category_name_zh
 
 class SPU(models.Model):
     PRODUCT_TYPE_CHOICES = (
@@ -141,7 +275,9 @@ class SPU(models.Model):
     sales_channel = models.IntegerField(choices=SALES_CHANNEL_CHOICES, null=True, blank=True, verbose_name='销售渠道')
     brand = models.CharField(max_length=50, null=True, blank=True, verbose_name='品牌')
     poc = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='专员')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='spus', verbose_name='所属类目')
     status = models.BooleanField(default=True, verbose_name='状态')
+    sync_hash = models.CharField(max_length=40, null=True, blank=True, editable=False, verbose_name='同步指纹')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
@@ -154,6 +290,30 @@ class SPU(models.Model):
     def __str__(self):
         return f"{self.spu_code} - {self.spu_name}"
 
+    @property
+    def category_full_name(self):
+        from .categories import category_full_name
+        return category_full_name(self.category_id)
+
+    def save(self, *args, **kwargs):
+        from .facets import invalidate_facets
+        from .search import index_spus
+        super().save(*args, **kwargs)
+        index_spus([self.pk])
+        invalidate_facets()
+
+    def delete(self, *args, **kwargs):
+        from .facets import invalidate_facets
+        from .search import remove_objects
+        spu_id = self.pk
+        # SKU 随 SPU 级联删除，不经过 SKU.delete，一并清理其索引
+        sku_ids = list(SKU.objects.filter(spu_id=spu_id).values_list('id', flat=True))
+        result = super().delete(*args, **kwargs)
+        remove_objects(SearchToken.Kind.SPU, [spu_id])
+        remove_objects(SearchToken.Kind.SKU, sku_ids)
+        invalidate_facets()
+        return result
+
 class SKU(models.Model):
     PLATING_PROCESS_CHOICES = (
         ('none', '无电镀'),
@@ -179,7 +339,12 @@ class SKU(models.Model):
     other_dimensions = models.CharField(max_length=25, null=True, blank=True, verbose_name='其他尺寸')
     suppliers_list = models.JSONField(default=list, verbose_name='供应商列表')
     img_url = models.CharField(max_length=255, null=True, blank=True, verbose_name='图片URL')
+    img_source_url = models.CharField(max_length=500, null=True, blank=True, editable=False, verbose_name='图片来源地址')
+    img_etag = models.CharField(max_length=200, null=True, blank=True, editable=False, verbose_name='图片ETag')
+    img_last_modified = models.CharField(max_length=64, null=True, blank=True, editable=False, verbose_name='图片Last-Modified')
+    img_hash = models.CharField(max_length=64, null=True, blank=True, editable=False, verbose_name='图片内容哈希')
     status = models.BooleanField(default=True, verbose_name='状态')
+    sync_hash = models.CharField(max_length=40, null=True, blank=True, editable=False, verbose_name='同步指纹')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
@@ -188,6 +353,27 @@ class SKU(models.Model):
         verbose_name = 'SKU'
         verbose_name_plural = 'SKU列表'
         ordering = ['-created_at']
+        # SKU 列表按 (created_at, id) 键集分页
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='gallery_sku_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.sku_code} - {self.sku_name}"
+
+    def save(self, *args, **kwargs):
+        from .facets import invalidate_facets
+        from .search import index_skus
+        super().save(*args, **kwargs)
+        index_skus([self.pk])
+        invalidate_facets()
+
+    def delete(self, *args, **kwargs):
+        from .facets import invalidate_facets
+        from .search import remove_objects
+        # 图片引用数由 signals 中的 post_delete 处理，SPU 级联删除和批量删除同样适用
+        sku_id = self.pk
+        result = super().delete(*args, **kwargs)
+        remove_objects(SearchToken.Kind.SKU, [sku_id])
+        invalidate_facets()
+        return result
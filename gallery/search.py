@@ -0,0 +1,137 @@
+import unicodedata
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Sum, When
+from .models import SearchToken, SPU, SKU
+
+# n-gram 长度：中文按两个字切分，编码中的连续字符同样适用
+NGRAM_SIZE = 2
+
+# 各类型参与索引的字段及权重，编码命中排在名称命中之前
+INDEX_FIELDS = {
+    SearchToken.Kind.SKU: (('sku_code', 4), ('spu__spu_code', 3), ('sku_name', 2), ('spu__spu_name', 1)),
+    SearchToken.Kind.SPU: (('spu_code', 4), ('spu_name', 2)),
+}
+
+MODELS = {
+    SearchToken.Kind.SKU: SKU,
+    SearchToken.Kind.SPU: SPU,
+}
+
+
+def normalize(text):
+    """统一全角/半角和大小写，去掉空白"""
+    text = unicodedata.normalize('NFKC', str(text or '')).lower()
+    return ''.join(text.split())
+
+
+def ngrams(text):
+    text = normalize(text)
+    if len(text) < NGRAM_SIZE:
+        return {text} if text else set()
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+def index_objects(kind, ids, batch_size=1000):
+    """重建指定对象的索引词元；对象已不存在时只删除旧词元"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    fields = INDEX_FIELDS[kind]
+    tokens = []
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        rows = MODELS[kind].objects.filter(pk__in=chunk).values_list('pk', *[field for field, _ in fields])
+        for row in rows:
+            weights = {}
+            for value, (_, weight) in zip(row[1:], fields):
+                for token in ngrams(value):
+                    weights[token] = max(weights.get(token, 0), weight)
+            tokens.extend(
+                SearchToken(kind=kind, object_id=row[0], token=token, weight=weight)
+                for token, weight in weights.items()
+            )
+
+    with transaction.atomic():
+        for start in range(0, len(ids), batch_size):
+            SearchToken.objects.filter(kind=kind, object_id__in=ids[start:start + batch_size]).delete()
+        # 大小写、重音不敏感的排序规则下不同词元可能被视为重复，忽略冲突
+        SearchToken.objects.bulk_create(tokens, batch_size=batch_size, ignore_conflicts=True)
+    return len(tokens)
+
+
+def index_skus(ids):
+    return index_objects(SearchToken.Kind.SKU, ids)
+
+
+def index_spus(ids):
+    """重建 SPU 的索引，并连带重建其下 SKU 的索引（SKU 索引包含 SPU 编码和名称）"""
+    ids = list(ids)
+    index_objects(SearchToken.Kind.SPU, ids)
+    index_skus(SKU.objects.filter(spu_id__in=ids).values_list('id', flat=True))
+
+
+def remove_objects(kind, ids):
+    SearchToken.objects.filter(kind=kind, object_id__in=list(ids)).delete()
+
+
+def search_candidates(kind, query):
+    """包含查询词全部词元的对象ID集合，最多 SEARCH_PROBE_LIMIT 个
+
+    编码前缀等常见词元（如 "sk"、"00"）几乎每个对象都有，按全部词元分组统计需要读取
+    数倍于对象数的索引记录。这里先用带上限的计数探测各词元的对象数，从最少的词元取出
+    对象ID作为候选，再逐个用其余词元在候选范围内核对，读取量与候选数成正比。
+    最少的词元也超过上限（查询词全由常见词元组成）时索引无法缩小范围，返回 None，
+    调用方只按原条件查询，不截断结果；查询词短于 n-gram 长度时同样返回 None。
+    """
+    grams = ngrams(query)
+    if len(normalize(query)) < NGRAM_SIZE:
+        return None
+    probe_limit = getattr(settings, 'SEARCH_PROBE_LIMIT', 5000)
+    tokens = SearchToken.objects.filter(kind=kind)
+    counts = sorted((tokens.filter(token=gram)[:probe_limit + 1].count(), gram) for gram in grams)
+    if counts[0][0] > probe_limit:
+        return None
+    if counts[0][0] == 0:
+        return set()
+    candidates = set(tokens.filter(token=counts[0][1]).values_list('object_id', flat=True))
+    for _, gram in counts[1:]:
+        if not candidates:
+            break
+        candidates = set(tokens.filter(token=gram, object_id__in=candidates).values_list('object_id', flat=True))
+    return candidates
+
+
+def search_ids(kind, query, limit=None, candidates=None):
+    """按相关度返回最相关的对象ID列表，最多 limit（默认 SEARCH_MAX_RESULTS）个
+
+    只用于排序：匹配的对象可能多于 limit 个，筛选应使用 search_candidates 的结果。
+    按命中字段的权重之和排序，只在候选范围内统计；candidates 为已取得的候选集合，
+    省略时重新计算。无法使用索引（见 search_candidates）时返回 None。
+    """
+    if candidates is None:
+        candidates = search_candidates(kind, query)
+        if candidates is None:
+            return None
+    if not candidates:
+        return []
+    grams = ngrams(query)
+    limit = limit or getattr(settings, 'SEARCH_MAX_RESULTS', 500)
+    rows = SearchToken.objects.filter(kind=kind, token__in=grams, object_id__in=candidates).values('object_id').annotate(
+        hits=Count('token'), score=Sum('weight'),
+    ).filter(hits=len(grams)).order_by('-score', '-object_id')[:limit]
+    return [row['object_id'] for row in rows]
+
+
+def ranked(queryset, ids):
+    """按 search_ids 返回的顺序排列查询集，不在 ids 中的对象按ID倒序排在其后
+
+    只排序不筛选，查询集应已按 search_candidates 等条件筛选。
+    """
+    if not ids:
+        return queryset.order_by('-pk')
+    order = Case(
+        *[When(pk=pk, then=position) for position, pk in enumerate(ids)],
+        default=len(ids), output_field=IntegerField(),
+    )
+    return queryset.order_by(order, '-pk')
@@ -0,0 +1,117 @@
+import os
+import threading
+from itertools import chain, islice
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import CodeSequence, SPU, SKU
+
+# 序列名称: (编码前缀, 模型, 编码字段)
+SEQUENCES = {
+    'sku': ('SKU', SKU, 'sku_code'),
+    'spu': ('SPU', SPU, 'spu_code'),
+}
+
+# 编码中序号的最少位数，如 SKU000123
+CODE_DIGITS = 6
+
+
+def format_code(name, value):
+    return f'{SEQUENCES[name][0]}{value:0{CODE_DIGITS}d}'
+
+
+def initial_value(name):
+    """序列的起始序号：大于已有同格式编码的最大序号，也大于最大ID（旧的生成方式按 ID+1 编号）"""
+    prefix, model, field = SEQUENCES[name]
+    codes = model.objects.filter(**{f'{field}__regex': rf'^{prefix}[0-9]+$'}).values_list(field, flat=True)
+    largest = max((int(code[len(prefix):]) for code in codes), default=0)
+    last_id = model.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    return max(largest, last_id) + 1
+
+
+def _ensure_sequence(name):
+    try:
+        with transaction.atomic():
+            CodeSequence.objects.create(name=name, next_value=initial_value(name))
+    except IntegrityError:
+        # 其他进程已经创建
+        pass
+
+
+def reserve(name, count):
+    """在数据库中预留 count 个连续序号并返回 range
+
+    一条 UPDATE 把 next_value 加上 count，行锁保证并发调用得到的区间互不重叠。
+    """
+    with transaction.atomic():
+        if not CodeSequence.objects.filter(name=name).update(next_value=F('next_value') + count):
+            _ensure_sequence(name)
+            CodeSequence.objects.filter(name=name).update(next_value=F('next_value') + count)
+        end = CodeSequence.objects.filter(name=name).values_list('next_value', flat=True).get()
+    return range(end - count, end)
+
+
+class CodeAllocator:
+    """进程内的编码分配器
+
+    每次从数据库预留 CODE_SEQUENCE_BLOCK_SIZE 个序号，在内存中逐个发放，用完再预留下一块，
+    批量创建时一次取出所需数量，不需要逐条加锁。进程重启时未用完的序号作废，编码可能不连续。
+    在外层事务中预留时，预留随外层事务提交才生效，多余的序号等提交后才留作后用；
+    这种情况下取得的编码也只应在该事务中使用。
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._values = iter(())
+        self._pid = None
+
+    @property
+    def block_size(self):
+        return getattr(settings, 'CODE_SEQUENCE_BLOCK_SIZE', 20)
+
+    def _check_pid(self):
+        # fork 出的子进程不能沿用父进程预留的序号
+        if self._pid != os.getpid():
+            self._values = iter(())
+            self._pid = os.getpid()
+
+    def _keep(self, values):
+        with self._lock:
+            self._check_pid()
+            self._values = chain(self._values, values)
+
+    def allocate(self, count=1):
+        """分配 count 个编码，返回编码列表"""
+        with self._lock:
+            self._check_pid()
+            values = list(islice(self._values, count))
+            if len(values) < count:
+                need = count - len(values)
+                block = reserve(self.name, max(need, self.block_size))
+                values += block[:need]
+                rest = block[need:]
+                if transaction.get_connection().in_atomic_block:
+                    transaction.on_commit(lambda: self._keep(rest))
+                else:
+                    self._values = chain(self._values, rest)
+        return [format_code(self.name, value) for value in values]
+
+
+_allocators = {name: CodeAllocator(name) for name in SEQUENCES}
+
+
+def next_sku_code():
+    return _allocators['sku'].allocate()[0]
+
+
+def next_spu_code():
+    return _allocators['spu'].allocate()[0]
+
+
+def next_sku_codes(count):
+    return _allocators['sku'].allocate(count)
+
+
+def next_spu_codes(count):
+    return _allocators['spu'].allocate(count)
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .media import blob_ref
+from .models import Category, ImageBlob, SKU
+
+# 图片引用数在删除信号中调整：SPU 级联删除 SKU、上级类目级联删除下级类目，
+# 以及查询集的批量删除都不经过模型的 delete()，但都会逐条发送 post_delete
+
+
+@receiver(post_delete, sender=SKU)
+def release_sku_image(sender, instance, **kwargs):
+    ImageBlob.add_refs({blob_ref(instance.img_url, instance.img_hash): -1})
+
+
+@receiver(post_delete, sender=Category)
+def release_category_image(sender, instance, **kwargs):
+    ImageBlob.add_refs({instance.image_hash: -1})
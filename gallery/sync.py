@@ -1,263 +1,262 @@
-import time
-import json
-import hashlib
-import requests
-import math
-import os
+from decimal import Decimal
 from datetime import datetime, timedelta
 from django.conf import settings
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
-from .models import SPU, SKU, Category
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from erp.client import get_client
+from erp.fingerprint import fingerprint, ChangeFilter
+from erp.pagination import PageFetcher
+from erp.pipeline import Pipeline
+from erp.models import SyncRun
+from .models import Category, SPU, SKU, SearchToken
+from .categories import category_tree
+from .images import ImageFetcher
+from .facets import invalidate_facets
+from .search import index_objects, index_skus
 
 class ProductSync:
+    endpoint = 'product/v1/getItemList'
+    stream = 'products'
+
+    # 同步时覆盖的SKU字段，created_at 等其余字段保持不变
+    SKU_SYNC_FIELDS = (
+        'sku_name', 'suppliers_list', 'plating_process', 'color', 'material',
+        'length', 'width', 'height', 'weight', 'status', 'spu', 'img_url', 'sync_hash', 'updated_at',
+    )
+
     def __init__(self):
-        self.app_name = "mathmagic"
-        self.app_key = "82be0592545283da00744b489f758f99"
-        self.sid = "mathmagic"
-        self.api_url = "https://openapi.qizhishangke.com/api/openservices/product/v1/getItemList"
-        
-    def generate_sign(self, body):
-        headers = {
-            'Content-Type': 'application/json'
-        }
+        self.client = get_client()
 
-        timestamp = str(int(time.time()))
-        sign_str = f"{self.app_key}appName{self.app_name}body{body}sid{self.sid}timestamp{timestamp}{self.app_key}"
-        sign = hashlib.md5(sign_str.encode()).hexdigest()
-        
-        params = {
-            "appName": self.app_name,
-            "sid": self.sid,
-            "sign": sign,
-            "timestamp": timestamp,
-        }
-        return params, headers
+    def sync_products(self, start_time=None, end_time=None, full=False):
+        """同步产品数据
 
-    def sync_products(self, start_time=None, end_time=None, page=1):
-        """同步产品数据"""
-        print(f"开始同步第 {page} 页数据...")  # 添加调试信息
-        
+        未指定时间范围时按同步水位增量同步（full=True 时回溯85天全量同步），
+        每完成一页记录一次检查点，成功后推进水位。
+        内容指纹与上次同步相同的产品不再写入；full=True 时全部重新写入。
+        图片在每页数据提交后交给 ImageFetcher 并发下载，同步结束前等待下载完成。
+        """
+        run = None
+        if not start_time and not end_time:
+            # 存在中断的运行时沿用其时间窗口，从第 1 页重新抓取（见 SyncRun）
+            run = SyncRun.begin_incremental(self.stream, default_days=85, full=full)
+            start_time, end_time = run.start_time, run.end_time
         if not start_time:
-            # 默认同步最近7天的数据
             start_time = (datetime.now() - timedelta(days=85)).strftime('%Y-%m-%d %H:%M:%S')
         if not end_time:
             end_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
         print(f"同步时间范围: {start_time} 到 {end_time}")  # 添加调试信息
 
-        body = {
-            "page_size": 100,
-            "page_no": page,
-            "start_time": start_time,
-            "end_time": end_time,
-            "status": 0
-        }
-
-        body_str = json.dumps(body, ensure_ascii=False, separators=(",", ":"))
-        params, headers = self.generate_sign(body_str)
+        def build_body(page, page_size):
+            return {
+                "page_size": page_size,
+                "page_no": page,
+                "start_time": start_time,
+                "end_time": end_time,
+                "status": 0
+            }
 
         try:
-            response = requests.post(self.api_url, params=params, headers=headers, data=body_str)
-            print(f"API响应状态码: {response.status_code}")  # 添加调试信息
-            
-            if response.status_code != 200:
-                print(f"API响应内容: {response.text}")  # 添加调试信息
-                raise Exception(f"API请求失败: {response.text}")
-
-            result = response.json()
-            if result['code'] != 200:
-                raise Exception(f"业务处理失败: {result['message']}")
-
-            data = result['data']
-            total = data['total']
-            page_size = data['pageSize']
-            current_page = data['currentPage']
-            max_page = math.ceil(total / page_size)
-
-            # 处理当前页的数据
-            synced_count = self._process_products(data['data'])
-
-            # 如果还有下一页，递归处理
-            if current_page < max_page :
-                time.sleep(1)  # 避免请求过快
-                next_count = self.sync_products(start_time, end_time, page + 1)
-                synced_count += next_count
+            self._load_categories()
+            self.changes = ChangeFilter('product_sync', force=full)
+            self.images = ImageFetcher()
+            # 抓取、转换、写入三个阶段流水线执行，页面之间不再递归
+            fetcher = PageFetcher(self.endpoint, build_body, client=self.client)
+            pipeline = Pipeline(
+                'product_sync',
+                fetcher.records(),
+                self._transform_products,
+                self._process_products,
+                checkpoint=run.checkpoint if run else None,
+            )
+            try:
+                synced_count = pipeline.run()
+            finally:
+                # 已提交页面的图片仍需下载完成并写回，同步失败时也不丢弃
+                self.images.finish()
+                # 批量写入不经过模型 save，已提交的页面同样需要刷新筛选项
+                invalidate_facets()
+            self.changes.log_summary()
 
+            if run:
+                run.finish(unchanged=self.changes.unchanged)
             return synced_count
 
         except Exception as e:
             print(f"发生异常: {str(e)}")  # 添加调试信息
+            if run:
+                run.fail(e)
             raise
 
-    def _download_image(self, image_url, sku_code):
-        """下载图片"""
-        try:
-            print(f"开始下载图片: {image_url}")
-            
-            # 添加请求头，模拟浏览器行为
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            response = requests.get(image_url, headers=headers, timeout=30)
-            if response.status_code == 200:
-                # 检查内容类型
-                content_type = response.headers.get('content-type', '')
-                if not content_type.startswith('image/'):
-                    print(f"非图片内容类型: {content_type}")
-                    return None
-                    
-                # 生成文件名
-                ext = image_url.split('.')[-1].lower()
-                if ext not in ['jpg', 'jpeg', 'png', 'gif']:
-                    ext = 'jpg'
-                filename = f"skus/{sku_code}.{ext}"  # 确保这个路径与 MEDIA_ROOT 相对应
-                
-                try:
-                    # 删除旧图片
-                    storage = default_storage
-                    if storage.exists(filename):
-                        storage.delete(filename)
-                    
-                    # 保存新图片
-                    path = default_storage.save(filename, ContentFile(response.content))
-                    print(f"图片保存成功: {path}")
-                    return path
-                except Exception as e:
-                    print(f"保存图片失败: {str(e)}")
-                    return None
-            else:
-                print(f"下载图片失败: HTTP {response.status_code}")
-                print(f"响应内容: {response.text[:200]}")  # 只打印前200个字符
-                return None
-            
-        except requests.exceptions.Timeout:
-            print(f"下载图片超时: {image_url}")
-            return None
-        except requests.exceptions.RequestException as e:
-            print(f"请求图片失败: {str(e)}")
-            return None
-        except Exception as e:
-            print(f"下载图片异常: {str(e)}")
-            return None
+    def _load_categories(self):
+        """每次同步运行加载一次类目，按英文名（小写）建立索引"""
+        self.categories = {
+            category.category_name_en.replace(' ', '').lower(): category
+            for category in category_tree().nodes.values()
+        }
+        self.unmatched_classes = set()
 
-    def _process_products(self, products):
-        """处理产品数据"""
-        synced_count = 0
-        
-        # 获取默认类目
-        default_category = Category.objects.filter(is_last_level=True).first()
-        if not default_category:
-            raise Exception("系统中没有可用的最后一级类目，请先创建类目")
-        
+    def _match_category(self, class_name):
+        # 将类目名转换为英文格式（去除空格，转小写）后在本次运行的类目索引中匹配
+        class_name_en = class_name.replace(' ', '').lower()
+        category = self.categories.get(class_name_en)
+        if category is None and class_name not in self.unmatched_classes:
+            self.unmatched_classes.add(class_name)
+            print(f"未找到类目 {class_name}({class_name_en})")
+        return category
+
+    def _transform_products(self, products):
+        """将接口返回的产品数据转换为待写入的数据行，丢弃内容未变化的产品"""
+        rows = []
         for product in products:
             try:
-                print(f"开始处理产品: {product['specNo']}")
-                
-                # 根据 className 查找对应的类目
-                category = default_category  # 默认类目
-                if product.get('className'):
-                    try:
-                        # 将中文类目名转换为英文格式（去除空格，转小写）
-                        class_name_en = product['className'].replace(' ', '').lower()
-                        # 尝试通过英文名称匹配类目
-                        category = Category.objects.filter(
-                            category_name_en__iexact=class_name_en,  # 不区分大小写匹配
-                        ).first() or default_category
-                        
-                        if category == default_category:
-                            print(f"未找到类目 {product['className']}({class_name_en})，使用默认类目")
-                    except Category.DoesNotExist:
-                        print(f"未找到类目 {product['className']}，使用默认类目")
-                
-                # 处理SPU
+                category = self._match_category(product['className']) if product.get('className') else None
+
+                # 移除时间戳参数
+                image_url = product['imgUrl'].split('?')[0] if product.get('imgUrl') else None
                 spu_defaults = {
                     'spu_name': product['goodsName'],
                     'status': True,
-                    'category': category,  # 使用匹配到的类目
                 }
-                
-                try:
-                    spu = SPU.objects.get(spu_code=product['goodsNo'])
-                    # 如果 SPU 已存在，不更新类目
-                    spu_defaults['category'] = spu.category
-                except SPU.DoesNotExist:
-                    pass
-                
-                spu, created = SPU.objects.update_or_create(
-                    spu_code=product['goodsNo'],
-                    defaults=spu_defaults
-                )
-                print(f"SPU {'创建' if created else '更新'} 成功: {spu.spu_code}")
+                if category:
+                    spu_defaults['category_id'] = category.id
 
-                # 处理SKU
                 sku_defaults = {
                     'sku_name': product['specName'],
-                    'provider_code': product['providerList'][0]['providerNo'] if product['providerList'] else 'unknown',  # 使用供应商编码
+                    'suppliers_list': [provider['providerNo'] for provider in product['providerList'] or []],  # 供应商编码列表
                     'plating_process': product['prop4'] or 'none',  # 电镀工艺，如果为空则为'none'
                     'color': product['prop2'] or '无',  # 颜色
                     'material': product['prop8'] or '无',  # 材质
-                    'length': float(product['length']) if product['length'] else 0,
-                    'width': float(product['width']) if product['width'] else 0,
-                    'height': float(product['height']) if product['height'] else 0,
-                    'weight': float(product['weight']) if product['weight'] else 0,
+                    'length': int(float(product['length'])) if product['length'] else 0,
+                    'width': int(float(product['width'])) if product['width'] else 0,
+                    'height': int(float(product['height'])) if product['height'] else 0,
+                    'weight': Decimal(str(product['weight'])) if product['weight'] else 0,
                     'status': True,
-                    'spu': spu,
                 }
-
-                # 处理图片
-                if product.get('imgUrl'):
-                    image_url = product['imgUrl']
-                    print(f"发现图片URL: {image_url}")
-                    # 移除时间戳参数
-                    image_url = image_url.split('?')[0]
-                    image_path = self._download_image(image_url, product['specNo'])
-                    if image_path:
-                        sku_defaults['img_url'] = image_path
-
-                sku, created = SKU.objects.update_or_create(
-                    sku_code=product['specNo'],
-                    defaults=sku_defaults
-                )
-                print(f"SKU {'创建' if created else '更新'} 成功: {sku.sku_code}")
-                
-                synced_count += 1
-
+                rows.append({
+                    'spu_code': product['goodsNo'],
+                    'spu_defaults': spu_defaults,
+                    'spu_hash': fingerprint(dict(spu_defaults, spu_code=product['goodsNo'])),
+                    'sku_code': product['specNo'],
+                    'sku_defaults': sku_defaults,
+                    'image_url': image_url,
+                    # 图片地址中的时间戳每次请求都可能不同，按去掉参数后的地址计算指纹
+                    'sync_hash': fingerprint(dict(product, imgUrl=image_url)),
+                })
             except Exception as e:
-                print(f"处理产品数据失败: {str(e)}, 产品: {product['specNo']}")
-                print(f"错误详情: {type(e).__name__}")
+                print(f"解析产品数据失败: {str(e)}, 产品: {product.get('specNo')}")
                 print(f"产品数据: {product}")
                 continue
 
-        return synced_count
+        stored = dict(SKU.objects.filter(sku_code__in=[row['sku_code'] for row in rows]).values_list('sku_code', 'sync_hash'))
+        rows = self.changes.changed_rows(rows, stored, key='sku_code')
+
+        stored_spus = dict(SPU.objects.filter(spu_code__in={row['spu_code'] for row in rows}).values_list('spu_code', 'sync_hash'))
+        for row in rows:
+            row['spu_changed'] = self.changes.force or stored_spus.get(row['spu_code']) != row['spu_hash']
+        return rows
+
+    def _bulk_write_products(self, rows):
+        """按编码预加载并批量写入一批 SPU / SKU"""
+        # SPU：同一页中重复的编码以最后一条为准；已有 SPU 只更新名称和状态，
+        # 类目、产品类型、专员等字段保持不变（类目可能是手工指定的），
+        # 匹配到的类目只在新建 SPU 时写入
+        # 内容指纹未变化的 SPU 不再写入
+        spus = {}
+        for row in rows:
+            if row.get('spu_changed', True):
+                spus[row['spu_code']] = SPU(spu_code=row['spu_code'], sync_hash=row['spu_hash'], **row['spu_defaults'])
+        # 类目索引在运行开始时加载，期间可能有类目被删除：只写入仍存在的类目，
+        # 并锁定这些类目直到本页提交，写入期间不能被删除
+        category_ids = {spu.category_id for spu in spus.values() if spu.category_id is not None}
+        if category_ids:
+            existing = set(Category.objects.select_for_update().filter(id__in=category_ids).values_list('id', flat=True))
+            for spu in spus.values():
+                if spu.category_id is not None and spu.category_id not in existing:
+                    spu.category_id = None
+        if spus:
+            SPU.objects.bulk_create(
+                list(spus.values()),
+                update_conflicts=True,
+                unique_fields=self._unique_fields('spu_code'),
+                update_fields=['spu_name', 'status', 'sync_hash', 'updated_at'],
+            )
+        # MySQL 批量插入不返回主键，统一按编码回查
+        spu_ids = dict(SPU.objects.filter(spu_code__in={row['spu_code'] for row in rows}).values_list('spu_code', 'id'))
+
+        sku_codes = [row['sku_code'] for row in rows]
+        existing_images = {
+            image['sku_code']: image
+            for image in SKU.objects.filter(sku_code__in=sku_codes).values(
+                'sku_code', 'img_url', 'img_source_url', 'img_etag', 'img_last_modified', 'img_hash'
+            )
+        }
+
+        skus = {}
+        image_tasks = {}
+        for row in rows:
+            image = existing_images.get(row['sku_code'], {})
+            sync_hash = row['sync_hash']
+            if row['image_url']:
+                # 图片下载成功后才写入指纹，下载失败或中断时下次同步重新处理
+                sync_hash = None
+                image_tasks[row['sku_code']] = {
+                    'img_url': None, 'img_source_url': None, 'img_etag': None,
+                    'img_last_modified': None, 'img_hash': None,
+                    **image,
+                    'sku_code': row['sku_code'],
+                    'url': row['image_url'],
+                    'sync_hash': row['sync_hash'],
+                }
+            skus[row['sku_code']] = SKU(
+                sku_code=row['sku_code'],
+                spu_id=spu_ids[row['spu_code']],
+                img_url=image.get('img_url'),
+                sync_hash=sync_hash,
+                **row['sku_defaults']
+            )
+        SKU.objects.bulk_create(
+            skus.values(),
+            update_conflicts=True,
+            unique_fields=self._unique_fields('sku_code'),
+            update_fields=list(self.SKU_SYNC_FIELDS),
+        )
+        # 批量写入不经过模型 save，在同一事务中刷新本页 SPU / SKU 的搜索索引
+        changed_spu_ids = [spu_ids[code] for code in spus]
+        index_objects(SearchToken.Kind.SPU, changed_spu_ids)
+        index_skus(SKU.objects.filter(
+            Q(sku_code__in=list(skus)) | Q(spu_id__in=changed_spu_ids)
+        ).values_list('id', flat=True))
+        if image_tasks:
+            # 本页提交后再下载图片；所在事务回滚时不会提交下载任务
+            transaction.on_commit(lambda: self.images.submit(image_tasks.values()))
+        created = len(set(skus) - set(existing_images))
+        print(f"SPU 写入 {len(spus)} 个，SKU 新增 {created} 个，更新 {len(skus) - created} 个，待下载图片 {len(image_tasks)} 张")
+        return len(skus)
 
-    def clean_old_images(self, days=30):
-        """清理指定天数之前的旧图片"""
+    @staticmethod
+    def _unique_fields(field):
+        # MySQL 的 ON DUPLICATE KEY UPDATE 不能指定冲突字段，由唯一约束自动匹配
+        return [field] if connection.features.supports_update_conflicts_with_target else None
+
+    def _process_products(self, rows):
+        """写入一批产品数据
+
+        整批写入失败时逐条重试，定位并跳过有问题的产品。
+        """
         try:
-            cutoff_date = datetime.now() - timedelta(days=days)
-            storage = default_storage
-            directory = 'skus/'
-            
-            # 获取目录中的所有文件
-            _, files = storage.listdir(directory)
-            
-            for filename in files:
-                try:
-                    path = os.path.join(directory, filename)
-                    # 获取文件的修改时间
-                    modified_time = datetime.fromtimestamp(storage.get_modified_time(path).timestamp())
-                    
-                    # 如果文件超过指定天数且不是当前使用的图片，则删除
-                    if modified_time < cutoff_date:
-                        # 检查是否有SKU正在使用这个图片
-                        if not SKU.objects.filter(img_url=path).exists():
-                            storage.delete(path)
-                            print(f"删除旧图片: {path}")
-                            
-                except Exception as e:
-                    print(f"处理文件时出错 {filename}: {str(e)}")
-                    continue
-                    
-        except Exception as e:
-            print(f"清理旧图片时出错: {str(e)}") 
\ No newline at end of file
+            with transaction.atomic():
+                return self._bulk_write_products(rows)
+        except DatabaseError as e:
+            print(f"批量写入产品失败，改为逐条写入: {str(e)}")
+
+        synced_count = 0
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    synced_count += self._bulk_write_products([row])
+            except DatabaseError as e:
+                print(f"处理产品数据失败: {str(e)}, 产品: {row['sku_code']}")
+                print(f"错误详情: {type(e).__name__}")
+                continue
+        return synced_count
@@ -0,0 +1,10 @@
+from django import template
+from gallery.thumbnails import thumbnail_url
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(sku, size='list'):
+    """SKU 图片的缩略图地址，用法：{{ sku|thumbnail }} 或 {{ sku|thumbnail:'excel' }}"""
+    return thumbnail_url(sku.img_url, sku.img_hash, size)
@@ -1,3 +1,69 @@
-from django.test import TestCase
+import threading
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from .models import CodeSequence, SPU
+from .sequences import CodeAllocator, format_code, initial_value, next_sku_code, next_sku_codes
 
-# Create your tests here.
+
+@override_settings(CODE_SEQUENCE_BLOCK_SIZE=5)
+class CodeSequenceTests(TestCase):
+
+    def test_initial_value_after_existing_codes(self):
+        SPU.objects.create(spu_code='SPU000120', spu_name='旧商品', product_type='ready_made')
+        SPU.objects.create(spu_code='OLD-9999', spu_name='旧编码', product_type='ready_made')
+        self.assertEqual(initial_value('spu'), 121)
+
+    def test_codes_are_unique(self):
+        codes = [next_sku_code() for _ in range(12)] + next_sku_codes(8)
+        self.assertEqual(len(set(codes)), 20)
+        self.assertTrue(all(code.startswith('SKU') for code in codes))
+        self.assertEqual(format_code('sku', 7), 'SKU000007')
+
+
+@override_settings(CODE_SEQUENCE_BLOCK_SIZE=3)
+class ConcurrentCodeSequenceTests(TransactionTestCase):
+    """多个线程同时取号，模拟多个进程（各自的分配器）与同一进程内的多个线程（共用分配器）"""
+    threads = 8
+    rounds = 10
+
+    def run_threads(self, allocate):
+        results, errors = [], []
+        barrier = threading.Barrier(self.threads)
+
+        def work():
+            try:
+                barrier.wait()
+                codes = [allocate() for _ in range(self.rounds)]
+                results.extend(codes)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=work) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_shared_allocator(self):
+        codes = self.run_threads(next_sku_code)
+        self.assertEqual(len(codes), self.threads * self.rounds)
+        self.assertEqual(len(set(codes)), len(codes))
+
+    # SQLite 的内存测试库不支持多个连接同时写入，跨进程的情形只在 MySQL 等数据库上测试
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_separate_allocators(self):
+        local = threading.local()
+
+        def allocate():
+            if not hasattr(local, 'allocator'):
+                local.allocator = CodeAllocator('sku')
+            return local.allocator.allocate()[0]
+
+        codes = self.run_threads(allocate)
+        self.assertEqual(len(codes), self.threads * self.rounds)
+        self.assertEqual(len(set(codes)), len(codes))
+        self.assertEqual(CodeSequence.objects.filter(name='sku').count(), 1)
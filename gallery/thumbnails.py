@@ -0,0 +1,112 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, features
+from .media import blob_ref
+
+# 缩略图目录：thumbs/<规格>/<哈希前两位>/<哈希>.<扩展名>
+THUMB_DIR = 'thumbs'
+
+# 各规格的最大尺寸：list 用于列表页（头像 48px 的两倍，适配高分屏），excel 用于导出时嵌入表格
+THUMBNAIL_SIZES = {
+    'list': (96, 96),
+    'excel': (60, 60),
+}
+
+
+def thumbnail_format(size):
+    """缩略图格式：导出表格只支持 PNG/JPEG，列表页可选 WebP"""
+    if size == 'excel':
+        return 'PNG'
+    if getattr(settings, 'IMAGE_THUMBNAIL_WEBP', False) and features.check('webp'):
+        return 'WEBP'
+    return 'JPEG'
+
+
+def derivative_path(sha256, size):
+    ext = {'PNG': 'png', 'JPEG': 'jpg', 'WEBP': 'webp'}[thumbnail_format(size)]
+    return f"{THUMB_DIR}/{size}/{sha256[:2]}/{sha256}.{ext}"
+
+
+def derivative_paths(sha256):
+    """同一图片所有可能的缩略图路径（含切换 WebP 前后的格式），用于清理"""
+    return [
+        f"{THUMB_DIR}/{size}/{sha256[:2]}/{sha256}.{ext}"
+        for size in THUMBNAIL_SIZES
+        for ext in ('png', 'jpg', 'webp')
+    ]
+
+
+def thumbnail_path(img_url, img_hash, size='list'):
+    """返回已生成的缩略图路径；旧图片或尚未生成时返回 None"""
+    sha256 = blob_ref(img_url, img_hash)
+    if sha256 is None:
+        return None
+    path = derivative_path(sha256, size)
+    return path if default_storage.exists(path) else None
+
+
+def thumbnail_url(img_url, img_hash, size='list'):
+    """缩略图地址，缩略图不存在时退回原图地址"""
+    if not img_url:
+        return ''
+    return default_storage.url(thumbnail_path(img_url, img_hash, size) or img_url)
+
+
+def render_thumbnail(source, size):
+    """按规格生成缩略图，返回文件内容"""
+    with Image.open(source) as image:
+        image.thumbnail(THUMBNAIL_SIZES[size])
+        fmt = thumbnail_format(size)
+        if fmt == 'JPEG' and image.mode != 'RGB':
+            # JPEG 不支持透明通道，铺白底
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            rgba = image.convert('RGBA')
+            background.paste(rgba, mask=rgba.split()[-1])
+            image = background
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        output = BytesIO()
+        image.save(output, format=fmt, quality=85)
+        return output.getvalue()
+
+
+def build_thumbnails(sha256, path):
+    """为一张内容寻址图片生成全部规格的缩略图，已存在的跳过，返回生成数量"""
+    built = 0
+    for size in THUMBNAIL_SIZES:
+        target = derivative_path(sha256, size)
+        if default_storage.exists(target):
+            continue
+        with default_storage.open(path, 'rb') as source:
+            content = render_thumbnail(source, size)
+        if default_storage.exists(target):
+            continue
+        default_storage.save(target, ContentFile(content))
+        built += 1
+    return built
+
+
+def build_all(blobs, workers=None):
+    """在线程池中为 [(sha256, 路径), ...] 生成缩略图，返回 (生成数量, 失败数量)"""
+    workers = workers or getattr(settings, 'ERP_IMAGE_WORKERS', 8)
+    built = failed = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail') as executor:
+        futures = [executor.submit(build_thumbnails, sha256, path) for sha256, path in blobs]
+        for future in futures:
+            try:
+                built += future.result()
+            except Exception as e:
+                print(f"生成缩略图失败: {str(e)}")
+                failed += 1
+    return built, failed
+
+
+def delete_thumbnails(sha256):
+    for path in derivative_paths(sha256):
+        full_path = default_storage.path(path)
+        if os.path.exists(full_path):
+            os.remove(full_path)
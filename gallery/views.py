@@ -2,13 +2,20 @@ from django.shortcuts import render, redirect
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
-from .models import Category, SPU, SKU
+from .models import Category, SPU, SKU, SearchToken
+from .search import ranked, search_candidates, search_ids
+from django.db.models import Q
 from django.contrib.auth.models import User
 from django.contrib import messages
-from .sync import ProductSync
-from django.db.models import Q, Count
+from erp.models import SyncJob
 from django.http import HttpResponseRedirect
 from .forms import SKUForm
+from .exports import sku_queryset
+from .facets import SKU_FACETS
+from .categories import category_tree
+from .sequences import next_sku_code, next_spu_code
+from erp.exports import EXPORT_FORMATS
+from erp.paginators import CursorPaginationMixin
 
 # Create your views here.
 
@@ -103,11 +110,10 @@ class SPUListView(LoginRequiredMixin, ListView):
         queryset = super().get_queryset()
         search_query = self.request.GET.get('search')
         if search_query:
-            queryset = queryset.filter(
-                spu_name__icontains=search_query
-            ) | queryset.filter(
-                spu_code__icontains=search_query
-            )
+            candidates = search_candidates(SearchToken.Kind.SPU, search_query)
+            if candidates is not None:
+                queryset = ranked(queryset.filter(pk__in=candidates), search_ids(SearchToken.Kind.SPU, search_query, candidates=candidates))
+            queryset = queryset.filter(Q(spu_name__icontains=search_query) | Q(spu_code__icontains=search_query))
         return queryset
         
     def get_context_data(self, **kwargs):
@@ -173,7 +179,7 @@ class SPUDeleteView(LoginRequiredMixin, DeleteView):
         messages.success(request, 'SPU删除成功！')
         return super().delete(request, *args, **kwargs)
 
-class SKUListView(LoginRequiredMixin, ListView):
+class SKUListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = SKU
     template_name = 'gallery/sku_list.html'
     context_object_name = 'skus'
@@ -181,41 +187,7 @@ class SKUListView(LoginRequiredMixin, ListView):
     login_url = '/muggle/login/'
     
     def get_queryset(self):
-        queryset = super().get_queryset()
-        
-        # 获取筛选参数
-        search_query = self.request.GET.get('search')
-        category_id = self.request.GET.get('category')
-        color = self.request.GET.get('color')
-        material = self.request.GET.get('material')
-        plating = self.request.GET.get('plating')
-        product_type = self.request.GET.get('product_type')  # 添加产品类型筛选
-        
-        # 应用筛选条件
-        if search_query:
-            queryset = queryset.filter(
-                Q(sku_name__icontains=search_query) |
-                Q(sku_code__icontains=search_query) |
-                Q(spu__spu_code__icontains=search_query) |
-                Q(spu__spu_name__icontains=search_query)
-            )
-        
-        if category_id and category_id.isdigit():
-            queryset = queryset.filter(spu__category_id=int(category_id))
-            
-        if color:
-            queryset = queryset.filter(color=color)
-            
-        if material:
-            queryset = queryset.filter(material=material)
-            
-        if plating:
-            queryset = queryset.filter(plating_process=plating)
-            
-        if product_type:  # 添加产品类型筛选条件
-            queryset = queryset.filter(spu__product_type=product_type)
-        
-        return queryset.select_related('spu', 'spu__category')
+        return sku_queryset(self.request.GET, rank=True).select_related('spu')
         
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -224,53 +196,31 @@ class SKUListView(LoginRequiredMixin, ListView):
         context['active_menu'] = 'gallery'  # 修改为 gallery
         context['active_submenu'] = 'sku'  # 添加 active_submenu
         
-        # 获取有 SKU 关联的类目
-        context['categories'] = Category.objects.filter(
-            spus__skus__isnull=False
-        ).annotate(
-            sku_count=Count('spus__skus')  # 统计每个类目下的 SKU 数量
-        ).order_by('category_name_en').distinct()
-        
         # 安全地获取 category_id
         category_id = self.request.GET.get('category', '')
         context['category_id'] = int(category_id) if category_id.isdigit() else 0
-        
-        # 获取所有可选的颜色、材质和电镀工艺，并按值排序
-        context['colors'] = SKU.objects.exclude(
-            Q(color__isnull=True) | Q(color='')
-        ).values('color').annotate(
-            count=Count('id')
-        ).order_by('color').values_list('color', flat=True)
-        
-        context['materials'] = SKU.objects.exclude(
-            Q(material__isnull=True) | Q(material='')
-        ).values('material').annotate(
-            count=Count('id')
-        ).order_by('material').values_list('material', flat=True)
-        
-        context['platings'] = SKU.objects.exclude(
-            Q(plating_process__isnull=True) | Q(plating_process='')
-        ).values('plating_process').annotate(
-            count=Count('id')
-        ).order_by('plating_process').values_list('plating_process', flat=True)
-        
+
+        # 颜色、材质、电镀工艺和产品类型的可选值及数量（按当前筛选条件统计，带缓存）
+        facets = SKU_FACETS.counts(self.request.GET)
+
+        # 类目按树形顺序列出，数量包含下级类目
+        tree = category_tree()
+        totals = tree.rollup({item['value']: item['count'] for item in facets['category']})
+        context['categories'] = [
+            {'id': node.id, 'label': node.full_name, 'count': totals[node.id]}
+            for node in tree.options() if totals[node.id] or node.id == context['category_id']
+        ]
+        context['colors'] = facets['color']
+        context['materials'] = facets['material']
+        context['platings'] = facets['plating']
+        context['product_types'] = facets['product_type']
+
         # 当前选中的筛选值
         context['selected_color'] = self.request.GET.get('color', '')
         context['selected_material'] = self.request.GET.get('material', '')
         context['selected_plating'] = self.request.GET.get('plating', '')
-        
-        # 获取所有产品类型选项，包含显示名称
-        product_types = []
-        for pt in SPU.PRODUCT_TYPE_CHOICES:
-            count = SPU.objects.filter(product_type=pt[0]).count()
-            if count > 0:  # 只显示有数据的类型
-                product_types.append({
-                    'value': pt[0],
-                    'label': pt[1],
-                    'count': count
-                })
-        context['product_types'] = product_types
-        
+        context['export_formats'] = EXPORT_FORMATS
+
         # 当前选中的产品类型
         context['selected_product_type'] = self.request.GET.get('product_type', '')
         
@@ -302,32 +252,17 @@ class SKUCreateView(LoginRequiredMixin, CreateView):
         # 获取所有专员
         context['pocs'] = User.objects.filter(is_active=True).order_by('username')
         
-        # 获取最新的SKU ID并生成新的SKU编码
-        try:
-            latest_sku = SKU.objects.latest('id')
-            next_id = latest_sku.id + 1
-        except SKU.DoesNotExist:
-            next_id = 1
-        
-        context['generated_sku_code'] = f'SKU{next_id:06d}'  # 生成6位数的编码
+        # 从编码序列分配新的SKU编码；表单校验失败重新显示时沿用已提交的编码
+        context['generated_sku_code'] = self.request.POST.get('sku_code') or next_sku_code()
         return context
 
     def form_valid(self, form):
         try:
             # 检查是否是新建SPU
             if self.request.POST.get('spu_selection') == 'create':
-                # 获取最新的SPU ID并生成新的SPU编码
-                try:
-                    latest_spu = SPU.objects.latest('id')
-                    next_spu_id = latest_spu.id + 1
-                except SPU.DoesNotExist:
-                    next_spu_id = 1
-                
-                spu_code = f'SPU{next_spu_id:06d}'
-                
-                # 创建新的SPU
+                # 创建新的SPU，编码从编码序列分配
                 spu = SPU.objects.create(
-                    spu_code=spu_code,
+                    spu_code=next_spu_code(),
                     spu_name=form.cleaned_data.get('sku_name'),  # 使用SKU名称作为SPU名称
                     product_type=self.request.POST.get('product_type'),
                     sales_channel=self.request.POST.get('sales_channel'),
@@ -419,11 +354,9 @@ class SKUDeleteView(LoginRequiredMixin, DeleteView):
 
 class SKUSyncView(LoginRequiredMixin, View):
     def post(self, request):
-        try:
-            sync = ProductSync()
-            count = sync.sync_products()
-            sync.clean_old_images()  # 清理旧图片
-            messages.success(request, f'成功同步 {count} 条数据！')
-        except Exception as e:
-            messages.error(request, f'同步失败：{str(e)}')
+        job, created = SyncJob.enqueue(SyncJob.Kind.PRODUCTS, user=request.user)
+        if created:
+            messages.success(request, f'已提交产品同步任务 #{job.pk}，将在后台执行')
+        else:
+            messages.info(request, f'产品同步任务 #{job.pk} {job.get_status_display()}，请勿重复提交')
         return redirect('gallery:sku_list')
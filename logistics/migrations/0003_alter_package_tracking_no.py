@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0002_alter_package_order'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='package',
+            name='tracking_no',
+            field=models.CharField(blank=True, db_index=True, max_length=30, null=True, verbose_name='跟踪号'),
+        ),
+    ]
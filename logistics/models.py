@@ -59,7 +59,8 @@ class Package(models.Model):
         '跟踪号',
         max_length=30,
         blank=True,
-        null=True
+        null=True,
+        db_index=True
     )
     pkg_status_code = models.CharField(
         '包裹状态码',
@@ -93,6 +94,20 @@ class Package(models.Model):
     def __str__(self):
         return f"包裹 {self.id} - {self.tracking_no or '未获取跟踪号'}"
 
+    def save(self, *args, **kwargs):
+        from trade.lookup import index_package_orders
+        super().save(*args, **kwargs)
+        index_package_orders(self)
+
+    def delete(self, *args, **kwargs):
+        from trade.lookup import reindex_orders
+        # 删除后 Order.package 被置空，需要先记下关联的订单
+        order_ids = set(Order.objects.filter(package_id=self.pk).values_list('id', flat=True))
+        order_ids.add(self.order_id)
+        result = super().delete(*args, **kwargs)
+        reindex_orders(order_ids)
+        return result
+
     @property
     def carrier_name(self):
         """获取物流商名称"""
@@ -43,7 +43,8 @@ INSTALLED_APPS = [
     'gallery',
     'storage',
     'trade',
-    'logistics'
+    'logistics',
+    'erp',
     # 'storage.apps.StorageConfig',
 ]
 
@@ -142,6 +143,26 @@ MEDIA_URL = '/media/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# ERP接口同步配置
+ERP_QPS = 5  # 令牌桶限流：每秒最多请求次数
+ERP_FETCH_WORKERS = 4  # 分页预取并发数
+ERP_TRADE_DETAIL_CHUNK = 50  # 每次请求订单明细的订单数
+ERP_SYNC_OVERLAP_MINUTES = 10  # 增量同步时向前重叠的时间，避免边界数据遗漏
+ERP_SYNC_STALE_MINUTES = 30  # 运行中的同步或后台任务超过这么久没有进展/心跳，视为进程已退出
+ERP_JOB_HEARTBEAT_SECONDS = 60  # 后台任务执行期间更新心跳的间隔
+ERP_TRADE_RESCAN_DAYS = 14  # 订单接口只能按创建时间筛选，每次同步重新扫描最近这么多天创建的订单以发现状态变化
+ERP_IMAGE_WORKERS = 8  # SKU图片并发下载数
+IMAGE_THUMBNAIL_WEBP = False  # 列表页缩略图使用 WebP 格式
+STOCK_EXPORT_SYNC_MAX_ROWS = 5000  # 库存导出超过该行数时改为后台任务生成
+EXPORT_SYNC_MAX_ROWS = 50000  # 订单、SKU 等数据导出超过该行数时改为后台任务生成
+FACET_CACHE_TIMEOUT = 300  # SKU/库存列表筛选项缓存时间（秒），数据同步和 SKU/SPU 修改时立即失效
+SEARCH_MAX_RESULTS = 500  # SKU/SPU 列表按相关度排序的结果数，其余匹配结果排在其后
+SEARCH_PROBE_LIMIT = 5000  # 搜索候选数上限：最少的词元也超过该对象数时不使用索引，只按原条件查询
+ORDER_LOOKUP_LIMIT = 20  # 订单快速查找接口最多返回的订单数
+LIST_EXACT_COUNT_MAX = 10000  # 列表总数超过该值时显示估计值，点击后才精确统计
+LIST_COUNT_CACHE_TIMEOUT = 60  # 列表总数按筛选条件缓存的时间（秒）
+CODE_SEQUENCE_BLOCK_SIZE = 20  # 每个进程每次预留的 SKU/SPU 编码序号数
+
 # 确保日志目录存在
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
 if not os.path.exists(LOG_DIR):
@@ -169,6 +190,12 @@ LOGGING = {
             'filename': os.path.join(LOG_DIR, 'trade.log'),  # trade应用的日志文件
             'formatter': 'verbose',
         },
+        'erp_file': {
+            'level': 'INFO',
+            'class': 'logging.FileHandler',
+            'filename': os.path.join(LOG_DIR, 'erp.log'),  # ERP接口调用日志
+            'formatter': 'verbose',
+        },
         'console': {
             'level': 'INFO',
             'class': 'logging.StreamHandler',
@@ -186,5 +213,10 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'erp': {
+            'handlers': ['erp_file', 'console'],
+            'level': 'INFO',
+            'propagate': True,
+        },
     },
 }
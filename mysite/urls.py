@@ -26,4 +26,5 @@ urlpatterns = [
     path('gallery/', include('gallery.urls')),
     path('storage/', include('storage.urls')),
     path('trade/', include('trade.urls')),
+    path('erp/', include('erp.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,159 @@
+import os
+import logging
+import tempfile
+from django.conf import settings
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.drawing.image import Image
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.dimensions import SheetFormatProperties
+from PIL import Image as PILImage
+from erp.exports import Column, Dataset, choice_display, keyset_chunks
+from gallery.models import SPU
+from gallery.thumbnails import thumbnail_path
+from .models import Stock
+
+logger = logging.getLogger(__name__)
+
+# 导出列：(表头, 列宽)
+STOCK_COLUMNS = [
+    ('图片', 15),
+    ('SKU编码', 20),
+    ('SKU名称', 40),
+    ('产品类型', 15),
+    ('所属仓库', 15),
+    ('库存数量', 12),
+    ('平均成本', 12),
+    ('更新时间', 20),
+]
+
+
+STOCK_FILTERS = ('search', 'warehouse', 'product_type')
+
+
+def export_params(query):
+    """从请求参数中取出库存筛选条件，去掉空值"""
+    return {key: query.get(key) for key in STOCK_FILTERS if query.get(key)}
+
+
+def stock_queryset(params):
+    """按库存列表页的筛选参数（search、warehouse、product_type）过滤库存"""
+    queryset = Stock.objects.all()
+    if params.get('search'):
+        queryset = queryset.filter(sku__sku_code__icontains=params['search'])
+    if params.get('warehouse'):
+        queryset = queryset.filter(warehouse_id=params['warehouse'])
+    if params.get('product_type'):
+        queryset = queryset.filter(sku__spu__product_type=params['product_type'])
+    return queryset.select_related('warehouse', 'sku', 'sku__spu')
+
+
+# 不含图片的库存明细，供 CSV/Parquet 等通用导出使用
+STOCK = Dataset(
+    'stock', '库存', Stock,
+    columns=[
+        Column('SKU编码', 'sku__sku_code', width=20),
+        Column('SKU名称', 'sku__sku_name', width=40),
+        Column('产品类型', 'sku__spu__product_type', choice_display(SPU.PRODUCT_TYPE_CHOICES)),
+        Column('所属仓库', 'warehouse__name'),
+        Column('库存数量', 'stock_num', width=12),
+        Column('平均成本', 'avg_cost', width=12),
+        Column('更新时间', 'updated_at', width=20),
+    ],
+    filter=stock_queryset,
+    filters=STOCK_FILTERS,
+    list_url='storage:stock_list',
+)
+
+
+def _styles():
+    center = Alignment(horizontal='center', vertical='center')
+    header = NamedStyle(
+        name='stock_header',
+        font=Font(bold=True),
+        fill=PatternFill(start_color='F0F0F0', end_color='F0F0F0', fill_type='solid'),
+        alignment=center,
+    )
+    cell = NamedStyle(name='stock_cell', alignment=center)
+    return header, cell
+
+
+def write_stock_workbook(queryset, output, chunk_size=2000):
+    """以只写模式把库存写入 Excel，返回写入行数
+
+    数据按主键分段读取（每段 chunk_size 行，见 erp.exports.keyset_chunks），行直接写入临时文件，单元格共用命名样式，
+    图片嵌入预生成的缩略图，内存占用与行数无关。output 为文件路径或文件对象。
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("库存列表")
+    header_style, cell_style = _styles()
+    wb.add_named_style(header_style)
+    wb.add_named_style(cell_style)
+
+    for col, (_, width) in enumerate(STOCK_COLUMNS, 1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+    # 数据行统一为图片高度，只有表头单独设置行高
+    ws.sheet_format = SheetFormatProperties(defaultRowHeight=60, customHeight=True)
+    ws.row_dimensions[1].height = 20
+
+    def cells(values, style):
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style
+            row.append(cell)
+        return row
+
+    ws.append(cells([title for title, _ in STOCK_COLUMNS], header_style.name))
+
+    # 旧图片没有预生成的缩略图，缩放后暂存到临时目录，保存工作簿时再读取
+    with tempfile.TemporaryDirectory() as legacy_dir:
+        chunks = keyset_chunks(queryset.only(
+            'stock_num', 'avg_cost', 'updated_at', 'warehouse__name',
+            'sku__sku_code', 'sku__sku_name', 'sku__img_url', 'sku__img_hash', 'sku__spu__product_type',
+        ), chunk_size)
+        stocks = (stock for chunk in chunks for stock in chunk)
+        count = 0
+        for row_idx, stock in enumerate(stocks, 2):
+            image_path = _excel_image(stock.sku, legacy_dir)
+            if image_path:
+                img = Image(image_path)
+                img.width = 60
+                img.height = 60
+                ws.add_image(img, f'A{row_idx}')
+
+            ws.append(cells([
+                None,
+                stock.sku.sku_code,
+                stock.sku.sku_name,
+                stock.sku.spu.get_product_type_display() if stock.sku.spu else '',
+                stock.warehouse.name,
+                stock.stock_num,
+                float(stock.avg_cost),
+                stock.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
+            ], cell_style.name))
+            count += 1
+
+        wb.save(output)
+    return count
+
+
+def _excel_image(sku, legacy_dir):
+    if not sku.img_url:
+        return None
+    thumb = thumbnail_path(sku.img_url, sku.img_hash, 'excel')
+    if thumb:
+        return os.path.join(settings.MEDIA_ROOT, thumb)
+    source = os.path.join(settings.MEDIA_ROOT, str(sku.img_url))
+    if not os.path.exists(source):
+        return None
+    target = os.path.join(legacy_dir, f'{sku.pk}.png')
+    try:
+        with PILImage.open(source) as pil_image:
+            pil_image.thumbnail((60, 60))
+            pil_image.save(target, format='PNG')
+    except Exception as e:
+        logger.error(f"处理图片失败: {str(e)}")
+        return None
+    return target
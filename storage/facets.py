@@ -0,0 +1,7 @@
+from gallery.facets import Facet, FacetEngine
+from gallery.models import SPU
+from .exports import STOCK_FILTERS, stock_queryset
+
+STOCK_FACETS = FacetEngine('stock', stock_queryset, [
+    Facet('product_type', 'sku__spu__product_type', SPU.PRODUCT_TYPE_CHOICES),
+], STOCK_FILTERS)
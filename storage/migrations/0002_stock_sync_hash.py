@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='sync_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True, verbose_name='同步指纹'),
+        ),
+    ]
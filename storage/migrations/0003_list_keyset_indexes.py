@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0002_stock_sync_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['updated_at', 'id'], name='storage_stock_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['warehouse', 'updated_at', 'id'], name='storage_stock_wh_updated_idx'),
+        ),
+    ]
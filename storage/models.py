@@ -146,6 +146,14 @@ class Stock(models.Model):
         verbose_name='关联SKU'
     )
     
+    sync_hash = models.CharField(
+        max_length=40,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='同步指纹'
+    )
+    
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='创建时间'
@@ -166,6 +174,9 @@ class Stock(models.Model):
         indexes = [
             models.Index(fields=['sku']),
             models.Index(fields=['warehouse']),
+            # 库存列表按 (updated_at, id) 键集分页
+            models.Index(fields=['updated_at', 'id'], name='storage_stock_updated_idx'),
+            models.Index(fields=['warehouse', 'updated_at', 'id'], name='storage_stock_wh_updated_idx'),
         ]
 
     def __str__(self):
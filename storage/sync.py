@@ -1,156 +1,168 @@
-import json
-import requests
 import math
-import time
-import hashlib
 import logging
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.db import connection
+from gallery.models import SKU
+from gallery.facets import invalidate_facets
+from erp.client import get_client
+from erp.fingerprint import fingerprint, ChangeFilter
+from erp.pagination import PageFetcher
+from erp.pipeline import Pipeline
+from erp.models import SyncRun, TIME_FORMAT
+from .models import Stock, Warehouse
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
-def generate_sign(body):
-    """生成API签名"""
-    try:
-        app_name = "mathmagic"
-        app_key = "82be0592545283da00744b489f758f99"
-        sid = "mathmagic"
-        
-        headers = {
-            'Content-Type': 'application/json'
-        }
-        
-        timestamp = str(int(time.time()))
-        sign_str = f"{app_key}appName{app_name}body{body}sid{sid}timestamp{timestamp}{app_key}"
-        sign = hashlib.md5(sign_str.encode()).hexdigest()
-        
-        params = {
-            "appName": app_name,
-            "sid": sid,
-            "sign": sign,
-            "timestamp": timestamp,
-        }
-        logger.info(f"生成签名成功: params={params}")
-        return params, headers
-    except Exception as e:
-        logger.error(f"生成签名失败: {str(e)}")
-        raise
+STOCK_ENDPOINT = 'stockSpec/v1/getStockSpecList'
+STOCK_WAREHOUSE_NO = "6"
+STOCK_STREAM = f'stock:{STOCK_WAREHOUSE_NO}'
+
+def stock_body(page, page_size=100):
+    """库存接口请求体"""
+    return {
+        "page_size": page_size,
+        "page_no": page,
+        "warehouseNo": STOCK_WAREHOUSE_NO,
+        "warehouseType": 1,
+        "employeeId": 1
+    }
+
+def to_stock_data(result):
+    """将接口返回的分页数据整理为 update_stock_data 使用的格式"""
+    return {
+        'items': result['data'],
+        'total': result['total'],
+        'current_page': result['currentPage'],
+        'max_page': math.ceil(result['total'] / result['pageSize'])
+    }
 
 def sync_stock_data(page=1):
     """同步库存数据"""
     try:
         logger.info(f"开始同步第 {page} 页数据")
-        body = {
-            "page_size": 100,
-            "page_no": page,
-            "warehouseNo": "6",
-            "warehouseType": 1,
-            "employeeId": 1
-        }
-        
-        body_str = json.dumps(body, ensure_ascii=False, separators=(",", ":"))
-        params, headers = generate_sign(body_str)
-        url = "https://openapi.qizhishangke.com/api/openservices/stockSpec/v1/getStockSpecList"
-        
-        # 添加重试机制
-        for attempt in range(3):
-            try:
-                logger.info(f"尝试第 {attempt + 1} 次请求API")
-                response = requests.post(url, params=params, headers=headers, data=body_str)
-                break
-            except Exception as e:
-                logger.error(f"API请求失败 (尝试 {attempt + 1}): {str(e)}")
-                if attempt < 2:
-                    time.sleep(15)
-                    continue
-                raise
-        
-        data = response.json()
-        if data['code'] != 200:
-            logger.error(f"API返回错误: {data}")
-            raise Exception(f"API返回错误: {data['message']}")
-        
-        result = data['data']
+        result = get_client().post(STOCK_ENDPOINT, stock_body(page))
         logger.info(f"成功获取数据: 总数={result['total']}, 当前页={result['currentPage']}")
-        
-        return {
-            'items': result['data'],
-            'total': result['total'],
-            'current_page': result['currentPage'],
-            'max_page': math.ceil(result['total'] / result['pageSize'])
-        }
+        return to_stock_data(result)
     except Exception as e:
         logger.error(f"同步数据失败: {str(e)}")
         raise
 
-def update_stock_data(stock_data):
-    """更新库存数据到数据库"""
-    try:
-        # logger.info(f"开始更新库存数据: {len(stock_data['items'])} 条记录")
-        from .models import Stock, Warehouse
-        from gallery.models import SKU
-        
-        updated_count = 0
-        skipped_count = 0
-        for item in stock_data['items']:
+class StockWriter:
+    """库存批量写入
+
+    一次同步运行共用一个实例：仓库按名称缓存，每页的 specNo 用一次查询
+    解析为 SKU ID，库存行通过 bulk_create 的冲突更新（warehouse + sku
+    唯一约束）一次写入，并统计跳过与无效的记录。
+    transform() 在转换阶段丢弃数量和成本与上次同步相同的库存，write() 只写入有变化的行。
+    """
+
+    def __init__(self, force=False):
+        self.warehouses = {}
+        self.changes = ChangeFilter('stock_sync', force=force)
+        self.updated = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.missing_skus = []
+
+    def warehouse_id(self, name):
+        if not self.warehouses:
+            self.warehouses = dict(Warehouse.objects.values_list('name', 'id'))
+        if name not in self.warehouses:
+            warehouse, _ = Warehouse.objects.get_or_create(name=name)
+            self.warehouses[name] = warehouse.id
+        return self.warehouses[name]
+
+    def transform(self, items):
+        """将一页接口数据转换为库存对象，丢弃内容指纹未变化的库存"""
+        codes = {item.get('specNo') for item in items if item.get('specNo')}
+        sku_ids = dict(SKU.objects.filter(sku_code__in=codes).values_list('sku_code', 'id'))
+
+        stocks = {}
+        for item in items:
+            sku_id = sku_ids.get(item.get('specNo'))
+            if sku_id is None:
+                self.skipped += 1
+                if len(self.missing_skus) < 20 and item.get('specNo') not in self.missing_skus:
+                    self.missing_skus.append(item.get('specNo'))
+                continue
             try:
-                # 尝试获取SKU，不存在则跳过
-                try:
-                    sku = SKU.objects.get(sku_code=item['specNo'])
-                except SKU.DoesNotExist:
-                    # logger.warning(f"SKU不存在，跳过更新: {item['specNo']}")
-                    skipped_count += 1
-                    continue
-                
-                # 获取或创建仓库
-                warehouse, wh_created = Warehouse.objects.get_or_create(
-                    name=item['warehouseName']
-                )
-                
-                # 更新库存信息
-                stock, stock_created = Stock.objects.update_or_create(
-                    sku=sku,
-                    warehouse=warehouse,
-                    defaults={
-                        'stock_num': item['stockNum'],
-                        'avg_cost': item['avgCost']
-                    }
+                stock = Stock(
+                    sku_id=sku_id,
+                    warehouse_id=self.warehouse_id(item['warehouseName']),
+                    # 接口可能返回 "12.0" 这样的小数字符串，先按 Decimal 解析再取整
+                    stock_num=int(Decimal(str(item['stockNum']))),
+                    avg_cost=Decimal(str(item['avgCost'] or 0)),
                 )
-                updated_count += 1
-                
-            except Exception as e:
-                # logger.error(f"更新单条记录失败: SKU={item['specNo']}, 错误={str(e)}")
+            except (KeyError, TypeError, ValueError, OverflowError, InvalidOperation) as e:
+                logger.warning(f"库存数据无效，跳过: SKU={item.get('specNo')}, 错误={str(e)}")
+                self.invalid += 1
                 continue
-        
-        # logger.info(f"成功更新 {updated_count} 条记录，跳过 {skipped_count} 条记录")
-        
-    except Exception as e:
-        # logger.error(f"更新库存数据失败: {str(e)}")
-        raise
+            stock.sync_hash = fingerprint({'stock_num': stock.stock_num, 'avg_cost': stock.avg_cost.quantize(Decimal('0.01'))})
+            # 同一页中重复的 (仓库, SKU) 以最后一条为准
+            stocks[(stock.warehouse_id, stock.sku_id)] = stock
+
+        stored = {
+            (warehouse_id, sku_id): sync_hash
+            for warehouse_id, sku_id, sync_hash in Stock.objects.filter(
+                sku_id__in={sku_id for _, sku_id in stocks}
+            ).values_list('warehouse_id', 'sku_id', 'sync_hash')
+        }
+        rows = [{'key': key, 'sync_hash': stock.sync_hash, 'stock': stock} for key, stock in stocks.items()]
+        return [row['stock'] for row in self.changes.changed_rows(rows, stored)]
+
+    def write(self, stocks):
+        """写入一页库存对象，返回写入条数"""
+        if stocks:
+            # MySQL 的 ON DUPLICATE KEY UPDATE 不能指定冲突字段，由唯一约束自动匹配
+            unique_fields = ['warehouse', 'sku'] if connection.features.supports_update_conflicts_with_target else None
+            Stock.objects.bulk_create(
+                stocks,
+                update_conflicts=True,
+                unique_fields=unique_fields,
+                update_fields=['stock_num', 'avg_cost', 'sync_hash', 'updated_at'],
+            )
+        self.updated += len(stocks)
+        return len(stocks)
+
+    def log_summary(self):
+        logger.info(f"成功更新 {self.updated} 条记录，跳过 {self.skipped} 条（SKU不存在），无效 {self.invalid} 条")
+        self.changes.log_summary()
+        if self.missing_skus:
+            logger.info(f"不存在的SKU示例: {', '.join(self.missing_skus)}")
 
-def sync_all_stock():
-    """同步所有库存数据"""
+def update_stock_data(stock_data, writer=None):
+    """更新库存数据到数据库"""
+    writer = writer or StockWriter()
+    return writer.write(writer.transform(stock_data['items']))
+
+def sync_all_stock(full=False):
+    """同步所有库存数据
+
+    库存接口没有按变动时间筛选的参数，每次拉取仓库的全部库存，
+    数量和成本未变化的库存不再写入；full=True 时全部重新写入。
+    每完成一页记录一次检查点；中断后再次同步时继续该运行，从第 1 页重新抓取，已写入的库存由指纹跳过。
+    """
+    params = {'start_time': None, 'end_time': datetime.now().strftime(TIME_FORMAT)}
+    run = SyncRun.begin(STOCK_STREAM, params, resume=not full)
     try:
-        page = 1
-        total_updated = 0
-        
-        while True:
-            # 获取当前页数据
-            stock_data = sync_stock_data(page)
-            
-            # 更新到数据库
-            update_stock_data(stock_data)
-            total_updated += len(stock_data['items'])
-            
-            # 检查是否还有下一页
-            if page >= stock_data['max_page']:
-                break
-            
-            # 继续下一页
-            page += 1
-            time.sleep(10)  # 避免请求过快
+        # 第一页确定总页数，其余页面并发预取；抓取与写库流水线执行
+        fetcher = PageFetcher(STOCK_ENDPOINT, stock_body)
+        writer = StockWriter(force=full)
+        if run.attempts > 1:
+            logger.info(f"继续同步运行 #{run.pk}（第 {run.attempts} 次尝试）")
+        pipeline = Pipeline('stock_sync', fetcher.records(), writer.transform, writer.write, checkpoint=run.checkpoint)
+        total_updated = pipeline.run()
         
+        writer.log_summary()
+        run.finish(unchanged=writer.changes.unchanged)
         logger.info(f"同步完成，共更新 {total_updated} 条记录")
+        get_client().log_stats()
         
     except Exception as e:
         logger.error(f"同步过程中断: {str(e)}")
-        raise
\ No newline at end of file
+        run.fail(e)
+        raise
+    finally:
+        invalidate_facets()
@@ -0,0 +1,97 @@
+import datetime
+from django.db.models import Q
+from erp.exports import Column, Dataset, choice_display
+from .models import Order, Cart
+from .lookup import lookup_order_ids
+
+ORDER_FILTERS = ('search', 'shop', 'status', 'start', 'end')
+
+
+def _parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def order_filter(params, prefix=''):
+    """把订单列表页的筛选参数转换为查询条件
+
+    支持 search（经查找索引按前缀匹配）、shop、status，
+    以及按下单日期筛选的 start、end（YYYY-MM-DD，含当天）。
+    prefix 用于从关联模型筛选订单，例如 'order__'。
+    """
+    condition = Q()
+    search = params.get('search')
+    if search:
+        # 按订单号、平台订单号、物流单号、收件人或电话的前缀查找
+        condition &= Q(**{f'{prefix}id__in': lookup_order_ids(search)})
+    if params.get('shop'):
+        condition &= Q(**{f'{prefix}shop_id': params['shop']})
+    if params.get('status'):
+        condition &= Q(**{f'{prefix}status': params['status']})
+    start = _parse_date(params.get('start'))
+    if start:
+        condition &= Q(**{f'{prefix}created_at__gte': start})
+    end = _parse_date(params.get('end'))
+    if end:
+        condition &= Q(**{f'{prefix}created_at__lt': end + datetime.timedelta(days=1)})
+    return condition
+
+
+def order_queryset(params):
+    return Order.objects.filter(order_filter(params))
+
+
+def cart_queryset(params):
+    return Cart.objects.filter(order_filter(params, 'order__'))
+
+
+ORDERS = Dataset(
+    'orders', '订单', Order,
+    columns=[
+        Column('订单号', 'order_no', width=22),
+        Column('平台订单号', 'platform_order_no', width=22),
+        Column('店铺', 'shop__name'),
+        Column('状态', 'status', choice_display(Order.OrderStatus.choices), width=10),
+        Column('下单时间', 'created_at', width=20),
+        Column('实付金额', 'paid_amount', width=12),
+        Column('运费', 'freight', width=10),
+        Column('SKU种类数', 'sku_count', width=10),
+        Column('SKU总数量', 'total_qty', width=10),
+        Column('收件人', 'recipient_name', width=20),
+        Column('国家', 'recipient_country', width=10),
+        Column('州/省', 'recipient_state', width=10),
+        Column('城市', 'recipient_city'),
+        Column('地址', 'recipient_address', width=40),
+        Column('电话', 'recipient_phone'),
+        Column('邮箱', 'recipient_email', width=25),
+        Column('物流单号', 'package__tracking_no', width=22),
+        Column('买家备注', 'buyer_remark', width=30),
+        Column('客服备注', 'cs_remark', width=30),
+    ],
+    filter=order_queryset,
+    filters=ORDER_FILTERS,
+    list_url='trade:order_list',
+)
+
+CARTS = Dataset(
+    'carts', '订单明细', Cart,
+    columns=[
+        Column('订单号', 'order__order_no', width=22),
+        Column('下单时间', 'order__created_at', width=20),
+        Column('店铺', 'order__shop__name'),
+        Column('订单状态', 'order__status', choice_display(Order.OrderStatus.choices), width=10),
+        Column('SKU编码', 'sku__sku_code', width=20),
+        Column('SKU名称', 'sku__sku_name', width=40),
+        Column('数量', 'qty', width=8),
+        Column('售价', 'price', width=10),
+        Column('成本', 'cost', width=10),
+        Column('折扣', 'discount', width=10),
+        Column('实际售价', 'actual_price', width=10),
+        Column('缺货', 'is_out_of_stock', width=8),
+    ],
+    filter=cart_queryset,
+    filters=ORDER_FILTERS,
+    list_url='trade:order_list',
+)
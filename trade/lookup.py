@@ -0,0 +1,160 @@
+import re
+import threading
+import unicodedata
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from logistics.models import Package
+from .models import Order, OrderLookup
+
+# 这些订单字段变化时需要更新查找索引
+LOOKUP_SOURCE_FIELDS = {'order_no', 'platform_order_no', 'recipient_name', 'recipient_phone', 'package'}
+
+# 电话号码至少这么多位数字才按电话查找，避免短数字匹配过多
+MIN_PHONE_DIGITS = 4
+
+MAX_VALUE_LENGTH = OrderLookup._meta.get_field('value').max_length
+
+# deferred_indexing 代码块内待重建索引的订单ID，按线程记录
+_deferred = threading.local()
+
+
+def normalize(value):
+    """统一全角/半角和大小写，去掉空白"""
+    value = unicodedata.normalize('NFKC', str(value or '')).lower()
+    return ''.join(value.split())[:MAX_VALUE_LENGTH]
+
+
+def normalize_phone(value):
+    return re.sub(r'\D', '', str(value or ''))[:MAX_VALUE_LENGTH]
+
+
+def _entries(order_id, field, value):
+    if field == OrderLookup.Field.RECIPIENT_PHONE:
+        values = {normalize_phone(value)}
+    elif field == OrderLookup.Field.RECIPIENT_NAME:
+        # 姓名整体和其中每个单词都可以作为前缀查找
+        words = unicodedata.normalize('NFKC', str(value or '')).split()
+        values = {normalize(value)} | {normalize(word) for word in words}
+    else:
+        values = {normalize(value)}
+    return [OrderLookup(order_id=order_id, field=field, value=v) for v in values if v]
+
+
+def index_orders(order_ids, batch_size=1000):
+    """重建指定订单的查找索引"""
+    order_ids = [order_id for order_id in set(order_ids) if order_id is not None]
+    if not order_ids:
+        return 0
+    Field = OrderLookup.Field
+    entries = []
+    for start in range(0, len(order_ids), batch_size):
+        chunk = order_ids[start:start + batch_size]
+        rows = Order.objects.filter(id__in=chunk).values_list(
+            'id', 'order_no', 'platform_order_no', 'recipient_name', 'recipient_phone', 'package__tracking_no',
+        )
+        for order_id, order_no, platform_no, name, phone, tracking_no in rows:
+            entries += _entries(order_id, Field.ORDER_NO, order_no)
+            entries += _entries(order_id, Field.PLATFORM_ORDER_NO, platform_no)
+            entries += _entries(order_id, Field.RECIPIENT_NAME, name)
+            entries += _entries(order_id, Field.RECIPIENT_PHONE, phone)
+            entries += _entries(order_id, Field.TRACKING_NO, tracking_no)
+        # 订单可能有多个包裹，只有一个通过 Order.package 关联
+        for order_id, tracking_no in Package.objects.filter(order_id__in=chunk).values_list('order_id', 'tracking_no'):
+            entries += _entries(order_id, Field.TRACKING_NO, tracking_no)
+
+    # 同一订单的重复值（如包裹和 Order.package 是同一个）只保留一条
+    unique = {(entry.order_id, entry.field, entry.value): entry for entry in entries}
+    with transaction.atomic():
+        for start in range(0, len(order_ids), batch_size):
+            OrderLookup.objects.filter(order_id__in=order_ids[start:start + batch_size]).delete()
+        OrderLookup.objects.bulk_create(unique.values(), batch_size=batch_size)
+    return len(unique)
+
+
+@contextmanager
+def deferred_indexing():
+    """推迟代码块内由 Order/Package 保存触发的索引更新
+
+    块内只记录涉及的订单，正常结束时调用一次 index_orders 统一重建；
+    批量同步时把逐条保存的多次重建合并为每批一次。块内抛出异常时不重建，
+    外层事务回滚后索引与数据保持一致。嵌套使用时由最外层统一重建。
+    """
+    if getattr(_deferred, 'order_ids', None) is not None:
+        yield
+        return
+    _deferred.order_ids = set()
+    try:
+        yield
+        order_ids = _deferred.order_ids
+    finally:
+        _deferred.order_ids = None
+    index_orders(order_ids)
+
+
+def reindex_orders(order_ids):
+    """订单变化后更新索引；在 deferred_indexing 块内时推迟到块结束"""
+    pending = getattr(_deferred, 'order_ids', None)
+    if pending is None:
+        index_orders(order_ids)
+    else:
+        pending.update(order_id for order_id in order_ids if order_id is not None)
+
+
+def index_package_orders(package):
+    """包裹变化后更新相关订单的索引"""
+    order_ids = set(Order.objects.filter(package_id=package.pk).values_list('id', flat=True))
+    order_ids.add(package.order_id)
+    reindex_orders(order_ids)
+
+
+def lookup_condition(query, exact=False):
+    """查找值与 query 相等或以其开头的条件，exact=True 时只要求相等；query 无有效内容时返回 None"""
+    lookup = 'value' if exact else 'value__startswith'
+    value = normalize(query)
+    if not value:
+        return None
+    condition = Q(**{lookup: value})
+    digits = normalize_phone(query)
+    if len(digits) >= MIN_PHONE_DIGITS and digits != value:
+        # 电话号码按纯数字保存，粘贴的 "+1 (555) 010-0000" 也能匹配
+        condition |= Q(field=OrderLookup.Field.RECIPIENT_PHONE, **{lookup: digits})
+    return condition
+
+
+def lookup_order_ids(query):
+    """匹配 query 的订单ID查询集，可用作子查询"""
+    condition = lookup_condition(query)
+    if condition is None:
+        return OrderLookup.objects.none().values('order_id')
+    return OrderLookup.objects.filter(condition).values('order_id')
+
+
+def lookup_orders(query, limit=None):
+    """按 query 查找订单，返回 [(订单, 命中字段, 是否完全匹配), ...]，完全匹配的排在前面"""
+    condition = lookup_condition(query)
+    if condition is None:
+        return []
+    limit = limit or getattr(settings, 'ORDER_LOOKUP_LIMIT', 20)
+    value = normalize(query)
+    digits = normalize_phone(query)
+    matches = {}
+    # 常见前缀（区号、常见姓氏）的前缀匹配很多，截取的部分结果可能不含完全匹配，
+    # 因此先单独查询完全匹配，不足 limit 个订单时再用前缀匹配补足
+    rows = list(OrderLookup.objects.filter(lookup_condition(query, exact=True)).values_list('order_id', 'field', 'value')[:limit * 5])
+    if len({row[0] for row in rows}) < limit:
+        rows += OrderLookup.objects.filter(condition).values_list('order_id', 'field', 'value')[:limit * 5]
+    for order_id, field, matched in rows:
+        exact = matched in (value, digits)
+        current = matches.get(order_id)
+        if current is None or (exact and not current[1]):
+            matches[order_id] = (field, exact)
+
+    order_ids = sorted(matches, key=lambda order_id: (not matches[order_id][1], -order_id))[:limit]
+    orders = Order.objects.filter(id__in=order_ids).select_related('shop', 'package')
+    orders = {order.id: order for order in orders}
+    return [
+        (orders[order_id], OrderLookup.Field(matches[order_id][0]), matches[order_id][1])
+        for order_id in order_ids if order_id in orders
+    ]
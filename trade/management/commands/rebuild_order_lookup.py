@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from trade.lookup import index_orders
+from trade.models import Order
+
+
+class Command(BaseCommand):
+    help = '重建订单快速查找索引（首次部署或索引不一致时执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='每批处理的订单数')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(Order.objects.order_by('id').values_list('id', flat=True))
+        entries = 0
+        for start in range(0, len(ids), batch_size):
+            entries += index_orders(ids[start:start + batch_size], batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'索引 {len(ids)} 个订单，{entries} 条查找记录'))
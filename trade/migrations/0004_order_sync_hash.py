@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trade', '0003_order_package'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='sync_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True, verbose_name='同步指纹'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:05
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_sku_stats(apps, schema_editor):
+    """按现有订单明细回填订单的 SKU 种类数和总数量"""
+    Order = apps.get_model('trade', 'Order')
+    Cart = apps.get_model('trade', 'Cart')
+    stats = Cart.objects.values('order_id').annotate(sku_count=Count('id'), total_qty=Sum('qty')).order_by()
+    batch = []
+    for row in stats.iterator():
+        batch.append(Order(id=row['order_id'], sku_count=row['sku_count'], total_qty=row['total_qty'] or 0))
+        if len(batch) >= 1000:
+            Order.objects.bulk_update(batch, ['sku_count', 'total_qty'])
+            batch = []
+    if batch:
+        Order.objects.bulk_update(batch, ['sku_count', 'total_qty'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trade', '0004_order_sync_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='sku_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='SKU种类数'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_qty',
+            field=models.IntegerField(default=0, editable=False, verbose_name='SKU总数量'),
+        ),
+        migrations.RunPython(fill_sku_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trade', '0005_order_sku_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLookup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('order_no', '订单号'), ('platform_order_no', '平台订单号'), ('tracking_no', '物流单号'), ('recipient_name', '收件人'), ('recipient_phone', '收件人电话')], max_length=20, verbose_name='字段')),
+                ('value', models.CharField(max_length=100, verbose_name='查找值')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lookups', to='trade.order', verbose_name='订单')),
+            ],
+            options={
+                'verbose_name': '订单查找索引',
+                'verbose_name_plural': '订单查找索引',
+                'db_table': 'trade_order_lookup',
+                'indexes': [models.Index(fields=['value'], name='trade_lookup_value_idx')],
+            },
+        ),
+    ]
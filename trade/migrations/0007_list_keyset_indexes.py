@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trade', '0006_orderlookup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at', 'id'], name='trade_order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['shop', 'created_at', 'id'], name='trade_order_shop_created_idx'),
+        ),
+    ]
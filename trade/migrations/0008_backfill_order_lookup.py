@@ -0,0 +1,71 @@
+import re
+import unicodedata
+from django.db import migrations
+
+# 与 trade.lookup 中的规范化规则一致；迁移中保留一份副本，不随之后的代码修改而变化
+MAX_VALUE_LENGTH = 100
+BATCH_SIZE = 2000
+
+
+def normalize(value):
+    value = unicodedata.normalize('NFKC', str(value or '')).lower()
+    return ''.join(value.split())[:MAX_VALUE_LENGTH]
+
+
+def normalize_phone(value):
+    return re.sub(r'\D', '', str(value or ''))[:MAX_VALUE_LENGTH]
+
+
+def lookup_values(field, value):
+    if field == 'recipient_phone':
+        values = {normalize_phone(value)}
+    elif field == 'recipient_name':
+        words = unicodedata.normalize('NFKC', str(value or '')).split()
+        values = {normalize(value)} | {normalize(word) for word in words}
+    else:
+        values = {normalize(value)}
+    return {v for v in values if v}
+
+
+def build_order_lookup(apps, schema_editor):
+    """为已有订单建立查找索引，之后由订单、包裹的保存和同步任务维护"""
+    Order = apps.get_model('trade', 'Order')
+    OrderLookup = apps.get_model('trade', 'OrderLookup')
+    Package = apps.get_model('logistics', 'Package')
+    last_id = 0
+    while True:
+        rows = list(
+            Order.objects.filter(id__gt=last_id).order_by('id').values_list(
+                'id', 'order_no', 'platform_order_no', 'recipient_name', 'recipient_phone', 'package__tracking_no',
+            )[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        ids = [row[0] for row in rows]
+        entries = set()
+        for order_id, order_no, platform_no, name, phone, tracking_no in rows:
+            for field, value in (
+                ('order_no', order_no), ('platform_order_no', platform_no), ('recipient_name', name),
+                ('recipient_phone', phone), ('tracking_no', tracking_no),
+            ):
+                entries.update((order_id, field, v) for v in lookup_values(field, value))
+        for order_id, tracking_no in Package.objects.filter(order_id__in=ids).values_list('order_id', 'tracking_no'):
+            entries.update((order_id, 'tracking_no', v) for v in lookup_values('tracking_no', tracking_no))
+        OrderLookup.objects.filter(order_id__in=ids).delete()
+        OrderLookup.objects.bulk_create(
+            [OrderLookup(order_id=order_id, field=field, value=value) for order_id, field, value in entries],
+            batch_size=BATCH_SIZE,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trade', '0007_list_keyset_indexes'),
+        ('logistics', '0003_alter_package_tracking_no'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_order_lookup, migrations.RunPython.noop),
+    ]
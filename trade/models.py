@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Count, Sum
 from django.utils.translation import gettext_lazy as _
 
 class Shop(models.Model):
@@ -64,23 +65,55 @@ class Order(models.Model):
         verbose_name='包裹',
         related_name='related_order'
     )
+    sync_hash = models.CharField('同步指纹', max_length=40, null=True, blank=True, editable=False)
+    # 由订单明细汇总得出，明细变化时通过 refresh_sku_stats 更新
+    sku_count = models.PositiveIntegerField('SKU种类数', default=0, editable=False)
+    total_qty = models.IntegerField('SKU总数量', default=0, editable=False)
 
     class Meta:
         verbose_name = '订单'
         verbose_name_plural = '订单'
         ordering = ['-created_at']
+        # 订单列表按 (created_at, id) 键集分页
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='trade_order_created_idx'),
+            models.Index(fields=['shop', 'created_at', 'id'], name='trade_order_shop_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.order_no}"
 
+    def save(self, *args, **kwargs):
+        from .lookup import LOOKUP_SOURCE_FIELDS, reindex_orders
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & LOOKUP_SOURCE_FIELDS:
+            reindex_orders([self.pk])
+
     def get_sku_stats(self):
         """获取SKU统计信息"""
-        sku_count = self.cart_set.count()  # SKU种类数
-        total_qty = sum(cart.qty for cart in self.cart_set.all())  # SKU总数量
         return {
-            'sku_count': sku_count,
-            'total_qty': total_qty
+            'sku_count': self.sku_count,
+            'total_qty': self.total_qty
+        }
+
+    @classmethod
+    def refresh_sku_stats(cls, order_ids):
+        """按订单明细重新汇总指定订单的 SKU 种类数和总数量"""
+        order_ids = set(order_ids)
+        if not order_ids:
+            return
+        stats = {
+            row['order_id']: row
+            for row in Cart.objects.filter(order_id__in=order_ids).values('order_id').annotate(
+                sku_count=Count('id'), total_qty=Sum('qty')
+            )
         }
+        orders = []
+        for order_id in order_ids:
+            row = stats.get(order_id, {})
+            orders.append(cls(id=order_id, sku_count=row.get('sku_count', 0), total_qty=row.get('total_qty') or 0))
+        cls.objects.bulk_update(orders, ['sku_count', 'total_qty'], batch_size=500)
 
 class Cart(models.Model):
     id = models.AutoField('ID', primary_key=True)
@@ -139,3 +172,41 @@ class Cart(models.Model):
 
     def __str__(self):
         return f"订单 {self.order.order_no} - {self.sku.sku_code}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Order.refresh_sku_stats([self.order_id])
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Order.refresh_sku_stats([self.order_id])
+        return result
+
+
+class OrderLookup(models.Model):
+    """订单快速查找索引
+
+    订单号、平台订单号、物流单号、收件人姓名（整体及每个单词）和电话
+    规范化后逐条保存，按等值或前缀匹配查找，不再对订单表做 LIKE '%...%' 扫描。
+    """
+    class Field(models.TextChoices):
+        ORDER_NO = 'order_no', _('订单号')
+        PLATFORM_ORDER_NO = 'platform_order_no', _('平台订单号')
+        TRACKING_NO = 'tracking_no', _('物流单号')
+        RECIPIENT_NAME = 'recipient_name', _('收件人')
+        RECIPIENT_PHONE = 'recipient_phone', _('收件人电话')
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lookups', verbose_name='订单')
+    field = models.CharField('字段', max_length=20, choices=Field.choices)
+    value = models.CharField('查找值', max_length=100)
+
+    class Meta:
+        verbose_name = '订单查找索引'
+        verbose_name_plural = '订单查找索引'
+        db_table = 'trade_order_lookup'
+        indexes = [
+            models.Index(fields=['value'], name='trade_lookup_value_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_field_display()}: {self.value}"
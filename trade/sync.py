@@ -1,108 +1,157 @@
-import time
-import hashlib
 import json
-import math
-import requests
 import logging
-from datetime import datetime, timedelta
+from decimal import Decimal
+from datetime import datetime
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from .models import Order, Shop, Cart
+from .lookup import deferred_indexing
 from gallery.models import SKU  # 避免循环导入
 from logistics.models import Package, Service  # 添加Package导入
+from erp.client import get_client
+from erp.fingerprint import fingerprint, ChangeFilter
+from erp.pagination import PageFetcher
+from erp.pipeline import Pipeline
+from erp.models import SyncRun
 
 # 获取logger实例
 logger = logging.getLogger(__name__)
 
-def generate_sign(body):
-    """生成API签名"""
-    appName = "mathmagic"
-    appKey = "82be0592545283da00744b489f758f99"
-    sid = "mathmagic"
-
-    headers = {
-        'Content-Type': 'application/json'
-    }
-
-    timestamp = str(int(time.time()))
-    sign_str = "{appKey}appName{appName}body{body}sid{sid}timestamp{timestamp}{appKey}".format(
-        appKey=appKey, appName=appName, body=body, sid=sid, timestamp=timestamp
-    )
-    sign = hashlib.md5(sign_str.encode()).hexdigest()
-    
-    params = {
-        "appName": appName,
-        "sid": sid,
-        "sign": sign,
-        "timestamp": timestamp,
-    }
-    return params, headers
+TRADE_LIST_ENDPOINT = 'trade/v1/getSalesTradeList'
+TRADE_DETAIL_ENDPOINT = 'trade/v1/getSalesTradeOrderList'
+TRADE_STREAM = 'trades'
 
 def get_trade_detail(trade_id):
     """获取订单明细数据"""
-    body = {
-        "tradeIds": [str(trade_id)]
-    }
-    body_str = json.dumps(body, ensure_ascii=False, separators=(",", ":"))
-    params, headers = generate_sign(body_str)
-    
-    url = "https://openapi.qizhishangke.com/api/openservices/trade/v1/getSalesTradeOrderList"
-    response = requests.post(url, params=params, headers=headers, data=body_str)
+    return get_trade_details([trade_id]).get(str(trade_id), [])
 
-    # 打印返回的数据结构
-    # print("API返回数据:", response.json()['data'] )
+def get_trade_details(trade_ids, chunk_size=None):
+    """批量获取订单明细数据
 
+    按 chunk_size 个订单一组调用明细接口，返回 {tradeId: [明细, ...]}。
+    某一组请求失败时，该组订单不出现在结果中，由调用方决定如何处理。
+    """
+    chunk_size = chunk_size or getattr(settings, 'ERP_TRADE_DETAIL_CHUNK', 50)
+    trade_ids = [str(trade_id) for trade_id in trade_ids]
+    details = {}
+    for start in range(0, len(trade_ids), chunk_size):
+        chunk = trade_ids[start:start + chunk_size]
+        try:
+            items = get_client().post(TRADE_DETAIL_ENDPOINT, {"tradeIds": chunk})
+        except Exception as e:
+            logger.error(f"批量获取订单明细失败: {str(e)}, 订单: {chunk}")
+            continue
 
-    if response.status_code != 200:
-        raise Exception(f"API请求失败: {response.text}")
-        
-    response_data = response.json()
-    if response_data['code'] != 200:
-        raise Exception(f"API返回错误: {response_data['message']}")
-    
+        if len(chunk) == 1:
+            details[chunk[0]] = items
+            continue
 
-    
-    return response_data['data']
+        grouped = {trade_id: [] for trade_id in chunk}
+        for item in items:
+            trade_id = str(item.get('tradeId', ''))
+            if trade_id not in grouped:
+                break
+            grouped[trade_id].append(item)
+        else:
+            details.update(grouped)
+            continue
 
-def sync_trade_detail(order, trade_id):
-    """同步订单商品明细"""
-    try:
-        # 获取订单明细数据
-        details = get_trade_detail(trade_id)
-        
-        # 删除原有的购物车记录
-        Cart.objects.filter(order=order).delete()
-        
-        # 同步商品明细
-        for item in details:
-            try:
-                # 使用正确的字段名获取SKU编码
-                sku_code = item.get('skuNo')
-                if not sku_code:
-                    logger.error(f"找不到SKU编码字段, 订单号: {order.order_no}, 数据: {item}")
-                    continue
-                    
-                sku = SKU.objects.get(sku_code=sku_code)
-                
-                # 创建购物车记录
-                Cart.objects.create(
-                    order=order,
-                    sku=sku,
-                    qty=int(item.get('num', 1)),
-                    price=float(item.get('price', 0)),
-                    cost=float(item.get('cost', 0)),
-                    discount=float(item.get('discount', 0)),
-                    actual_price=float(item.get('actualPrice', item.get('price', 0))),
-                    is_out_of_stock=False
-                )
-            except SKU.DoesNotExist:
-                logger.error(f"找不到SKU: {sku_code}, 订单号: {order.order_no}")
+        # 明细无法对应到订单时，退回逐单获取，避免误删其他订单的明细
+        logger.warning(f"明细数据缺少或包含未知的订单ID, 改为逐单获取: {chunk}")
+        for trade_id in chunk:
+            details.update(get_trade_details([trade_id]))
+    return details
+
+# 对比购物车明细时参与比较的字段
+CART_FIELDS = ('qty', 'price', 'cost', 'discount', 'actual_price')
+
+def to_decimal(value):
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+def parse_cart_lines(order, details, sku_ids):
+    """将订单明细解析为 {sku_id: 字段值}，同一SKU的多行合并数量"""
+    lines = {}
+    for item in details:
+        try:
+            # 使用正确的字段名获取SKU编码
+            sku_code = item.get('skuNo')
+            if not sku_code:
+                logger.error(f"找不到SKU编码字段, 订单号: {order.order_no}, 数据: {item}")
                 continue
-            except Exception as e:
-                logger.error(f"处理订单商品明细时出错: {str(e)}, 订单号: {order.order_no}")
+            sku_id = sku_ids.get(sku_code)
+            if sku_id is None:
+                logger.error(f"找不到SKU: {sku_code}, 订单号: {order.order_no}")
                 continue
-                
+
+            values = {
+                'qty': int(item.get('num', 1)),
+                'price': to_decimal(item.get('price', 0)),
+                'cost': to_decimal(item.get('cost', 0)),
+                'discount': to_decimal(item.get('discount', 0)),
+                'actual_price': to_decimal(item.get('actualPrice', item.get('price', 0))),
+            }
+            if sku_id in lines:
+                logger.warning(f"订单明细中SKU重复, 合并数量: {sku_code}, 订单号: {order.order_no}")
+                lines[sku_id]['qty'] += values['qty']
+            else:
+                lines[sku_id] = values
+        except Exception as e:
+            logger.error(f"处理订单商品明细时出错: {str(e)}, 订单号: {order.order_no}")
+            continue
+    return lines
+
+def sync_trade_details(order_details):
+    """批量同步订单商品明细
+
+    order_details 为 [(order, details), ...]。一次查询解析全部SKU编码、
+    一次查询加载这些订单已有的明细，按 (订单, SKU) 对比后只新增、
+    修改、删除有变化的行；未变化的明细不写库，created_at 保持不变。
+    """
+    if not order_details:
+        return
+    sku_codes = {item.get('skuNo') for _, details in order_details for item in details if item.get('skuNo')}
+    sku_ids = dict(SKU.objects.filter(sku_code__in=sku_codes).values_list('sku_code', 'id'))
+
+    existing = {}
+    for cart in Cart.objects.filter(order__in=[order for order, _ in order_details]):
+        existing[(cart.order_id, cart.sku_id)] = cart
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for order, details in order_details:
+        lines = parse_cart_lines(order, details, sku_ids)
+        for sku_id, values in lines.items():
+            cart = existing.pop((order.id, sku_id), None)
+            if cart is None:
+                to_create.append(Cart(order=order, sku_id=sku_id, is_out_of_stock=False, **values))
+            elif any(getattr(cart, field) != values[field] for field in CART_FIELDS):
+                for field, value in values.items():
+                    setattr(cart, field, value)
+                cart.updated_at = now
+                to_update.append(cart)
+
+    # 剩余的旧明细在本次数据中已不存在
+    to_delete = [cart.id for cart in existing.values()]
+
+    if to_delete:
+        Cart.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        Cart.objects.bulk_update(to_update, CART_FIELDS + ('updated_at',))
+    if to_create:
+        Cart.objects.bulk_create(to_create)
+
+    # 批量写入不经过 Cart.save，统一更新明细有变化的订单汇总
+    changed = [cart.order_id for cart in to_create + to_update] + [cart.order_id for cart in existing.values()]
+    Order.refresh_sku_stats(changed)
+    logger.info(f"订单明细同步: 新增 {len(to_create)} 行, 修改 {len(to_update)} 行, 删除 {len(to_delete)} 行")
+
+def sync_trade_detail(order, details):
+    """同步单个订单的商品明细"""
+    try:
+        sync_trade_details([(order, details)])
     except Exception as e:
-        logger.error(f"获取订单明细数据失败: {str(e)}, 订单号: {order.order_no}")
+        logger.error(f"同步订单明细数据失败: {str(e)}, 订单号: {order.order_no}")
 
 def sync_package_info(order, trade_data):
     """同步包裹信息"""
@@ -169,113 +218,184 @@ def sync_package_info(order, trade_data):
         logger.error(f"同步包裹信息失败: {str(e)}, 订单号: {order.order_no}")
         logger.error(f"错误详情: ", exc_info=True)
 
-def sync_trade_data(start_date, end_date, page=1):
-    """同步订单数据"""
-    body = {
-        "createTimeBegin": start_date,
-        "createTimeEnd": end_date,
-        "tradeStatusCode": 0,
-        "pageNo": page,
-        "pageSize": 100
-    }
-    body_str = json.dumps(body, ensure_ascii=False, separators=(",", ":"))
-    params, headers = generate_sign(body_str)
-    
-    url = "https://openapi.qizhishangke.com/api/openservices/trade/v1/getSalesTradeList"
-    response = requests.post(url, params=params, headers=headers, data=body_str)
-    
-    if response.status_code != 200:
-        raise Exception(f"API请求失败: {response.text}")
-        
-    response_data = response.json()
-    if response_data['code'] != 200:
-        raise Exception(f"API返回错误: {response_data['message']}")
-        
-    data = response_data['data']
-    
-    for item in data['data']:
-        # 处理时间字段
-        created_time = datetime.strptime(item['tradeTime'], "%Y-%m-%dT%H:%M:%S")
-        try:
-            shiped_time = datetime.strptime(item['deliveryTime'], "%Y-%m-%dT%H:%M:%S")
-            shiped_date = shiped_time.date()
-        except:
-            shiped_time = None
-            shiped_date = None
-            
+# 状态映射
+STATUS_MAPPING = {
+    '待发货': Order.OrderStatus.PENDING,
+    '已发货': Order.OrderStatus.SHIPPED,
+    '已完成': Order.OrderStatus.COMPLETED,
+    '已取消': Order.OrderStatus.CANCELLED,
+    # 添加其他状态映射...
+}
+
+def transform_trades(items, changes=None):
+    """将接口返回的订单数据转换为待写入的数据行
+
+    内容指纹包含订单及其明细，只有明细变化的订单同样会被写入。
+    传入 changes（ChangeFilter）时丢弃指纹与上次同步相同的订单；
+    明细获取失败的订单没有指纹，总是写入。
+    """
+    rows = []
+    for item in items:
         try:
-            operate_time = datetime.strptime(item['outBoundTime'], "%Y-%m-%dT%H:%M:%S")
-        except:
-            operate_time = None
-
-        # 获取或创建Shop
-        shop, _ = Shop.objects.get_or_create(
-            code=item['shopNo'],
-            defaults={
-                'name': item['shopText'],
-                'is_active': True
+            # 处理时间字段
+            created_time = datetime.strptime(item['tradeTime'], "%Y-%m-%dT%H:%M:%S")
+            order_data = {
+                'platform_order_no': item['srcTids'],
+                'order_no': item['tradeNo'],
+                'recipient_country': item['country'],
+                'recipient_state': item['receiverProvince'],
+                'created_at': created_time,
+                'status': STATUS_MAPPING.get(item['tradeStatusDesc'], Order.OrderStatus.PENDING),
+                'paid_amount': float(item.get('payment', 0)),
+                'freight': float(item.get('postFee', 0)),
+                'recipient_name': item['receiverName'],
+                'recipient_phone': item['receiverMobile'],
+                'recipient_email': '',
+                'recipient_city': item['receiverCity'],
+                'recipient_address': item['receiverAddress'],
+                'system_remark': item['erpRemark'],
+                'cs_remark': item['csRemark'],
+                'buyer_remark': item['buyerMessage']
             }
-        )
+            rows.append({
+                'key': str(item['tradeId']),
+                'trade_id': item['tradeId'],
+                'shop_code': item['shopNo'],
+                'shop_name': item['shopText'],
+                'order_data': order_data,
+                'item': item,
+            })
+        except Exception as e:
+            logger.error(f"解析订单 {item.get('srcTids')} 时出错: {str(e)}")
+            continue
 
-        # 状态映射
-        status_mapping = {
-            '待发货': Order.OrderStatus.PENDING,
-            '已发货': Order.OrderStatus.SHIPPED,
-            '已完成': Order.OrderStatus.COMPLETED,
-            '已取消': Order.OrderStatus.CANCELLED,
-            # 添加其他状态映射...
-        }
+    # 整页订单的明细按批次一次性获取，再分发回各个订单
+    details = get_trade_details([row['trade_id'] for row in rows])
+    for row in rows:
+        row['details'] = details.get(str(row['trade_id']))
+        row['sync_hash'] = fingerprint({'trade': row['item'], 'details': row['details']}) if row['details'] is not None else None
 
-        # 更新或创建Order
-        order_data = {
-            'platform_order_no': item['srcTids'],
-            'order_no': item['tradeNo'],
-            'recipient_country': item['country'],
-            'recipient_state': item['receiverProvince'],
-            'created_at': created_time,
-            'shop': shop,
-            'status': status_mapping.get(item['tradeStatusDesc'], Order.OrderStatus.PENDING),
-            'paid_amount': float(item.get('payment', 0)),
-            'freight': float(item.get('postFee', 0)),
-            'recipient_name': item['receiverName'],
-            'recipient_phone': item['receiverMobile'],
-            'recipient_email': '',
-            'recipient_city': item['receiverCity'],
-            'recipient_address': item['receiverAddress'],
-            'system_remark': item['erpRemark'],
-            'cs_remark': item['csRemark'],
-            'buyer_remark': item['buyerMessage']
+    if changes is not None:
+        stored = {
+            str(order_id): sync_hash
+            for order_id, sync_hash in Order.objects.filter(
+                id__in=[row['trade_id'] for row in rows]
+            ).values_list('id', 'sync_hash')
         }
+        rows = changes.changed_rows(rows, stored)
+    return rows
 
-        try:
-            # 创建或更新订单
-            order, created = Order.objects.update_or_create(
-                id=item['tradeId'],
-                defaults=order_data
-            )
-            print('处理订单', item['srcTids'], '成功============================================================')
-            
-            # 同步订单商品明细
-            sync_trade_detail(order, item['tradeId'])
-            
-            # 同步包裹信息
-            sync_package_info(order, item)
+def write_trades(rows):
+    """写入一批订单数据，返回成功处理的订单数
+
+    订单的内容指纹在整页明细写入成功后，与明细在同一事务中保存；
+    明细写入失败时不保存指纹，下次同步重新处理这些订单。
+    """
+    written = 0
+    shops = {}
+    order_details = []
+    hashes = {}
+    # 逐条保存时只记录需要重建查找索引的订单，整批写完后统一重建一次（与写入处于同一事务）
+    with deferred_indexing():
+        for row in rows:
+            item = row['item']
+            try:
+                # 每个订单使用独立的保存点，单条失败不影响同批次其他订单
+                with transaction.atomic():
+                    # 获取或创建Shop
+                    shop = shops.get(row['shop_code'])
+                    if shop is None:
+                        shop, _ = Shop.objects.get_or_create(
+                            code=row['shop_code'],
+                            defaults={
+                                'name': row['shop_name'],
+                                'is_active': True
+                            }
+                        )
+                        shops[row['shop_code']] = shop
+
+                    # 创建或更新订单；指纹先清空，明细写入成功后再保存
+                    order, created = Order.objects.update_or_create(
+                        id=row['trade_id'],
+                        defaults=dict(row['order_data'], shop=shop, sync_hash=None)
+                    )
+                    print('处理订单', item['srcTids'], '成功============================================================')
+                
+                    # 同步包裹信息
+                    sync_package_info(order, item)
+                written += 1
+
+                # 明细获取失败时保留原有记录
+                if row['details'] is None:
+                    logger.error(f"未获取到订单明细, 订单号: {order.order_no}")
+                else:
+                    order_details.append((order, row['details']))
+                    hashes[order.id] = row['sync_hash']
             
-        except Exception as e:
-            logger.error(f"处理订单 {item['srcTids']} 时出错: {str(e)}")
-            continue
-    
-    # 处理分页
-    if page < math.ceil(data['total'] / data['pageSize']):
-        sync_trade_data(start_date, end_date, page + 1)
+            except Exception as e:
+                logger.error(f"处理订单 {item['srcTids']} 时出错: {str(e)}")
+                continue
+
+    # 整页订单的商品明细一次对比、批量写入，成功后在同一事务中保存指纹
+    try:
+        with transaction.atomic():
+            sync_trade_details(order_details)
+            Order.objects.bulk_update(
+                [Order(id=order_id, sync_hash=sync_hash) for order_id, sync_hash in hashes.items()],
+                ['sync_hash'], batch_size=1000,
+            )
+    except Exception as e:
+        logger.error(f"同步订单明细数据失败: {str(e)}")
+    return written
+
+def sync_trade_data(start_date, end_date, run=None, changes=None):
+    """同步订单数据
+
+    传入 run（SyncRun）时逐页记录检查点；
+    传入 changes（ChangeFilter）时跳过内容未变化的订单。
+    """
+    def build_body(page, page_size):
+        return {
+            "createTimeBegin": start_date,
+            "createTimeEnd": end_date,
+            "tradeStatusCode": 0,
+            "pageNo": page,
+            "pageSize": page_size
+        }
+
+    # 抓取、转换、写入三个阶段流水线执行，页面之间不再递归
+    fetcher = PageFetcher(TRADE_LIST_ENDPOINT, build_body)
+    pipeline = Pipeline(
+        'trade_sync',
+        fetcher.records(),
+        lambda items: transform_trades(items, changes),
+        write_trades,
+        checkpoint=run.checkpoint if run else None,
+    )
+    return pipeline.run()
+
+def sync_all_trade(full=False):
+    """同步所有订单数据的入口函数
 
-def sync_all_trade():
-    """同步所有订单数据的入口函数"""
+    订单接口只能按创建时间筛选，创建后的发货、取消等变化不会落在水位之后的窗口里，
+    因此每次至少重新扫描最近 ERP_TRADE_RESCAN_DAYS 天创建的订单（停同步超过该天数时从水位开始），
+    内容指纹未变化的订单不再写入。full=True 时回溯14天并重新写入所有订单。
+    上次运行中断时沿用其时间窗口，从第 1 页重新抓取，已写入的订单由指纹跳过。
+    """
     try:
-        # 默认同步最近7天的数据
-        end_date = timezone.now().strftime("%Y-%m-%d %H:%M:%S")
-        start_date = (timezone.now() - timedelta(days=14)).strftime("%Y-%m-%d %H:%M:%S")
-        sync_trade_data(start_date, end_date)
+        run = SyncRun.begin_incremental(
+            TRADE_STREAM, default_days=14, full=full,
+            rescan_days=getattr(settings, 'ERP_TRADE_RESCAN_DAYS', 14),
+        )
+        changes = ChangeFilter('trade_sync', force=full)
+        try:
+            sync_trade_data(run.start_time, run.end_time, run, changes)
+        except Exception as e:
+            run.fail(e)
+            raise
+        changes.log_summary()
+        run.finish(unchanged=changes.unchanged)
+        get_client().log_stats()
         return True, "订单数据同步成功"
     except Exception as e:
-        return False, f"订单数据同步失败: {str(e)}" 
\ No newline at end of file
+        return False, f"订单数据同步失败: {str(e)}"
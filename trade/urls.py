@@ -6,6 +6,7 @@ app_name = 'trade'
 urlpatterns = [
     path('orders/', views.OrderListView.as_view(), name='order_list'),
     path('orders/sync', views.OrderSyncView.as_view(), name='order_sync'),
+    path('orders/lookup/', views.OrderLookupView.as_view(), name='order_lookup'),
     path('orders/create/', views.OrderCreateView.as_view(), name='order_create'),
     path('orders/<int:pk>/', views.OrderDetailView.as_view(), name='order_detail'),
     path('orders/<int:pk>/edit/', views.OrderEditView.as_view(), name='order_edit'),
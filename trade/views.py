@@ -4,17 +4,20 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.shortcuts import redirect
 from .models import Order, Shop
+from .exports import order_queryset
+from .lookup import lookup_orders
+from erp.exports import EXPORT_FORMATS
+from erp.paginators import CursorPaginationMixin
 from gallery.models import SKU
-from . import sync
+from erp.models import SyncJob
 import logging
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.http import JsonResponse
 from django.views.generic.edit import BaseDeleteView
-from django.db.models import Q
 
 logger = logging.getLogger(__name__)
 
-class OrderListView(LoginRequiredMixin, ListView):
+class OrderListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Order
     template_name = 'trade/order_list.html'
     context_object_name = 'orders'
@@ -22,27 +25,7 @@ class OrderListView(LoginRequiredMixin, ListView):
     login_url = '/muggle/login/'
     
     def get_queryset(self):
-        queryset = super().get_queryset()
-        search_query = self.request.GET.get('search')
-        shop_id = self.request.GET.get('shop')
-        status = self.request.GET.get('status')
-        
-        if search_query:
-            queryset = queryset.filter(
-                order_no__icontains=search_query
-            ) | queryset.filter(
-                platform_order_no__icontains=search_query
-            ) | queryset.filter(
-                recipient_name__icontains=search_query
-            )
-        
-        if shop_id:
-            queryset = queryset.filter(shop_id=shop_id)
-            
-        if status:
-            queryset = queryset.filter(status=status)
-            
-        return queryset.select_related('shop')
+        return order_queryset(self.request.GET).select_related('shop', 'package__service__carrier')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -51,38 +34,47 @@ class OrderListView(LoginRequiredMixin, ListView):
         context['shops'] = Shop.objects.filter(is_active=True)
         context['selected_shop'] = self.request.GET.get('shop', '')
         context['selected_status'] = self.request.GET.get('status', '')
+        context['selected_start'] = self.request.GET.get('start', '')
+        context['selected_end'] = self.request.GET.get('end', '')
+        context['export_formats'] = EXPORT_FORMATS
         context['status_choices'] = Order.OrderStatus.choices
         return context
 
+class OrderLookupView(LoginRequiredMixin, View):
+    """按订单号、平台订单号、物流单号、收件人或电话查找订单（等值或前缀匹配）"""
+
+    def get(self, request):
+        results = []
+        for order, field, exact in lookup_orders(request.GET.get('q', '')):
+            results.append({
+                'id': order.id,
+                'order_no': order.order_no,
+                'platform_order_no': order.platform_order_no,
+                'tracking_no': order.package.tracking_no if order.package else None,
+                'recipient_name': order.recipient_name,
+                'shop': order.shop.name,
+                'status': order.status,
+                'status_display': order.get_status_display(),
+                'created_at': order.created_at,
+                'matched_field': field.value,
+                'matched_field_display': str(field.label),
+                'exact': exact,
+                'url': reverse('trade:order_detail', args=[order.id]),
+            })
+        return JsonResponse({'results': results})
+
 class OrderSyncView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
-        try:
-            success, message = sync.sync_all_trade()
-            if success:
-                messages.success(request, '订单数据同步成功！')
-                logger.info(f"用户 {request.user.username} 同步订单数据成功")
-            else:
-                messages.error(request, f'同步失败：{message}')
-                logger.error(f"用户 {request.user.username} 同步订单数据失败: {message}")
-        except Exception as e:
-            error_msg = f'同步失败：{str(e)}'
-            messages.error(request, error_msg)
-            logger.error(f"用户 {request.user.username} 同步订单数据失败: {str(e)}")
+        job, created = SyncJob.enqueue(SyncJob.Kind.TRADES, user=request.user)
+        if created:
+            messages.success(request, f'已提交订单同步任务 #{job.pk}，将在后台执行')
+            logger.info(f"用户 {request.user.username} 提交订单同步任务 #{job.pk}")
+        else:
+            messages.info(request, f'订单同步任务 #{job.pk} {job.get_status_display()}，请勿重复提交')
         return redirect('trade:order_list')
+
     def get(self, request, *args, **kwargs):
-        try:
-            success, message = sync.sync_all_trade()
-            if success:
-                messages.success(request, '订单数据同步成功！')
-                logger.info(f"用户 {request.user.username} 同步订单数据成功")
-            else:
-                messages.error(request, f'同步失败：{message}')
-                logger.error(f"用户 {request.user.username} 同步订单数据失败: {message}")
-        except Exception as e:
-            error_msg = f'同步失败：{str(e)}'
-            messages.error(request, error_msg)
-            logger.error(f"用户 {request.user.username} 同步订单数据失败: {str(e)}")
-        return redirect('trade:order_list')
+        return self.post(request, *args, **kwargs)
 
 class OrderCreateView(LoginRequiredMixin, CreateView):
     model = Order